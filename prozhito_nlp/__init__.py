@@ -1,4 +1,8 @@
-from .file_reader import split_json_to_csv, load_diary_from_csv
+from .file_reader import (
+    split_json_to_csv, load_diary_from_csv, group_notes_by_author, author_frame_from_json, iter_authors_from_json
+)
+from .schema import NOTE_SCHEMA, apply_schema, ensure_datetime
+from .arrow_strings import ARROW_STRING_DTYPE, to_arrow_strings, to_object_strings, read_csv_arrow, benchmark_string_storage
 from .preprocessing import clean_text_column, add_year_column
 from .lemmatizer import LemmatizerNatasha, lemmatize_column
 from .basic_text_metrics import clean_punctuation, count_sentences, compute_text_statistics
@@ -7,5 +11,24 @@ from .tfidf_viz import plot_tfidf_by_year
 from .dict_match import match_custom_dictionaries
 from .dict_viz import plot_total_matches, plot_matches_by_category
 from .ling_features import NatashaAnalyzer, TextAnalyzer, calc_percentage, analyze_verbs, analyze_pronouns, analyze_interjections, analyze_sentences
-from .sentiment import load_rusentilex_dict, calculate_sentiment_score, analyze_sentiment, print_sentiment_results
-from .sentiment_viz import plot_sentiment_dynamics, plot_sentiment_calendar
\ No newline at end of file
+from .sentiment import load_rusentilex_dict, calculate_sentiment_score, analyze_sentiment, print_sentiment_results, SparseSentimentScorer, SubstringSentimentScorer, make_sentiment_scorer, compute_sentiment_counts, sentiment_mismatches
+from .sentiment_viz import plot_sentiment_dynamics, plot_sentiment_calendar
+from .viz_utils import figure_payload_bytes, export_figures
+from .corpus_metrics import dictionary_counts, note_metrics, corpus_metrics
+from .rollups import TimeAggregates
+from .resources import ResourceBundle, compile_resource_bundle, get_resource_bundle, clear_resource_registry, uses_bundle
+from .cache import ResultCache, get_default_cache, set_default_cache, cached_analyze_sentiment, cached_match_custom_dictionaries, cached_compute_tfidf_by_year
+from .concordance import ConcordanceIndex, normalize_lemmas
+from .collocations import CollocationAggregator, extract_collocations
+from .hashed_tfidf import HashedTfidfAggregator, compute_tfidf_by_year_hashed, tfidf_error_report
+from .token_store import TokenStore, analyze_verbs_columnar, analyze_pronouns_columnar, analyze_interjections_columnar, feature_counts_by_note
+from .preview import PreviewSample, preview_sample, preview_text_statistics, preview_sentiment, preview_dictionaries, projected_cost, preview_corpus
+from .pipeline import Stage, Pipeline, build_default_pipeline, list_person_ids, summarize_results
+from .incremental import IncrementalCorpus, note_fingerprints
+from .batch import analyze_author, plan_workers, iter_process_authors, process_authors
+from .overlapped import iter_overlapped, iter_process_authors_overlapped
+from .surface_forms import SurfaceForms, SurfaceSentimentScorer, get_surface_forms, analyze_sentiment_surface, surface_tolerance_report
+from .shared_models import SharedVocab, export_shared_models, attach_shared_models, load_shared_lemmatizer, load_shared_analyzer
+from .chunked import iter_csv_chunks, iter_clean, iter_add_year, iter_lemmatize, iter_score_sentiment, TextStatisticsAggregator, TfidfAggregator, DictionaryTotalsAggregator, SentimentAggregator, consume
+from .dedup import minhash_signatures, find_near_duplicates, dedup_report, apply_deduplicated, lemmatize_column_dedup, analyze_sentiment_dedup
+from .server import AnalysisService, AnalysisClient, create_server, serve
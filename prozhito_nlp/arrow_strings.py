@@ -0,0 +1,274 @@
+import os
+import re
+import time
+from itertools import chain
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+ARROW_STRING_DTYPE = "string[pyarrow]"
+TEXT_COLUMNS = ("text", "tokens", "tokens_no_punkt")
+
+# Классы символов Python (для str) в синтаксисе RE2, которым пользуется pyarrow:
+# в RE2 \w, \s и \d соответствуют только ASCII-символам
+_RE2_CLASSES = {
+    "w": r"\p{L}\p{N}_",
+    "s": r"\t\n\x{0B}\f\r\x{1C}-\x{1F}\x{85}\p{Z}",
+    "d": r"\p{Nd}",
+}
+_RE2_SPECIAL = set(r"\.^$|?*+()[]{}")
+
+
+def arrow_available() -> bool:
+    """Установлен ли pyarrow (дополнительная зависимость: pip install prozhito_nlp[arrow])."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def require_arrow() -> None:
+    """Выбрасывает ImportError с подсказкой, если pyarrow не установлен."""
+    if not arrow_available():
+        raise ImportError("Для строк Arrow нужен pyarrow: pip install prozhito_nlp[arrow]")
+
+
+def is_arrow_string(values: pd.Series) -> bool:
+    """Хранятся ли строки колонки в Arrow (dtype string[pyarrow])."""
+    return isinstance(values.dtype, pd.StringDtype) and values.dtype.storage.startswith("pyarrow")
+
+
+def to_arrow_strings(df: pd.DataFrame, columns: Iterable[str] = TEXT_COLUMNS) -> pd.DataFrame:
+    """
+    Переводит текстовые колонки в строки Arrow (string[pyarrow]).
+    Колонки, которых нет в df, пропускаются.
+    """
+    require_arrow()
+    df = df.copy()
+    for column in columns:
+        if column in df and not is_arrow_string(df[column]):
+            df[column] = df[column].astype(ARROW_STRING_DTYPE)
+    return df
+
+
+def to_object_strings(df: pd.DataFrame, columns: Iterable[str] = TEXT_COLUMNS) -> pd.DataFrame:
+    """Возвращает текстовые колонки к обычным строкам Python (dtype object)."""
+    df = df.copy()
+    for column in columns:
+        if column in df and is_arrow_string(df[column]):
+            df[column] = df[column].astype(object)
+    return df
+
+
+def read_csv_arrow(file_path: str, columns: Iterable[str] = TEXT_COLUMNS) -> pd.DataFrame:
+    """
+    Читает CSV средствами pyarrow и переводит текстовые колонки в строки Arrow.
+    Колонки те же, что у pd.read_csv: даты остаются строками, пустые значения — NaN.
+
+    В текстах записей бывают переводы строк внутри кавычек, поэтому разбор идёт
+    с newlines_in_values=True (движок pyarrow у pd.read_csv этот параметр не передаёт
+    и на файлах больше одного блока чтения ломается).
+    """
+    require_arrow()
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    table = pa_csv.read_csv(
+        file_path,
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)
+    )
+    # pyarrow сам распознаёт даты, а pd.read_csv оставляет их строками (их разбирает apply_schema)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_date(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return to_arrow_strings(table.to_pandas(), columns)
+
+
+def re2_pattern(pattern: str) -> Optional[str]:
+    """
+    Переводит регулярное выражение Python в RE2 с теми же юникодными классами \\w, \\s, \\d.
+    Возвращает None, если в выражении есть то, чего нет в RE2 или что там работает иначе:
+    \\b, \\B, \\Z, обратные ссылки, опережающие и ретроспективные проверки.
+    """
+    out = []
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            if escaped in _RE2_CLASSES:
+                body = _RE2_CLASSES[escaped]
+                out.append(body if in_class else f"[{body}]")
+            elif escaped.lower() in _RE2_CLASSES:
+                if in_class:
+                    return None
+                out.append(f"[^{_RE2_CLASSES[escaped.lower()]}]")
+            elif escaped in "bBZ" or escaped.isdigit():
+                return None
+            else:
+                out.append(char + escaped)
+            i += 2
+            continue
+        if in_class:
+            if char == "]":
+                in_class = False
+        elif char == "[":
+            in_class = True
+            # ']' сразу после '[' или '[^' — обычный символ класса
+            start = i + 1
+            if pattern[start:start + 1] == "^":
+                start += 1
+            if pattern[start:start + 1] == "]":
+                out.append(pattern[i:start + 1])
+                i = start + 1
+                continue
+        elif pattern.startswith("(?", i) and pattern[i + 2:i + 3] in ("=", "!", "<") \
+                and not pattern.startswith("(?P<", i):
+            return None
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def regex_replace(values: pd.Series, pattern: str, repl: str) -> pd.Series:
+    """
+    values.str.replace(pattern, repl, regex=True) с одинаковым результатом для обоих видов строк:
+    для строк Arrow — векторизованно через RE2 (с переводом классов символов),
+    а если выражение в RE2 не переводится — через обычные строки Python.
+    """
+    if not is_arrow_string(values):
+        return values.str.replace(pattern, repl, regex=True)
+    translated = re2_pattern(pattern)
+    if translated is None or r"\g<" in repl:
+        return values.astype(object).str.replace(pattern, repl, regex=True).astype(values.dtype)
+    return values.str.replace(translated, repl, regex=True)
+
+
+def _arrow_array(values: pd.Series):
+    import pyarrow as pa
+    return pa.array(values)
+
+
+def _split_tokens(values: pd.Series):
+    """
+    Токены всех строк одним массивом Arrow и номера строк, к которым они относятся.
+    Пробельные символы у utf8_split_whitespace те же, что у str.split(), но пустые токены
+    по краям строки он оставляет — они отбрасываются.
+    """
+    import pyarrow.compute as pc
+    parts = pc.utf8_split_whitespace(_arrow_array(values).fill_null(""))
+    tokens = pc.list_flatten(parts)
+    non_empty = pc.not_equal(pc.utf8_length(tokens), 0)
+    parents = pc.list_parent_indices(parts).to_numpy()[non_empty.to_numpy(zero_copy_only=False)]
+    return tokens.filter(non_empty), parents
+
+
+def count_tokens(values: pd.Series) -> pd.Series:
+    """
+    Число токенов (слов через пробел) в каждой строке — то же, что values.str.split().map(len).
+    """
+    if not is_arrow_string(values):
+        return values.str.split().map(len)
+    _, parents = _split_tokens(values)
+    return pd.Series(np.bincount(parents, minlength=len(values)), index=values.index)
+
+
+def count_unique_tokens(values: pd.Series) -> int:
+    """Число различных токенов во всех строках колонки."""
+    if not is_arrow_string(values):
+        return len(set(chain.from_iterable(text.split() for text in values)))
+    import pyarrow.compute as pc
+    tokens, _ = _split_tokens(values)
+    return len(pc.unique(tokens))
+
+
+def count_sentences_column(values: pd.Series) -> pd.Series:
+    """
+    Число предложений в каждой строке — то же, что values.apply(count_sentences):
+    части между разделителями, в которых есть что-то кроме пробелов.
+    """
+    from .basic_text_metrics import count_sentences
+    if not is_arrow_string(values):
+        return values.apply(count_sentences)
+    import pyarrow.compute as pc
+    parts = pc.split_pattern_regex(_arrow_array(values).fill_null(""), pattern=r"[.!?]")
+    pieces = pc.list_flatten(parts)
+    non_blank = pc.match_substring_regex(pieces, pattern=re2_pattern(r"\S")).to_numpy(zero_copy_only=False)
+    parents = pc.list_parent_indices(parts).to_numpy()
+    counts = np.bincount(parents[non_blank], minlength=len(values))
+    return pd.Series(counts, index=values.index)
+
+
+def contains_word(values: pd.Series, word: str) -> pd.Series:
+    """
+    Есть ли в строке word как отдельное слово — то же, что values.str.contains(r'\\b' + re.escape(word) + r'\\b').
+    """
+    pattern = r'\b' + re.escape(word) + r'\b'
+    word_chars = _RE2_CLASSES["w"]
+    if not is_arrow_string(values) or not (re.match(r"\w", word[:1]) and re.match(r"\w", word[-1:])):
+        if is_arrow_string(values):
+            return values.astype(object).str.contains(pattern)
+        return values.str.contains(pattern)
+    import pyarrow.compute as pc
+    # В RE2 \b учитывает только ASCII, поэтому границы слова задаются классами явно;
+    # выражение передаётся в pyarrow напрямую: str.contains проверяет его модулем re, а тот не знает \p{...}
+    escaped = "".join("\\" + char if char in _RE2_SPECIAL else char for char in word)
+    matches = pc.match_substring_regex(
+        _arrow_array(values), pattern=f"(?:^|[^{word_chars}]){escaped}(?:$|[^{word_chars}])"
+    )
+    return pd.Series(matches.fill_null(False).to_numpy(zero_copy_only=False), index=values.index)
+
+
+def benchmark_string_storage(csv_path: Optional[str] = None, repeat: int = 3) -> pd.DataFrame:
+    """
+    Сравнивает память и скорость обработки текстов в обычных строках Python и в строках Arrow
+    на файле автора (по умолчанию — author_394.csv из data).
+
+    Замеряются: чтение CSV, объём колонки text, clean_text_column, compute_text_statistics
+    и подсчёт документной частоты слов (как в plot_matches_by_category). Лемматизация
+    одинакова для обоих способов хранения, поэтому токенами служит очищенный текст в нижнем регистре.
+
+    Выигрыш зависит от размера: на author_394.csv (0,3 МБ) строки Arrow экономят ~15% памяти
+    и ускоряют чтение, но clean_text_column и документная частота слов медленнее
+    (ratio ~0,77 и ~0,8); на том же файле, повторённом до 3,6 МБ, очистка быстрее в ~2,3 раза,
+    а документная частота остаётся медленнее (~0,84).
+
+    Возвращает:
+    - pd.DataFrame с индексом из замеров и колонками object, arrow, ratio (object / arrow)
+    """
+    from .resources import DATA_DIR
+    from .file_reader import load_diary_from_csv
+    from .preprocessing import clean_text_column
+    from .basic_text_metrics import compute_text_statistics
+    from .dict_viz import _document_frequencies
+
+    csv_path = csv_path or os.path.join(DATA_DIR, "author_394.csv")
+
+    def best_time(func) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    results = {}
+    for mode, arrow in (("object", False), ("arrow", True)):
+        df = load_diary_from_csv(csv_path, arrow_strings=arrow)
+        cleaned = clean_text_column(df.copy())
+        tokens = cleaned[["text"]].assign(tokens=cleaned["text"].str.lower()).drop(columns="text")
+        words = pd.Series(" ".join(tokens["tokens"].head(50)).split()).drop_duplicates().head(200).tolist()
+        results[mode] = {
+            "load_diary_from_csv, с": best_time(lambda: load_diary_from_csv(csv_path, arrow_strings=arrow)),
+            "text, МБ": df["text"].memory_usage(deep=True) / 2 ** 20,
+            "tokens, МБ": tokens["tokens"].memory_usage(deep=True) / 2 ** 20,
+            "clean_text_column, с": best_time(lambda: clean_text_column(df.copy())),
+            "compute_text_statistics, с": best_time(lambda: compute_text_statistics(tokens.copy())),
+            "документная частота слов, с": best_time(lambda: _document_frequencies(words, tokens["tokens"])),
+        }
+    table = pd.DataFrame(results)
+    table["ratio"] = table["object"] / table["arrow"]
+    return table
@@ -2,11 +2,22 @@ import pandas as pd
 import re
 from typing import Dict, Any
 
+from .arrow_strings import count_sentences_column, count_tokens, count_unique_tokens, regex_replace
+
+# Знаки препинания, кроме дефисов
+PUNCTUATION_PATTERN = r"[!\"#$%&'()*+,./:;<=>?@\[\]^_{|}~«»—]"
+
 def clean_punctuation(text: str) -> str:
     """
     Удаляет все знаки препинания, кроме дефисов.
     """
-    return re.sub(r"[!\"#$%&'()*+,./:;<=>?@\[\]^_{|}~«»—]", "", text)
+    return re.sub(PUNCTUATION_PATTERN, "", text)
+
+def clean_punctuation_column(values: pd.Series) -> pd.Series:
+    """
+    clean_punctuation для целой колонки (для строк Arrow — векторизованно).
+    """
+    return regex_replace(values, PUNCTUATION_PATTERN, "")
 
 def count_sentences(text: str) -> int:
     """
@@ -32,16 +43,15 @@ def compute_text_statistics(df: pd.DataFrame, token_column: str = "tokens") -> D
     - dict с метриками
     """
     # Подготовка колонки без пунктуации
-    df["tokens_no_punkt"] = df[token_column].apply(clean_punctuation)
+    df["tokens_no_punkt"] = clean_punctuation_column(df[token_column])
 
     num_records = df.shape[0]
-    avg_tokens_per_record = df[token_column].str.split().map(len).mean()
+    avg_tokens_per_record = count_tokens(df[token_column]).mean()
 
-    all_tokens = df["tokens_no_punkt"].str.split().sum()
-    total_tokens = len(all_tokens)
-    unique_tokens = len(set(all_tokens))
+    total_tokens = int(count_tokens(df["tokens_no_punkt"]).sum())
+    unique_tokens = count_unique_tokens(df["tokens_no_punkt"])
 
-    total_sentences = df[token_column].apply(count_sentences).sum()
+    total_sentences = count_sentences_column(df[token_column]).sum()
     avg_sentence_length = total_tokens / total_sentences if total_sentences > 0 else 0
 
     return {
@@ -0,0 +1,310 @@
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .file_reader import split_json_to_csv, load_diary_from_csv
+from .preprocessing import clean_text_column, add_year_column
+from .lemmatizer import LemmatizerNatasha, lemmatize_column
+from .basic_text_metrics import compute_text_statistics
+from .dict_match import load_custom_dictionaries, find_dictionary_matches
+from .sentiment import load_rusentilex_dict, analyze_sentiment, POLARITIES
+from .pipeline import DATA_DIR, DEFAULT_DICT_NAMES, list_person_ids
+from .shared_models import export_shared_models, load_shared_lemmatizer
+from .resources import get_resource_bundle, uses_bundle
+
+# Оценка памяти одного рабочего процесса: модели Natasha (~350 МБ) плюс данные одного автора
+DEFAULT_WORKER_MEMORY_MB = 700
+
+# То же при общих моделях (share_models=True): веса и словари слов лежат в общем кэше ОС,
+# в процессе остаются pymorphy2, интерпретатор и данные автора
+SHARED_WORKER_MEMORY_MB = 350
+
+# Через сколько авторов рабочий процесс перезапускается, чтобы не копить утечки памяти
+DEFAULT_MAX_TASKS_PER_WORKER = 50
+
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(data_dir: str, dict_names: List[str], shared_models_dir: Optional[str] = None) -> None:
+    """
+    Загружает модели и словари один раз на рабочий процесс.
+    Если указан shared_models_dir, модели подключаются из общих файлов (см. shared_models).
+    """
+    if shared_models_dir is not None:
+        _WORKER["lemmatizer"] = load_shared_lemmatizer(shared_models_dir)
+    else:
+        _WORKER["lemmatizer"] = LemmatizerNatasha()
+    _WORKER["lexicon"] = load_rusentilex_dict(os.path.join(data_dir, "rusentilex_clean.txt"))
+    _WORKER["phrase_dicts"] = load_custom_dictionaries(data_dir, dict_names)
+
+
+def prepare_author(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Очистка текстов автора и год записи — всё, что нужно до лемматизации.
+    """
+    df = clean_text_column(df, text_column="text")
+    return add_year_column(df, date_column="date")
+
+
+def score_author(df: pd.DataFrame, lexicon, phrase_dicts: Dict[str, set]) -> Dict[str, Any]:
+    """
+    Сводные показатели автора по лемматизированным записям (колонка tokens):
+    статистики текста, сентимент и совпадения со словарями.
+
+    Возвращает:
+    - dict — одна строка сводной таблицы
+    """
+    row: Dict[str, Any] = dict(compute_text_statistics(df, token_column="tokens"))
+    row["first_year"] = df["year"].min()
+    row["last_year"] = df["year"].max()
+
+    result, _, _, df = analyze_sentiment(df, "tokens", lexicon)
+    row["mean_rusentilex_score"] = round(float(df["rusentilex_score"].mean()), 4)
+    for polarity in POLARITIES:
+        row[f"sentiment_{polarity}"] = sum(result[source][polarity]["count"] for source in result)
+
+    totals = {category: 0 for category in phrase_dicts}
+    for text in df["tokens_no_punkt"]:
+        for category, matches in find_dictionary_matches(text, phrase_dicts).items():
+            totals[category] += len(matches)
+    row.update({f"dict_{category}": count for category, count in totals.items()})
+    return row
+
+
+def analyze_author(
+    df: pd.DataFrame,
+    lemmatizer: LemmatizerNatasha,
+    lexicon,
+    phrase_dicts: Dict[str, set]
+) -> Dict[str, Any]:
+    """
+    Считает сводные показатели одного автора: статистики текста,
+    сентимент и совпадения со словарями.
+
+    Возвращает:
+    - dict — одна строка сводной таблицы
+    """
+    df = prepare_author(df)
+    df = lemmatize_column(df, text_column="text", new_column="tokens", lemmatizer=lemmatizer)
+    return score_author(df, lexicon, phrase_dicts)
+
+
+def _process_author_file(person_id: int, csv_path: str) -> Dict[str, Any]:
+    df = load_diary_from_csv(csv_path)
+    row = {"person": person_id}
+    if df.empty:
+        row["error"] = "нет записей"
+        return row
+    row.update(analyze_author(df, _WORKER["lemmatizer"], _WORKER["lexicon"], _WORKER["phrase_dicts"]))
+    return row
+
+
+def plan_workers(
+    max_workers: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None,
+    worker_memory_mb: int = DEFAULT_WORKER_MEMORY_MB
+) -> int:
+    """
+    Определяет число рабочих процессов: не больше ядер и не больше,
+    чем помещается в бюджет памяти.
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if memory_limit_mb is not None:
+        workers = min(workers, memory_limit_mb // worker_memory_mb)
+    return max(1, workers)
+
+
+def resolve_author_files(
+    person_ids: Union[List[int], str],
+    diaries_path: Optional[str] = None,
+    notes_path: Optional[str] = None,
+    csv_dir: Optional[str] = None
+) -> Tuple[List[int], str, Optional[tempfile.TemporaryDirectory]]:
+    """
+    Готовит файлы author_<id>.csv для пакетной обработки: если csv_dir не указан,
+    JSON один раз разбивается на CSV во временной папке. "all" раскрывается в список ID.
+    Пул процессов читает авторов из CSV, поэтому JSON здесь разбивается заранее и целиком;
+    конвейер iter_process_authors_overlapped вместо этого читает JSON потоково, по автору.
+
+    Возвращает:
+    - список ID авторов
+    - папку с CSV-файлами
+    - временную папку (её нужно удалить после обработки) или None
+    """
+    tmp_dir = None
+    if csv_dir is None:
+        if diaries_path is None or notes_path is None:
+            raise ValueError("Укажите csv_dir или оба пути: diaries_path и notes_path")
+        tmp_dir = tempfile.TemporaryDirectory(prefix="prozhito_batch_")
+        csv_dir = tmp_dir.name
+        split_json_to_csv(diaries_path, notes_path, output_dir=csv_dir, save_csv=True)
+
+    if isinstance(person_ids, str):
+        if person_ids != "all":
+            raise ValueError("person_ids должен быть списком ID или строкой 'all'")
+        if diaries_path is not None:
+            person_ids = list_person_ids(diaries_path)
+        else:
+            person_ids = sorted(
+                int(name[len("author_"):-len(".csv")])
+                for name in os.listdir(csv_dir)
+                if name.startswith("author_") and name.endswith(".csv")
+            )
+    return list(person_ids), csv_dir, tmp_dir
+
+
+def iter_process_authors(
+    person_ids: Union[List[int], str],
+    diaries_path: Optional[str] = None,
+    notes_path: Optional[str] = None,
+    csv_dir: Optional[str] = None,
+    data_dir: str = DATA_DIR,
+    dict_names: Optional[List[str]] = None,
+    max_workers: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None,
+    worker_memory_mb: Optional[int] = None,
+    max_tasks_per_worker: int = DEFAULT_MAX_TASKS_PER_WORKER,
+    share_models: bool = True,
+    shared_models_dir: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Обрабатывает авторов в пуле процессов и выдаёт строки сводной таблицы по мере готовности.
+
+    Данные каждого автора читаются внутри рабочего процесса из отдельного CSV-файла,
+    поэтому в памяти одновременно находятся только авторы, которые обрабатываются прямо сейчас.
+    Число задач «в полёте» ограничено числом процессов.
+
+    Параметры:
+    - person_ids: список ID авторов или "all"
+    - diaries_path, notes_path: пути к diaries.json и notes.json (JSON один раз разбивается на CSV)
+    - csv_dir: папка с готовыми файлами author_<id>.csv (вместо JSON)
+    - data_dir: папка со словарями и RuSentiLex
+    - dict_names: список словарей (по умолчанию — все встроенные)
+    - max_workers: максимальное число процессов (по умолчанию — число ядер)
+    - memory_limit_mb: общий бюджет памяти на рабочие процессы
+    - worker_memory_mb: оценка памяти одного процесса (по умолчанию SHARED_WORKER_MEMORY_MB
+      или DEFAULT_WORKER_MEMORY_MB в зависимости от share_models)
+    - max_tasks_per_worker: через сколько авторов перезапускать процесс (Python 3.11+)
+    - share_models: подключать веса Natasha из общих файлов, отображённых в память,
+      вместо отдельной копии в каждом процессе
+    - shared_models_dir: папка для экспорта моделей (по умолчанию — временная);
+      готовый экспорт используется повторно
+    """
+    dict_names = list(dict_names or DEFAULT_DICT_NAMES)
+    person_ids, csv_dir, tmp_dir = resolve_author_files(person_ids, diaries_path, notes_path, csv_dir)
+
+    if share_models:
+        if shared_models_dir is None:
+            if tmp_dir is None:
+                tmp_dir = tempfile.TemporaryDirectory(prefix="prozhito_batch_")
+            shared_models_dir = os.path.join(tmp_dir.name, "models")
+        # Модели экспортируются один раз в родительском процессе, до запуска пула
+        export_shared_models(shared_models_dir)
+    else:
+        shared_models_dir = None
+
+    # Пакет ресурсов собирается до запуска пула; рабочие процессы только открывают его
+    if uses_bundle(data_dir):
+        get_resource_bundle(data_dir)
+
+    if worker_memory_mb is None:
+        worker_memory_mb = SHARED_WORKER_MEMORY_MB if share_models else DEFAULT_WORKER_MEMORY_MB
+
+    workers = plan_workers(max_workers, memory_limit_mb, worker_memory_mb)
+    executor_kwargs: Dict[str, Any] = {
+        "max_workers": workers,
+        "initializer": _init_worker,
+        "initargs": (data_dir, dict_names, shared_models_dir),
+    }
+    if sys.version_info >= (3, 11):
+        executor_kwargs["max_tasks_per_child"] = max_tasks_per_worker
+
+    try:
+        with ProcessPoolExecutor(**executor_kwargs) as executor:
+            pending = {}
+            queue = iter(person_ids)
+            exhausted = False
+            while True:
+                # Держим в работе не больше задач, чем процессов
+                while not exhausted and len(pending) < workers:
+                    try:
+                        person_id = next(queue)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    csv_path = os.path.join(csv_dir, f"author_{int(person_id)}.csv")
+                    if not os.path.exists(csv_path):
+                        yield {"person": person_id, "error": "файл автора не найден"}
+                        continue
+                    pending[executor.submit(_process_author_file, int(person_id), csv_path)] = person_id
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    person_id = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as exc:
+                        yield {"person": person_id, "error": repr(exc)}
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+def process_authors(
+    person_ids: Union[List[int], str],
+    output_path: Optional[str] = None,
+    overlapped: bool = False,
+    **kwargs
+) -> pd.DataFrame:
+    """
+    Пакетно обрабатывает авторов (см. iter_process_authors) и собирает сводную таблицу.
+
+    Параметры:
+    - person_ids: список ID авторов или "all"
+    - output_path: если указан, строки дописываются в этот CSV-файл по мере готовности
+    - overlapped: обрабатывать в одном процессе с совмещением этапов
+      (см. overlapped.iter_process_authors_overlapped) вместо пула процессов
+    - kwargs: параметры iter_process_authors или iter_process_authors_overlapped
+
+    Возвращает:
+    - pd.DataFrame — одна строка на автора
+    """
+    rows = []
+    columns: Optional[List[str]] = None
+    unwritten: List[Dict[str, Any]] = []
+
+    def flush(batch):
+        pd.DataFrame(batch).reindex(columns=columns).to_csv(
+            output_path, mode="a", header=False, index=False, encoding="utf-8"
+        )
+
+    if overlapped:
+        from .overlapped import iter_process_authors_overlapped
+        rows_iter = iter_process_authors_overlapped(person_ids, **kwargs)
+    else:
+        rows_iter = iter_process_authors(person_ids, **kwargs)
+
+    for row in rows_iter:
+        rows.append(row)
+        if output_path is None:
+            continue
+        unwritten.append(row)
+        # Набор колонок фиксируется по первой успешной строке, дальше строки дописываются сразу
+        if columns is None and "error" not in row:
+            columns = list(row) + ["error"]
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False, encoding="utf-8")
+        if columns is not None:
+            flush(unwritten)
+            unwritten = []
+
+    if output_path is not None and columns is None:
+        columns = list(pd.DataFrame(unwritten).columns)
+        pd.DataFrame(unwritten).to_csv(output_path, index=False, encoding="utf-8")
+    return pd.DataFrame(rows)
@@ -0,0 +1,343 @@
+import os
+import copy
+import pickle
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .tfidf import compute_tfidf_by_year, display_tfidf_year
+from .hashed_tfidf import N_FEATURES
+from .dict_match import match_custom_dictionaries, load_custom_dictionaries, print_dictionary_matches
+from .sentiment import analyze_sentiment
+
+# Ограничения кэша по умолчанию
+DEFAULT_MAX_MEMORY_ITEMS = 64
+DEFAULT_MAX_MEMORY_MB = 256
+DEFAULT_MAX_DISK_MB = 1024
+
+# Хеши файлов ресурсов: путь → (размер, время изменения, хеш); файл перечитывается, только если он изменился
+_FILE_DIGESTS: Dict[str, Tuple[int, int, str]] = {}
+
+
+def frame_fingerprint(df: pd.DataFrame, columns: Iterable[str]) -> str:
+    """
+    Быстрый отпечаток содержимого колонок DataFrame (вместе с индексом и типами колонок).
+    """
+    columns = list(columns)
+    hashes = pd.util.hash_pandas_object(df[columns], index=True).values
+    digest = hashlib.sha256(hashes.tobytes())
+    digest.update(repr([(column, str(df[column].dtype)) for column in columns]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """
+    Хеш содержимого файла. Повторно файл читается, только если изменились его размер или время изменения.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = _FILE_DIGESTS.get(path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    _FILE_DIGESTS[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def lexicon_fingerprint(lexicon: Dict[str, Dict[str, Iterable[str]]]) -> str:
+    """
+    Отпечаток лексикона (например, результата load_rusentilex_dict), не зависящий от порядка элементов.
+    """
+    digest = hashlib.sha256()
+    for source in sorted(lexicon):
+        for polarity in sorted(lexicon[source]):
+            digest.update(f"\x00{source}\x00{polarity}\x00".encode("utf-8"))
+            digest.update("\x01".join(sorted(lexicon[source][polarity])).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Кэш результатов анализа с двумя уровнями: в памяти и (по желанию) на диске.
+
+    Ключ записи строится из названия функции и отпечатков входных данных, параметров
+    и файлов ресурсов (см. make_key), поэтому изменение данных, параметров или словарей
+    само по себе приводит к пересчёту. В памяти хранится не больше max_memory_items записей
+    и не больше max_memory_mb мегабайт (вытесняются давно не использованные);
+    на диске — не больше max_disk_mb мегабайт (удаляются файлы, к которым дольше всего не обращались).
+
+    Параметры:
+    - cache_dir: папка для дискового уровня (если None — только память)
+    - max_memory_items: максимальное число записей в памяти
+    - max_memory_mb: максимальный объём записей в памяти (по размеру в pickle)
+    - max_disk_mb: максимальный объём папки кэша
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_memory_items: int = DEFAULT_MAX_MEMORY_ITEMS,
+        max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+        max_disk_mb: float = DEFAULT_MAX_DISK_MB
+    ):
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._memory: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(name: str, *parts: Any) -> str:
+        """
+        Строит ключ записи: название функции и хеш от частей ключа (отпечатков и параметров).
+        """
+        digest = hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()
+        return f"{name}-{digest}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def _remember(self, key: str, value: Any, size: int) -> None:
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = (value, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_memory_items or self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Возвращает значение из памяти или с диска (и поднимает его в память).
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key][0]
+        if self.cache_dir is not None and os.path.exists(self._disk_path(key)):
+            path = self._disk_path(key)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            value = pickle.loads(data)
+            self._remember(key, value, len(data))
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._memory or (self.cache_dir is not None and os.path.exists(self._disk_path(key)))
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Сохраняет значение в память и на диск.
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(data))
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    def _disk_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict_disk(self) -> None:
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Возвращает сохранённое значение или вычисляет его через compute() и сохраняет.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, name: Optional[str] = None, key: Optional[str] = None) -> int:
+        """
+        Удаляет записи из обоих уровней: одну запись по ключу, все записи функции name
+        или (без аргументов) весь кэш.
+
+        Возвращает:
+        - число удалённых записей
+        """
+        def matches(entry_key: str) -> bool:
+            if key is not None:
+                return entry_key == key
+            if name is not None:
+                return entry_key.startswith(f"{name}-")
+            return True
+
+        removed = set()
+        for entry_key in [k for k in self._memory if matches(k)]:
+            self._memory_bytes -= self._memory.pop(entry_key)[1]
+            removed.add(entry_key)
+        if self.cache_dir is not None:
+            for _, _, file_name in self._disk_entries():
+                entry_key = file_name[:-len(".pkl")]
+                if matches(entry_key):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                    removed.add(entry_key)
+        return len(removed)
+
+    def clear(self) -> int:
+        """Очищает весь кэш."""
+        return self.invalidate()
+
+    def stats(self) -> Dict[str, int]:
+        """Число записей и объём каждого уровня, число попаданий и промахов."""
+        disk = self._disk_entries() if self.cache_dir is not None else []
+        return {
+            "memory_items": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_items": len(disk),
+            "disk_bytes": sum(size for _, size, _ in disk),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_DEFAULT_CACHE: Optional[ResultCache] = None
+
+
+def get_default_cache() -> ResultCache:
+    """Кэш, который используют функции cached_* без явного параметра cache (по умолчанию — только в памяти)."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = ResultCache()
+    return _DEFAULT_CACHE
+
+
+def set_default_cache(cache: ResultCache) -> None:
+    """Заменяет кэш по умолчанию (например, на кэш с папкой на диске)."""
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = cache
+
+
+def cached_analyze_sentiment(
+    df: pd.DataFrame,
+    text_column: str,
+    lexicon,
+    method: str = "substring",
+    cache: Optional[ResultCache] = None
+):
+    """
+    analyze_sentiment с кэшированием: при тех же текстах, лексиконе и методе результат
+    берётся из кэша. Как и analyze_sentiment, добавляет в df колонку rusentilex_score.
+    Для method="surface" ключ учитывает и хеш таблицы словоформ (SurfaceForms.digest).
+    """
+    cache = cache or get_default_cache()
+    forms_digest = None
+    if method == "surface":
+        from .surface_forms import get_surface_forms, lexicon_vocabulary
+        forms_digest = get_surface_forms(lexicon_vocabulary(lexicon)).digest()
+    key = cache.make_key(
+        "analyze_sentiment", frame_fingerprint(df, [text_column]), lexicon_fingerprint(lexicon), method, forms_digest
+    )
+
+    def compute():
+        result, total_unique_words, total_category_words, scored = analyze_sentiment(
+            df[[text_column]].copy(), text_column, lexicon, method=method
+        )
+        # defaultdict с лямбдами не сериализуется — сохраняем обычные словари
+        result = {source: {polarity: dict(values) for polarity, values in polarities.items()}
+                  for source, polarities in result.items()}
+        return result, total_unique_words, total_category_words, scored['rusentilex_score'].values
+
+    result, total_unique_words, total_category_words, scores = cache.get_or_compute(key, compute)
+    df['rusentilex_score'] = np.array(scores)
+    # Копия, чтобы изменения результата не попали в кэш
+    return copy.deepcopy(result), total_unique_words, dict(total_category_words), df
+
+
+def cached_match_custom_dictionaries(
+    df: pd.DataFrame,
+    text_column: str,
+    dict_dir: str,
+    dict_names: List[str],
+    show_details: bool = True,
+    verbose: bool = True,
+    cache: Optional[ResultCache] = None
+):
+    """
+    match_custom_dictionaries с кэшированием: ключ учитывает тексты и содержимое файлов словарей.
+    """
+    cache = cache or get_default_cache()
+    dict_hashes = [(name, file_digest(os.path.join(dict_dir, f"{name}_lemm.txt"))) for name in dict_names]
+    key = cache.make_key("match_custom_dictionaries", frame_fingerprint(df, [text_column]), dict_hashes)
+
+    hit = key in cache
+    total_matches, unique_matches = cache.get_or_compute(
+        key,
+        lambda: match_custom_dictionaries(df, text_column, dict_dir, dict_names, show_details=show_details, verbose=verbose)
+    )
+    if hit and verbose:
+        phrase_dicts = load_custom_dictionaries(dict_dir, dict_names)
+        print("Загружены словари:")
+        for name, word_set in phrase_dicts.items():
+            print(f"  {name}: {len(word_set)} элементов")
+        print_dictionary_matches(phrase_dicts, total_matches, unique_matches, show_details=show_details)
+    return copy.deepcopy(total_matches), copy.deepcopy(unique_matches)
+
+
+def cached_compute_tfidf_by_year(
+    df: pd.DataFrame,
+    text_column: str,
+    year_column: str,
+    stop_words_path: str,
+    top_n: int = 20,
+    display_year=None,
+    method: str = "exact",
+    n_features: int = N_FEATURES,
+    cache: Optional[ResultCache] = None
+) -> pd.DataFrame:
+    """
+    compute_tfidf_by_year с кэшированием: ключ учитывает тексты, годы, top_n, метод
+    (и n_features для method="hashed") и содержимое файла стоп-слов.
+    """
+    cache = cache or get_default_cache()
+    key = cache.make_key(
+        "compute_tfidf_by_year", frame_fingerprint(df, [text_column, year_column]), file_digest(stop_words_path),
+        top_n, method, n_features if method == "hashed" else None
+    )
+    result_df = cache.get_or_compute(
+        key,
+        lambda: compute_tfidf_by_year(
+            df, text_column, year_column, stop_words_path, top_n=top_n, method=method, n_features=n_features
+        )
+    )
+    if display_year is not None:
+        display_tfidf_year(result_df, display_year)
+    return result_df.copy()
@@ -0,0 +1,336 @@
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from .preprocessing import clean_text_column, add_year_column
+from .lemmatizer import LemmatizerNatasha, lemmatize_column
+from .basic_text_metrics import clean_punctuation, count_sentences
+from .dict_match import find_dictionary_matches
+from .schema import ensure_datetime
+from .sentiment import make_sentiment_scorer, compute_sentiment_counts, SOURCES, POLARITIES
+
+# --- Генераторы этапов: принимают и выдают куски DataFrame ---
+
+
+def iter_csv_chunks(file_path: str, chunksize: int = 1000) -> Iterator[pd.DataFrame]:
+    """
+    Читает CSV-файл (например, выгрузку split_json_to_csv) кусками по chunksize строк.
+    """
+    for chunk in pd.read_csv(file_path, sep=",", chunksize=chunksize):
+        yield chunk
+
+
+def iter_clean(chunks: Iterable[pd.DataFrame], text_column: str = "text") -> Iterator[pd.DataFrame]:
+    """Применяет clean_text_column к каждому куску."""
+    for chunk in chunks:
+        yield clean_text_column(chunk, text_column=text_column)
+
+
+def iter_add_year(chunks: Iterable[pd.DataFrame], date_column: str = "date") -> Iterator[pd.DataFrame]:
+    """Применяет add_year_column к каждому куску."""
+    for chunk in chunks:
+        yield add_year_column(chunk, date_column=date_column)
+
+
+def iter_lemmatize(
+    chunks: Iterable[pd.DataFrame],
+    text_column: str = "text",
+    new_column: str = "tokens",
+    lemmatizer: Optional[LemmatizerNatasha] = None,
+    add_no_punkt: bool = True
+) -> Iterator[pd.DataFrame]:
+    """
+    Лемматизирует каждый кусок одним и тем же лемматизатором
+    и (по желанию) добавляет колонку tokens_no_punkt.
+    """
+    lemmatizer = lemmatizer or LemmatizerNatasha()
+    for chunk in chunks:
+        chunk = lemmatize_column(chunk, text_column=text_column, new_column=new_column, lemmatizer=lemmatizer)
+        if add_no_punkt:
+            chunk["tokens_no_punkt"] = chunk[new_column].apply(clean_punctuation)
+        yield chunk
+
+
+def iter_score_sentiment(
+    chunks: Iterable[pd.DataFrame],
+    text_column: str,
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    method: str = "sparse"
+) -> Iterator[pd.DataFrame]:
+    """
+    Добавляет к каждому куску колонки positive, neutral, negative и rusentilex_score.
+    method: "sparse" (векторизованно, см. SparseSentimentScorer) или "substring";
+    совпадения те же, что у analyze_sentiment.
+    """
+    scorer = make_sentiment_scorer(lexicon, method)
+    for chunk in chunks:
+        counts = compute_sentiment_counts(chunk[text_column], lexicon, scorer=scorer)
+        for column in POLARITIES + ['rusentilex_score']:
+            chunk[column] = counts[column].values
+        yield chunk
+
+
+# --- Агрегаторы: накапливают частичные результаты и объединяются между собой ---
+
+
+class TextStatisticsAggregator:
+    """
+    Накопительный аналог compute_text_statistics.
+    """
+
+    def __init__(self, token_column: str = "tokens"):
+        self.token_column = token_column
+        self.num_records = 0
+        self.tokens_with_punkt = 0
+        self.total_tokens = 0
+        self.total_sentences = 0
+        self.vocabulary: Set[str] = set()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        texts = chunk[self.token_column]
+        no_punkt = texts.apply(clean_punctuation).str.split()
+
+        self.num_records += len(chunk)
+        self.tokens_with_punkt += int(texts.str.split().map(len).sum())
+        self.total_tokens += int(no_punkt.map(len).sum())
+        self.total_sentences += int(texts.apply(count_sentences).sum())
+        for tokens in no_punkt:
+            self.vocabulary.update(tokens)
+
+    def merge(self, other: "TextStatisticsAggregator") -> "TextStatisticsAggregator":
+        self.num_records += other.num_records
+        self.tokens_with_punkt += other.tokens_with_punkt
+        self.total_tokens += other.total_tokens
+        self.total_sentences += other.total_sentences
+        self.vocabulary |= other.vocabulary
+        return self
+
+    def result(self) -> Dict[str, Any]:
+        avg_tokens_per_record = self.tokens_with_punkt / self.num_records if self.num_records else 0
+        avg_sentence_length = self.total_tokens / self.total_sentences if self.total_sentences > 0 else 0
+        return {
+            "Количество записей": self.num_records,
+            "Средний объем записей (в токенах)": round(avg_tokens_per_record, 2),
+            "Общее количество токенов": self.total_tokens,
+            "Количество уникальных токенов": len(self.vocabulary),
+            "Средняя длина предложения (в токенах)": round(avg_sentence_length, 2)
+        }
+
+
+class TfidfAggregator:
+    """
+    Накопительный подсчёт TF-IDF по годам.
+
+    Первый проход (update) копит для каждого года число документов, документную частоту
+    слов и сумму L2-нормированных частот слов по документам. Оценка только по первому
+    проходу — эта сумма, умноженная на сглаженный IDF: документ нормируется до умножения
+    на IDF, поэтому такие оценки годятся лишь для ранжирования (по величине они отличаются
+    от compute_tfidf_by_year в разы). Второй проход по тем же кускам (rescore) считает
+    TF-IDF каждого документа с итоговым IDF и нормирует его после умножения, как
+    TfidfVectorizer, — тогда result совпадает с compute_tfidf_by_year.
+    Токенизация и стоп-слова — те же, что у TfidfVectorizer.
+    Словарь каждого года хранится целиком, поэтому память растёт с объёмом корпуса
+    (ограниченную память даёт HashedTfidfAggregator).
+    """
+
+    def __init__(self, text_column: str, year_column: str, stop_words: Optional[List[str]] = None):
+        self.text_column = text_column
+        self.year_column = year_column
+        self.analyzer = CountVectorizer(stop_words=stop_words).build_analyzer()
+        self.n_docs: Counter = Counter()
+        self.doc_freq: Dict[Any, Counter] = defaultdict(Counter)
+        self.norm_tf: Dict[Any, Counter] = defaultdict(Counter)
+        self.scores: Dict[Any, Counter] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for year, text in zip(chunk[self.year_column], chunk[self.text_column]):
+            if pd.isna(year):
+                continue
+            counts = Counter(self.analyzer(text))
+            self.n_docs[year] += 1
+            if not counts:
+                continue
+            norm = np.sqrt(sum(value * value for value in counts.values()))
+            self.doc_freq[year].update(counts.keys())
+            year_tf = self.norm_tf[year]
+            for word, value in counts.items():
+                year_tf[word] += value / norm
+        # Новые документы меняют IDF, поэтому оценки второго прохода устаревают
+        self.scores = {}
+
+    def idf(self, year: Any, word: str) -> float:
+        """Сглаженный IDF слова за год (как в TfidfVectorizer)."""
+        return np.log((1 + self.n_docs[year]) / (1 + self.doc_freq[year][word])) + 1
+
+    def rescore(self, chunks: Iterable[pd.DataFrame]) -> None:
+        """
+        Второй проход: точные суммы TF-IDF по документам с итоговым IDF.
+        chunks — те же куски, что были переданы в update.
+        """
+        scores: Dict[Any, Counter] = {year: Counter() for year in self.n_docs}
+        idfs: Dict[Any, Dict[str, float]] = {year: {} for year in self.n_docs}
+        for chunk in chunks:
+            for year, text in zip(chunk[self.year_column], chunk[self.text_column]):
+                if pd.isna(year):
+                    continue
+                counts = Counter(self.analyzer(text))
+                if not counts:
+                    continue
+                year_idf = idfs[year]
+                weights = {}
+                for word, value in counts.items():
+                    if word not in year_idf:
+                        year_idf[word] = self.idf(year, word)
+                    weights[word] = value * year_idf[word]
+                norm = np.sqrt(sum(value * value for value in weights.values()))
+                year_scores = scores[year]
+                for word, value in weights.items():
+                    year_scores[word] += value / norm
+        self.scores = scores
+
+    def merge(self, other: "TfidfAggregator") -> "TfidfAggregator":
+        self.n_docs.update(other.n_docs)
+        for year in other.doc_freq:
+            self.doc_freq[year].update(other.doc_freq[year])
+            self.norm_tf[year].update(other.norm_tf[year])
+        self.scores = {}
+        return self
+
+    def result(self, top_n: int = 20) -> pd.DataFrame:
+        """
+        Возвращает таблицу в формате compute_tfidf_by_year: TF-IDF, word, year.
+        Оценки точные после rescore, иначе — приближённые (только для ранжирования).
+        """
+        frames = []
+        for year in sorted(self.n_docs):
+            if not self.norm_tf[year]:
+                continue
+            words = list(self.norm_tf[year])
+            if year in self.scores:
+                scores = np.array([self.scores[year][word] for word in words])
+            else:
+                df_counts = np.array([self.doc_freq[year][word] for word in words], dtype=float)
+                idf = np.log((1 + self.n_docs[year]) / (1 + df_counts)) + 1
+                scores = np.array([self.norm_tf[year][word] for word in words]) * idf
+            temp_df = pd.DataFrame({'TF-IDF': scores, 'word': words}).sort_values('TF-IDF', ascending=False)
+            temp_df['year'] = year
+            frames.append(temp_df.head(top_n))
+        if not frames:
+            return pd.DataFrame(columns=['TF-IDF', 'word', 'year'])
+        return pd.concat(frames, ignore_index=True)
+
+
+class DictionaryTotalsAggregator:
+    """
+    Накопительный аналог match_custom_dictionaries (без печати).
+    """
+
+    def __init__(self, phrase_dicts: Dict[str, Set[str]], text_column: str = "tokens_no_punkt"):
+        self.phrase_dicts = phrase_dicts
+        self.text_column = text_column
+        self.total_matches: Dict[str, int] = defaultdict(int)
+        self.unique_matches: Dict[str, Set[str]] = defaultdict(set)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for text in chunk[self.text_column]:
+            for category, matches in find_dictionary_matches(text, self.phrase_dicts).items():
+                if category == 'phraseologisms_compound' and not matches:
+                    continue
+                self.total_matches[category] += len(matches)
+                self.unique_matches[category].update(matches)
+
+    def merge(self, other: "DictionaryTotalsAggregator") -> "DictionaryTotalsAggregator":
+        for category, count in other.total_matches.items():
+            self.total_matches[category] += count
+        for category, words in other.unique_matches.items():
+            self.unique_matches[category] |= words
+        return self
+
+    def result(self) -> Tuple[Dict[str, int], Dict[str, Set[str]]]:
+        return self.total_matches, self.unique_matches
+
+
+class SentimentAggregator:
+    """
+    Накопительный сентимент-анализ: сводка по категориям в формате analyze_sentiment
+    и средний сентимент по дням (для plot_sentiment_dynamics / plot_sentiment_calendar).
+    method: "sparse" (векторизованно) или "substring" — совпадения те же, что у analyze_sentiment.
+    """
+
+    def __init__(
+        self,
+        lexicon: Dict[str, Dict[str, Set[str]]],
+        text_column: str = "tokens",
+        date_column: str = "date",
+        method: str = "sparse"
+    ):
+        self.lexicon = lexicon
+        self.text_column = text_column
+        self.date_column = date_column
+        self.scorer = make_sentiment_scorer(lexicon, method)
+        self.counts = {column: 0 for column in self.scorer.columns}
+        self.words: Dict[Tuple[str, str], Set[str]] = {column: set() for column in self.scorer.columns}
+        self.total_unique_words = 0
+        self.daily_sum = pd.Series(dtype=float)
+        self.daily_notes = pd.Series(dtype=float)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        texts = chunk[self.text_column]
+        counts, words = self.scorer.score(texts)
+        for col, column in enumerate(self.scorer.columns):
+            self.counts[column] += int(counts[:, col].sum())
+            self.words[column] |= words[column]
+        self.total_unique_words += int(texts.apply(lambda x: len(set(x.split()))).sum())
+
+        _, scores = self.scorer.polarity_scores(counts)
+        dates = ensure_datetime(chunk[self.date_column]).values
+        partial = pd.DataFrame({"date": dates, "score": scores}).dropna(subset=["date"]).groupby("date")["score"]
+        self.daily_sum = self.daily_sum.add(partial.sum(), fill_value=0)
+        self.daily_notes = self.daily_notes.add(partial.count(), fill_value=0)
+
+    def merge(self, other: "SentimentAggregator") -> "SentimentAggregator":
+        for column in self.scorer.columns:
+            self.counts[column] += other.counts[column]
+            self.words[column] |= other.words[column]
+        self.total_unique_words += other.total_unique_words
+        self.daily_sum = self.daily_sum.add(other.daily_sum, fill_value=0)
+        self.daily_notes = self.daily_notes.add(other.daily_notes, fill_value=0)
+        return self
+
+    def result(self) -> Tuple[Dict, int, Dict[str, int], pd.DataFrame]:
+        """
+        Возвращает результаты по категориям, общее число уникальных слов,
+        число слов в каждой категории словаря и таблицу date / rusentilex_score по дням.
+        """
+        result = {
+            source: {polarity: {'words': self.words[(source, polarity)], 'count': self.counts[(source, polarity)]}
+                     for polarity in POLARITIES}
+            for source in SOURCES
+        }
+        total_category_words = {
+            source: sum(len(self.lexicon[source][pol]) for pol in POLARITIES)
+            for source in SOURCES
+        }
+        daily = (self.daily_sum / self.daily_notes).rename('rusentilex_score').rename_axis('date').reset_index()
+        return result, self.total_unique_words, total_category_words, daily
+
+
+def consume(chunks: Iterable[pd.DataFrame], *aggregators) -> None:
+    """
+    Прогоняет все куски через агрегаторы. Из входных данных в памяти одновременно находится
+    только один кусок, но агрегаторы растут вместе с корпусом: словари лемм, множества найденных
+    слов, суммы по дням.
+
+    Пример:
+        chunks = iter_lemmatize(iter_add_year(iter_clean(iter_csv_chunks("author_394.csv", 500))))
+        stats = TextStatisticsAggregator()
+        sentiment = SentimentAggregator(lexicon)
+        consume(chunks, stats, sentiment)
+        stats.result()
+    """
+    for chunk in chunks:
+        for aggregator in aggregators:
+            aggregator.update(chunk)
@@ -0,0 +1,201 @@
+import argparse
+import glob
+import os
+import sys
+from typing import List, Optional
+
+import pandas as pd
+
+from .file_reader import split_json_to_csv, load_diary_from_csv
+from .incremental import IncrementalCorpus
+from .batch import DEFAULT_WORKER_MEMORY_MB, SHARED_WORKER_MEMORY_MB, process_authors
+from .overlapped import DEFAULT_QUEUE_SIZE
+from .server import DEFAULT_HOST, DEFAULT_PORT, serve
+from .pipeline import DATA_DIR, DEFAULT_DICT_NAMES, build_default_pipeline, list_person_ids, summarize_results
+
+
+def _parse_person_ids(values: List[str], diaries_path: Optional[str]) -> List[int]:
+    if values == ["all"]:
+        if diaries_path is None:
+            raise SystemExit("Для --persons all нужен путь к diaries.json (--diaries)")
+        return list_person_ids(diaries_path)
+    return [int(value) for value in values]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="prozhito-nlp",
+        description="NLP-инструменты для анализа дневниковых текстов из корпуса Прожито"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Запустить конвейер обработки с контрольными точками")
+    run.add_argument("--diaries", help="Путь к diaries.json")
+    run.add_argument("--notes", help="Путь к notes.json")
+    run.add_argument("--csv-dir", help="Папка с файлами author_<id>.csv (вместо JSON)")
+    run.add_argument("--persons", nargs="+", required=True, help="ID авторов или 'all'")
+    run.add_argument("--data-dir", default=DATA_DIR, help="Папка со словарями и стоп-словами")
+    run.add_argument("--dicts", nargs="+", help="Названия словарей (без _lemm.txt)")
+    run.add_argument("--checkpoint-dir", default="checkpoints", help="Папка для контрольных точек")
+    run.add_argument("--stages", nargs="+", help="Целевые этапы (по умолчанию — все)")
+    run.add_argument("--top-n", type=int, default=20, help="Сколько слов TF-IDF сохранять на год")
+    run.add_argument("--dedup-threshold", type=float,
+                     help="Лемматизировать и оценивать почти одинаковые записи один раз (порог сходства 0–1)")
+    run.add_argument("--force", action="store_true", help="Пересчитать все этапы")
+    run.add_argument("--output", help="CSV-файл для сводной таблицы по авторам")
+    run.add_argument("--quiet", action="store_true", help="Не печатать ход выполнения")
+
+    update = subparsers.add_parser("update", help="Инкрементально обработать новые и изменённые записи")
+    update.add_argument("--diaries", help="Путь к diaries.json")
+    update.add_argument("--notes", help="Путь к notes.json")
+    update.add_argument("--csv-dir", help="Папка с файлами author_<id>.csv (вместо JSON)")
+    update.add_argument("--store-dir", default="incremental", help="Папка с сохранённым состоянием")
+    update.add_argument("--data-dir", default=DATA_DIR, help="Папка со словарями и стоп-словами")
+    update.add_argument("--dicts", nargs="+", help="Названия словарей (без _lemm.txt)")
+    update.add_argument("--top-n", type=int, default=20, help="Сколько слов TF-IDF сохранять на год")
+    update.add_argument("--full-snapshot", action="store_true",
+                        help="Считать выгрузку полной и удалять записи, которых в ней нет")
+
+    batch = subparsers.add_parser("batch", help="Обработать много авторов в пуле процессов")
+    batch.add_argument("--diaries", help="Путь к diaries.json")
+    batch.add_argument("--notes", help="Путь к notes.json")
+    batch.add_argument("--csv-dir", help="Папка с файлами author_<id>.csv (вместо JSON)")
+    batch.add_argument("--persons", nargs="+", required=True, help="ID авторов или 'all'")
+    batch.add_argument("--data-dir", default=DATA_DIR, help="Папка со словарями и стоп-словами")
+    batch.add_argument("--dicts", nargs="+", help="Названия словарей (без _lemm.txt)")
+    batch.add_argument("--workers", type=int, help="Максимальное число процессов")
+    batch.add_argument("--memory-limit-mb", type=int, help="Бюджет памяти на все процессы, МБ")
+    batch.add_argument("--worker-memory-mb", type=int,
+                       help="Оценка памяти одного процесса, МБ "
+                            f"(по умолчанию {SHARED_WORKER_MEMORY_MB}, с --no-shared-models — {DEFAULT_WORKER_MEMORY_MB})")
+    batch.add_argument("--no-shared-models", action="store_true",
+                       help="Загружать модели Natasha в каждый процесс отдельно")
+    batch.add_argument("--shared-models-dir", help="Папка для общих файлов моделей (по умолчанию — временная)")
+    batch.add_argument("--overlapped", action="store_true",
+                       help="Один процесс: чтение, очистка, разметка и подсчёт разных авторов идут одновременно")
+    batch.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                       help="Сколько авторов может ждать между этапами (с --overlapped)")
+    batch.add_argument("--output", required=True, help="CSV-файл для сводной таблицы")
+
+    server = subparsers.add_parser("serve", help="Запустить локальный сервис анализа")
+    server.add_argument("--host", default=DEFAULT_HOST, help="Адрес для HTTP")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT, help="Порт для HTTP")
+    server.add_argument("--socket", help="Путь к Unix-сокету (вместо HTTP-порта)")
+    server.add_argument("--data-dir", default=DATA_DIR, help="Папка с rusentilex_clean.txt")
+    server.add_argument("--max-batch-size", type=int, default=32, help="Максимум запросов в пакете")
+    server.add_argument("--max-wait-ms", type=float, default=10, help="Ожидание запросов для пакета, мс")
+    return parser
+
+
+def _run(args: argparse.Namespace) -> int:
+    pipeline = build_default_pipeline(
+        diaries_path=args.diaries,
+        notes_path=args.notes,
+        csv_dir=args.csv_dir,
+        data_dir=args.data_dir,
+        dict_names=args.dicts,
+        checkpoint_dir=args.checkpoint_dir,
+        top_n=args.top_n,
+        dedup_threshold=args.dedup_threshold,
+        verbose=not args.quiet
+    )
+    person_ids = _parse_person_ids(args.persons, args.diaries)
+
+    targets = args.stages
+    if targets is not None and args.dedup_threshold is not None and "lemmatize" not in targets:
+        # Отчёт о дедупликации хранится в результате этапа lemmatize
+        targets = [*targets, "lemmatize"]
+
+    results = {}
+    for person_id in person_ids:
+        results[person_id] = pipeline.run(person_id, targets=targets, force=args.force)
+        if not args.quiet:
+            statuses = ", ".join(f"{name}: {status}" for name, status in pipeline.last_status.items())
+            print(f"[author_{person_id}] {statuses}")
+            lemmatized = results[person_id].get("lemmatize")
+            if lemmatized is not None and "dedup_report" in lemmatized.attrs:
+                report = ", ".join(f"{key}: {value}" for key, value in lemmatized.attrs["dedup_report"].items())
+                print(f"[author_{person_id}] дедупликация — {report}")
+
+    summary = summarize_results(results)
+    if args.output:
+        summary.to_csv(args.output, index=False, encoding="utf-8")
+    elif not args.quiet:
+        print(summary.to_string(index=False))
+    return 0
+
+
+def _update(args: argparse.Namespace) -> int:
+    if args.csv_dir is not None:
+        paths = sorted(glob.glob(os.path.join(args.csv_dir, "author_*.csv")))
+        if not paths:
+            raise SystemExit(f"В папке {args.csv_dir} нет файлов author_<id>.csv")
+        df = pd.concat([load_diary_from_csv(path) for path in paths], ignore_index=True)
+    elif args.diaries and args.notes:
+        df = split_json_to_csv(args.diaries, args.notes, save_csv=False, return_dataframe=True)
+    else:
+        raise SystemExit("Укажите --csv-dir или оба пути: --diaries и --notes")
+
+    corpus = IncrementalCorpus(
+        store_dir=args.store_dir,
+        dict_dir=args.data_dir,
+        dict_names=args.dicts or DEFAULT_DICT_NAMES,
+        lexicon_path=os.path.join(args.data_dir, "rusentilex_clean.txt"),
+        stop_words_path=os.path.join(args.data_dir, "stop_words.txt"),
+        top_n=args.top_n
+    )
+    report = corpus.update(df, full_snapshot=args.full_snapshot)
+    print(", ".join(f"{key}: {value}" for key, value in report.items()))
+    return 0
+
+
+def _batch(args: argparse.Namespace) -> int:
+    person_ids = "all" if args.persons == ["all"] else [int(value) for value in args.persons]
+    kwargs = dict(
+        diaries_path=args.diaries,
+        notes_path=args.notes,
+        csv_dir=args.csv_dir,
+        data_dir=args.data_dir,
+        dict_names=args.dicts
+    )
+    if args.overlapped:
+        kwargs.update(queue_size=args.queue_size)
+    else:
+        kwargs.update(
+            max_workers=args.workers,
+            memory_limit_mb=args.memory_limit_mb,
+            worker_memory_mb=args.worker_memory_mb,
+            share_models=not args.no_shared_models,
+            shared_models_dir=args.shared_models_dir
+        )
+    summary = process_authors(person_ids, output_path=args.output, overlapped=args.overlapped, **kwargs)
+    print(f"Обработано авторов: {len(summary)}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Точка входа консольной команды prozhito-nlp.
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        return _run(args)
+    if args.command == "update":
+        return _update(args)
+    if args.command == "batch":
+        return _batch(args)
+    if args.command == "serve":
+        serve(
+            os.path.join(args.data_dir, "rusentilex_clean.txt"),
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms
+        )
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
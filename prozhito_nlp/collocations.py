@@ -0,0 +1,258 @@
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .basic_text_metrics import clean_punctuation
+from .resources import load_stop_words
+
+SCORES = ("pmi", "log_likelihood")
+MAX_NGRAMS = 500_000
+MAX_WORDS = 500_000
+
+
+def iter_segments(text: str) -> Iterator[List[str]]:
+    """
+    Делит лемматизированный текст на отрезки между знаками препинания:
+    n-граммы и словосочетания не переходят через границу предложения или запятую.
+    """
+    segment: List[str] = []
+    for token in text.split():
+        word = clean_punctuation(token)
+        if word:
+            segment.append(word)
+        elif segment:
+            yield segment
+            segment = []
+    if segment:
+        yield segment
+
+
+def _log_likelihood(n11: np.ndarray, c1: np.ndarray, c2: np.ndarray, total: np.ndarray) -> np.ndarray:
+    """
+    Логарифмическое отношение правдоподобия (G², Даннинг) для таблицы 2×2:
+    n11 — совместная частота, c1 и c2 — частоты частей словосочетания, total — объём выборки.
+    """
+    observed = np.stack([
+        n11,
+        c1 - n11,
+        c2 - n11,
+        total - c1 - c2 + n11,
+    ]).clip(min=0)
+    rows = np.stack([c1, c1, total - c1, total - c1])
+    cols = np.stack([c2, total - c2, c2, total - c2])
+    expected = rows * cols / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+    return 2 * terms.sum(axis=0)
+
+
+class CollocationAggregator:
+    """
+    Накопительный подсчёт n-грамм и словосочетаний по годам с ограниченной памятью.
+
+    Частоты слов и n-грамм хранятся в счётчиках с прореживанием (lossy counting): когда число
+    различных ключей (год, слово) превышает max_words или число различных n-грамм какого-либо
+    порядка превышает max_ngrams, удаляются самые редкие из них, а порог удаления прибавляется
+    к погрешности pruned_below (для слов — под ключом 1). Частота любого слова или n-граммы
+    занижена не больше чем на pruned_below, поэтому встретившиеся чаще этого порога не теряются;
+    погрешность выводится в result рядом с оценками.
+    Как и другие агрегаторы из chunked, работает с consume и объединяется через merge.
+
+    Оценки словосочетаний:
+    - pmi — поточечная взаимная информация: log2(N^(n-1) · f(w1..wn) / (f(w1) · … · f(wn)))
+    - log_likelihood — G² для таблицы 2×2 «первые n-1 слов × последнее слово»
+    """
+
+    def __init__(
+        self,
+        n: int = 2,
+        text_column: str = "tokens",
+        year_column: Optional[str] = "year",
+        stop_words: Optional[Iterable[str]] = None,
+        max_ngrams: int = MAX_NGRAMS,
+        max_words: int = MAX_WORDS
+    ):
+        """
+        Параметры:
+        - n: длина словосочетания (2 — биграммы, 3 — триграммы, ...)
+        - text_column: колонка с леммами (с пунктуацией — по ней текст делится на отрезки)
+        - year_column: колонка с годом (если None — один общий подсчёт по всему корпусу)
+        - stop_words: n-граммы, которые начинаются или заканчиваются стоп-словом, не учитываются
+        - max_ngrams: сколько различных n-грамм каждого порядка хранить в памяти
+        - max_words: сколько различных пар (год, слово) хранить в памяти
+        """
+        if n < 2:
+            raise ValueError("Длина словосочетания n должна быть не меньше 2")
+        self.n = n
+        self.text_column = text_column
+        self.year_column = year_column
+        self.stop_words = frozenset(stop_words or ())
+        self.max_ngrams = max_ngrams
+        self.max_words = max_words
+        self.word_counts: Counter = Counter()
+        self.year_totals: Counter = Counter()
+        # Счётчики по порядкам 2..n; ключ — (год, n-грамма через пробел)
+        self.ngram_counts: Dict[int, Counter] = {order: Counter() for order in range(2, n + 1)}
+        # Погрешность частот по порядкам: 1 — слова, 2..n — n-граммы
+        self.pruned_below: Dict[int, int] = {order: 0 for order in range(1, n + 1)}
+
+    def _keep(self, gram: Tuple[str, ...]) -> bool:
+        return gram[0] not in self.stop_words and gram[-1] not in self.stop_words
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        years = chunk[self.year_column] if self.year_column is not None else [None] * len(chunk)
+        for year, text in zip(years, chunk[self.text_column]):
+            if self.year_column is not None and pd.isna(year):
+                continue
+            if pd.isna(text):
+                continue
+            year = int(year) if year is not None else None
+            for segment in iter_segments(str(text)):
+                self.year_totals[year] += len(segment)
+                self.word_counts.update((year, word) for word in segment)
+                for order, counts in self.ngram_counts.items():
+                    for start in range(len(segment) - order + 1):
+                        gram = tuple(segment[start:start + order])
+                        # Части длинных n-грамм нужны для оценок целиком, стоп-слова фильтруются только у порядка n
+                        if order < self.n or self._keep(gram):
+                            counts[(year, " ".join(gram))] += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        """
+        Удаляет самые редкие слова и n-граммы, оставляя не больше max_words/2 различных слов
+        и max_ngrams/2 различных n-грамм каждого порядка.
+        """
+        limits = [(1, self.word_counts, self.max_words)]
+        limits += [(order, counts, self.max_ngrams) for order, counts in self.ngram_counts.items()]
+        for order, counts, limit in limits:
+            if len(counts) <= limit:
+                continue
+            values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+            kth = len(values) - limit // 2 - 1
+            threshold = int(np.partition(values, kth)[kth])
+            for key in [key for key, value in counts.items() if value <= threshold]:
+                del counts[key]
+            # При каждом прореживании частота теряет не больше threshold
+            self.pruned_below[order] += threshold
+
+    def merge(self, other: "CollocationAggregator") -> "CollocationAggregator":
+        self.word_counts.update(other.word_counts)
+        self.year_totals.update(other.year_totals)
+        self.pruned_below[1] += other.pruned_below[1]
+        for order, counts in other.ngram_counts.items():
+            self.ngram_counts[order].update(counts)
+            self.pruned_below[order] += other.pruned_below[order]
+        self._prune()
+        return self
+
+    def result(
+        self,
+        top_n: int = 20,
+        min_count: int = 3,
+        sort_by: str = "log_likelihood"
+    ) -> pd.DataFrame:
+        """
+        Топ-словосочетания за каждый год.
+
+        Параметры:
+        - top_n: сколько словосочетаний сохранять на каждый год
+        - min_count: минимальная частота словосочетания за год (PMI завышен у редких сочетаний)
+        - sort_by: "log_likelihood" или "pmi"
+
+        Возвращает:
+        - pd.DataFrame с колонками ngram, count, count_error, pmi, log_likelihood, year
+          (для year_column=None — без колонки year). count_error — на сколько count может быть
+          занижен прореживанием; погрешности по всем порядкам (1 — слова) — в attrs["pruned_below"]
+        """
+        if sort_by not in SCORES:
+            raise ValueError(f"Неизвестная оценка: {sort_by}. Допустимые значения: {', '.join(SCORES)}")
+
+        counts = self.ngram_counts[self.n]
+        entries = [(year, gram, count) for (year, gram), count in counts.items() if count >= min_count]
+        columns = ['ngram', 'count', 'count_error', 'pmi', 'log_likelihood', 'year']
+        if not entries:
+            table = pd.DataFrame(columns=columns if self.year_column is not None else columns[:-1])
+            table.attrs["pruned_below"] = dict(self.pruned_below)
+            return table
+
+        years = [year for year, _, _ in entries]
+        grams = [gram.split() for _, gram, _ in entries]
+        joint = np.array([count for _, _, count in entries], dtype=float)
+        total = np.array([self.year_totals[year] for year in years], dtype=float)
+
+        word_freqs = np.array(
+            [[self.word_counts[(year, word)] for word in gram] for year, gram in zip(years, grams)], dtype=float
+        )
+        # Слово могло быть удалено прореживанием, но встречается не реже n-граммы, в которую входит
+        word_freqs = np.maximum(word_freqs, joint[:, None])
+        pmi = np.log2(joint) + (self.n - 1) * np.log2(total) - np.log2(word_freqs).sum(axis=1)
+
+        if self.n == 2:
+            prefix = word_freqs[:, 0]
+        else:
+            # Частота префикса могла быть занижена прореживанием, но не меньше частоты всей n-граммы
+            prefix_counts = self.ngram_counts[self.n - 1]
+            prefix = np.array(
+                [prefix_counts.get((year, " ".join(gram[:-1])), 0) for year, gram in zip(years, grams)], dtype=float
+            )
+            prefix = np.maximum(prefix, joint)
+        log_likelihood = _log_likelihood(joint, prefix, word_freqs[:, -1], total)
+
+        table = pd.DataFrame({
+            'ngram': [" ".join(gram) for gram in grams],
+            'count': joint.astype(int),
+            'count_error': self.pruned_below[self.n],
+            'pmi': pmi,
+            'log_likelihood': log_likelihood,
+            'year': years,
+        })
+        table = table.sort_values(['year', sort_by, 'ngram'], ascending=[True, False, True], kind="stable")
+        table = table.groupby('year', sort=True, dropna=False).head(top_n).reset_index(drop=True)
+        if self.year_column is None:
+            table = table.drop(columns='year')
+        table.attrs["pruned_below"] = dict(self.pruned_below)
+        return table
+
+
+def extract_collocations(
+    df: pd.DataFrame,
+    n: int = 2,
+    text_column: str = "tokens",
+    year_column: Optional[str] = "year",
+    stop_words_path: Optional[str] = None,
+    top_n: int = 20,
+    min_count: int = 3,
+    sort_by: str = "log_likelihood",
+    chunksize: int = 1000,
+    max_ngrams: int = MAX_NGRAMS,
+    max_words: int = MAX_WORDS
+) -> pd.DataFrame:
+    """
+    Находит устойчивые словосочетания по годам (аналог compute_tfidf_by_year для n-грамм).
+
+    Параметры:
+    - df: pd.DataFrame с лемматизированным текстом
+    - n: длина словосочетания
+    - text_column: колонка с леммами (с пунктуацией)
+    - year_column: колонка с годом (если None — по всему корпусу)
+    - stop_words_path: путь к файлу со стоп-словами (n-граммы со стоп-словом на краю отбрасываются)
+    - top_n, min_count, sort_by: см. CollocationAggregator.result
+    - chunksize: по сколько записей обрабатывать за раз
+    - max_ngrams: сколько различных n-грамм каждого порядка хранить в памяти
+    - max_words: сколько различных пар (год, слово) хранить в памяти
+
+    Возвращает:
+    - pd.DataFrame с колонками ngram, count, count_error, pmi, log_likelihood, year
+      (см. CollocationAggregator.result)
+    """
+    stop_words = load_stop_words(stop_words_path) if stop_words_path else None
+    aggregator = CollocationAggregator(
+        n=n, text_column=text_column, year_column=year_column, stop_words=stop_words,
+        max_ngrams=max_ngrams, max_words=max_words
+    )
+    for start in range(0, len(df), chunksize):
+        aggregator.update(df.iloc[start:start + chunksize])
+    return aggregator.result(top_n=top_n, min_count=min_count, sort_by=sort_by)
@@ -0,0 +1,314 @@
+import os
+import pickle
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from natasha import Doc, Segmenter
+
+from .schema import ensure_datetime
+
+INDEX_FILE = "concordance_index.pkl"
+
+# Позиция токена занимает младшие 32 бита ключа, номер записи — старшие
+_POSITION_BITS = np.int64(32)
+
+
+def normalize_lemmas(text: str) -> List[str]:
+    """
+    Разбивает строку лемм на токены в том виде, в каком они хранятся в индексе:
+    в нижнем регистре и с «е» вместо «ё» (как у лемм Natasha). Так же приводятся и запросы,
+    поэтому kwic('День') находит лемму «день».
+    """
+    return text.lower().replace("ё", "е").split()
+
+
+def token_spans(text: str, segmenter: Segmenter) -> np.ndarray:
+    """
+    Границы токенов в исходном тексте (как их выделяет Natasha при лемматизации).
+
+    Возвращает:
+    - np.ndarray размера (число токенов × 2): начало и конец каждого токена
+    """
+    doc = Doc(text)
+    doc.segment(segmenter)
+    return np.array([(token.start, token.stop) for token in doc.tokens], dtype=np.int32).reshape(-1, 2)
+
+
+class ConcordanceIndex:
+    """
+    Позиционный инвертированный индекс по лемматизированному корпусу.
+
+    Для каждой леммы хранятся записи и позиции, где она встречается. Для каждой
+    записи — её год, дата, исходный текст и границы токенов в нём, поэтому найденные
+    контексты выводятся и в леммах, и в исходном тексте. Индекс можно сохранить на диск
+    и обновлять: новые и изменённые записи (по id) переиндексируются, остальные не трогаются.
+
+    Запросы — леммы, как в колонке tokens (регистр и «ё» не важны, см. normalize_lemmas):
+    одно слово или фраза из нескольких лемм подряд (kwic) либо два слова
+    на расстоянии не больше заданного (kwic_near).
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.lemmas: List[str] = []
+        self.notes: Dict[Any, Dict[str, Any]] = {}
+        self._note_ids: List[Any] = []
+        self._postings: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._segmenter: Optional[Segmenter] = None
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, **columns) -> "ConcordanceIndex":
+        """
+        Строит индекс по DataFrame (параметры колонок — как в update).
+        """
+        index = cls()
+        index.update(df, **columns)
+        return index
+
+    # --- Построение и обновление ---
+
+    def _lemma_id(self, lemma: str) -> int:
+        lemma_id = self.vocabulary.get(lemma)
+        if lemma_id is None:
+            lemma_id = self.vocabulary[lemma] = len(self.lemmas)
+            self.lemmas.append(lemma)
+        return lemma_id
+
+    def update(
+        self,
+        df: pd.DataFrame,
+        token_column: str = "tokens",
+        text_column: str = "text",
+        id_column: str = "id",
+        date_column: str = "date",
+        year_column: str = "year"
+    ) -> Dict[str, int]:
+        """
+        Добавляет записи в индекс; записи с уже известным id и изменившимися леммами переиндексируются.
+
+        Параметры:
+        - df: pd.DataFrame с лемматизированным (token_column) и исходным (text_column) текстом
+        - id_column: колонка с ID записи (если её нет — используется индекс df)
+        - date_column, year_column: колонки с датой и годом (год при отсутствии берётся из даты)
+
+        Возвращает:
+        - словарь с числом новых, изменённых и пропущенных (не изменившихся) записей
+        """
+        if self._segmenter is None:
+            self._segmenter = Segmenter()
+
+        ids = df[id_column] if id_column in df else df.index.to_series()
+        dates = ensure_datetime(df[date_column]) if date_column in df else pd.Series(pd.NaT, index=df.index)
+        years = df[year_column] if year_column in df else dates.dt.year
+        texts = df[text_column] if text_column in df else pd.Series("", index=df.index)
+
+        counts = {"new": 0, "changed": 0, "unchanged": 0}
+        for note_id, tokens, text, date, year in zip(ids, df[token_column], texts, dates, years):
+            tokens = "" if pd.isna(tokens) else str(tokens)
+            text = "" if pd.isna(text) else str(text)
+            previous = self.notes.get(note_id)
+            if previous is not None and previous["tokens"] == tokens and previous["text"] == text:
+                counts["unchanged"] += 1
+                continue
+            counts["changed" if previous is not None else "new"] += 1
+
+            lemma_ids = np.array([self._lemma_id(lemma) for lemma in normalize_lemmas(tokens)], dtype=np.int32)
+            spans = token_spans(text, self._segmenter) if text else None
+            # Если токенизация исходного текста не совпала с леммами, контекст выводится только в леммах
+            if spans is not None and len(spans) != len(lemma_ids):
+                spans = None
+            self.notes[note_id] = {
+                "tokens": tokens,
+                "text": text,
+                "date": date,
+                "year": None if pd.isna(year) else int(year),
+                "lemma_ids": lemma_ids,
+                "spans": spans,
+            }
+
+        if counts["new"] or counts["changed"]:
+            self._postings = None
+        return counts
+
+    def remove(self, note_ids: Iterable[Any]) -> int:
+        """
+        Удаляет записи из индекса.
+
+        Возвращает:
+        - число удалённых записей
+        """
+        removed = 0
+        for note_id in note_ids:
+            if self.notes.pop(note_id, None) is not None:
+                removed += 1
+        if removed:
+            self._postings = None
+        return removed
+
+    def _build_postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Списки вхождений, отсортированные по лемме (затем по записи и позиции):
+        смещения лемм, номера записей и позиции.
+        """
+        if self._postings is None:
+            self._note_ids = list(self.notes)
+            arrays = [self.notes[note_id]["lemma_ids"] for note_id in self._note_ids]
+            lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+            lemma_ids = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32)
+            note_rows = np.repeat(np.arange(len(arrays), dtype=np.int64), lengths)
+            positions = np.arange(len(lemma_ids), dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+            order = np.argsort(lemma_ids, kind="stable")
+            offsets = np.zeros(len(self.lemmas) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(lemma_ids, minlength=len(self.lemmas)))
+            self._postings = (offsets, note_rows[order], positions[order])
+        return self._postings
+
+    def _keys(self, lemma: str) -> np.ndarray:
+        """Отсортированные ключи (номер записи << 32 | позиция) вхождений леммы."""
+        offsets, note_rows, positions = self._build_postings()
+        lemma_id = self.vocabulary.get(lemma)
+        if lemma_id is None:
+            return np.zeros(0, dtype=np.int64)
+        start, stop = offsets[lemma_id], offsets[lemma_id + 1]
+        return (note_rows[start:stop] << _POSITION_BITS) | positions[start:stop]
+
+    # --- Запросы ---
+
+    def _phrase(self, query: str) -> Tuple[np.ndarray, int]:
+        """
+        Вхождения фразы из лемм, идущих подряд.
+
+        Возвращает:
+        - (ключи начала вхождений, длина фразы в токенах)
+        """
+        lemmas = normalize_lemmas(query)
+        if not lemmas:
+            return np.zeros(0, dtype=np.int64), 0
+        keys = self._keys(lemmas[0])
+        for shift, lemma in enumerate(lemmas[1:], start=1):
+            keys = keys[np.isin(keys + shift, self._keys(lemma))]
+        return keys, len(lemmas)
+
+    def _near(self, first: str, second: str, distance: int = 5, ordered: bool = False) -> np.ndarray:
+        """
+        Вхождения леммы first, рядом с которыми (не дальше distance токенов) есть лемма second.
+        При ordered=True second должна стоять после first.
+
+        Возвращает:
+        - ключи вхождений first
+        """
+        first, second = " ".join(normalize_lemmas(first)), " ".join(normalize_lemmas(second))
+        first_keys, second_keys = self._keys(first), self._keys(second)
+        low = first_keys + 1 if ordered else first_keys - distance
+        left = np.searchsorted(second_keys, low, side="left")
+        right = np.searchsorted(second_keys, first_keys + distance, side="right")
+        found = right > left
+        if not ordered and first == second:
+            # Само вхождение не считается соседом
+            found = right - left > 1
+        return first_keys[found]
+
+    def _matches_frame(self, keys: np.ndarray, length: int, window: int) -> pd.DataFrame:
+        note_rows = (keys >> _POSITION_BITS).astype(np.int64)
+        positions = (keys & ((np.int64(1) << _POSITION_BITS) - 1)).astype(np.int64)
+
+        rows = []
+        for note_row, position in zip(note_rows, positions):
+            note_id = self._note_ids[note_row]
+            note = self.notes[note_id]
+            lemmas = note["tokens"].split()
+            end = position + length
+            row = {
+                "id": note_id,
+                "year": note["year"],
+                "date": note["date"],
+                "position": int(position),
+                "left": " ".join(lemmas[max(0, position - window):position]),
+                "keyword": " ".join(lemmas[position:end]),
+                "right": " ".join(lemmas[end:end + window]),
+            }
+            spans, text = note["spans"], note["text"]
+            if spans is not None:
+                left_start = spans[max(0, position - window)][0]
+                right_stop = spans[min(len(spans), end + window) - 1][1]
+                row["left_text"] = text[left_start:spans[position][0]].strip()
+                row["keyword_text"] = text[spans[position][0]:spans[end - 1][1]]
+                row["right_text"] = text[spans[end - 1][1]:right_stop].strip()
+            else:
+                row["left_text"] = row["keyword_text"] = row["right_text"] = None
+            rows.append(row)
+
+        columns = ["id", "year", "date", "position", "left", "keyword", "right", "left_text", "keyword_text", "right_text"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def kwic(self, query: str, window: int = 5) -> pd.DataFrame:
+        """
+        Конкорданс (keyword in context): все вхождения леммы или фразы с window токенами
+        контекста слева и справа — в леммах и в исходном тексте.
+
+        Возвращает:
+        - pd.DataFrame с колонками id, year, date, position, left, keyword, right,
+          left_text, keyword_text, right_text; строки упорядочены по году, записи и позиции
+        """
+        keys, length = self._phrase(query)
+        return self._sort(self._matches_frame(keys, length, window))
+
+    def kwic_near(
+        self,
+        first: str,
+        second: str,
+        distance: int = 5,
+        ordered: bool = False,
+        window: int = 5
+    ) -> pd.DataFrame:
+        """
+        Конкорданс вхождений леммы first, рядом с которыми (не дальше distance токенов)
+        есть лемма second. При ordered=True second должна стоять после first.
+        Колонки — как у kwic.
+        """
+        return self._sort(self._matches_frame(self._near(first, second, distance, ordered), 1, window))
+
+    @staticmethod
+    def _sort(frame: pd.DataFrame) -> pd.DataFrame:
+        return frame.sort_values(["year", "date", "position"], na_position="last", kind="stable").reset_index(drop=True)
+
+    def counts_by_year(self, query: str) -> pd.Series:
+        """Число вхождений леммы или фразы по годам."""
+        keys, _ = self._phrase(query)
+        years = [self.notes[self._note_ids[row]]["year"] for row in (keys >> _POSITION_BITS)]
+        years = pd.Series(years, dtype="object").dropna().astype(int)
+        return years.value_counts().sort_index().rename_axis("year").rename(query)
+
+    def document_frequency(self, query: str) -> int:
+        """Число записей, где встречается лемма или фраза."""
+        keys, _ = self._phrase(query)
+        return int(len(np.unique(keys >> _POSITION_BITS)))
+
+    # --- Сохранение ---
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет индекс в файл (или в папку — тогда в файл concordance_index.pkl).
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, INDEX_FILE)
+        state = {"vocabulary": self.vocabulary, "lemmas": self.lemmas, "notes": self.notes}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ConcordanceIndex":
+        """Загружает индекс, сохранённый save()."""
+        if os.path.isdir(path):
+            path = os.path.join(path, INDEX_FILE)
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        index = cls()
+        index.vocabulary = state["vocabulary"]
+        index.lemmas = state["lemmas"]
+        index.notes = state["notes"]
+        return index
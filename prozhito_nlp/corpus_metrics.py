@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from .basic_text_metrics import clean_punctuation, count_sentences
+from .dict_match import find_dictionary_matches
+from .schema import ensure_datetime
+from .sentiment import SparseSentimentScorer, score_text_sentiment, POLARITIES
+
+
+def dictionary_counts(texts: Sequence[str], phrase_dicts: Dict[str, Set[str]]) -> pd.DataFrame:
+    """
+    Число совпадений с каждым словарём в каждой записи — то же, что len(find_dictionary_matches(...)[категория]),
+    но однословные словари считаются одним умножением разреженных матриц.
+
+    Параметры:
+    - texts: лемматизированные тексты без пунктуации (колонка tokens_no_punkt)
+    - phrase_dicts: результат load_custom_dictionaries
+
+    Возвращает:
+    - pd.DataFrame (записи × словари) с колонками dict_<категория>
+    """
+    texts = pd.Series(texts).fillna("").astype(str)
+    categories = list(phrase_dicts)
+    word_categories = [category for category in categories if category != 'phraseologisms_compound']
+
+    # find_dictionary_matches пересекает множество слов записи со словарём,
+    # поэтому совпасть могут только элементы словаря без пробелов
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for col, category in enumerate(word_categories):
+        for entry in phrase_dicts[category]:
+            if not entry or ' ' in entry:
+                continue
+            rows.append(vocabulary.setdefault(entry, len(vocabulary)))
+            cols.append(col)
+
+    counts = np.zeros((len(texts), len(categories)), dtype=np.int64)
+    if vocabulary:
+        vectorizer = CountVectorizer(
+            vocabulary=vocabulary, tokenizer=str.split, token_pattern=None, lowercase=False, binary=True
+        )
+        indicators = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(vocabulary), len(word_categories))
+        )
+        word_counts = np.asarray((vectorizer.transform(texts) @ indicators).todense(), dtype=np.int64)
+        for col, category in enumerate(word_categories):
+            counts[:, categories.index(category)] = word_counts[:, col]
+
+    if 'phraseologisms_compound' in phrase_dicts:
+        compound = {'phraseologisms_compound': phrase_dicts['phraseologisms_compound']}
+        col = categories.index('phraseologisms_compound')
+        counts[:, col] = [len(find_dictionary_matches(text, compound)['phraseologisms_compound']) for text in texts]
+
+    return pd.DataFrame(counts, columns=[f"dict_{category}" for category in categories], index=texts.index)
+
+
+def note_metrics(
+    df: pd.DataFrame,
+    token_column: str = "tokens",
+    lexicon=None,
+    phrase_dicts: Optional[Dict[str, Set[str]]] = None,
+    sentiment_method: str = "sparse"
+) -> pd.DataFrame:
+    """
+    Числовые показатели каждой записи: из них corpus_metrics собирает сводку по группам.
+
+    Параметры:
+    - df: pd.DataFrame с лемматизированным текстом
+    - token_column: колонка с леммами (с пунктуацией)
+    - lexicon: результат load_rusentilex_dict (если None — без сентимента)
+    - phrase_dicts: результат load_custom_dictionaries (если None — без словарей)
+    - sentiment_method: "sparse" (векторизованный подсчёт, см. SparseSentimentScorer) или "substring"
+      (поиск каждой фразы в каждой записи); совпадения у обоих те же, что у analyze_sentiment по умолчанию
+
+    Возвращает:
+    - pd.DataFrame с тем же индексом: tokens_with_punkt, tokens, sentences,
+      sentiment_<полярность>, rusentilex_score, dict_<категория>
+    """
+    if sentiment_method not in ("substring", "sparse"):
+        raise ValueError(f"Неизвестный метод: {sentiment_method}. Допустимые значения: 'substring', 'sparse'")
+
+    texts = df[token_column].fillna("").astype(str)
+    no_punkt = texts.apply(clean_punctuation)
+
+    metrics = pd.DataFrame({
+        "tokens_with_punkt": texts.str.split().map(len),
+        "tokens": no_punkt.str.split().map(len),
+        "sentences": texts.apply(count_sentences),
+    }, index=df.index)
+
+    if lexicon is not None:
+        if sentiment_method == "sparse":
+            scorer = SparseSentimentScorer(lexicon)
+            by_polarity, scores = scorer.polarity_scores(scorer.score(texts)[0])
+        else:
+            polarity_counts = np.array([score_text_sentiment(text, lexicon) for text in texts], dtype=np.int64)
+            polarity_counts = polarity_counts.reshape(len(texts), len(POLARITIES))
+            by_polarity = {polarity: polarity_counts[:, i] for i, polarity in enumerate(POLARITIES)}
+            total = polarity_counts.sum(axis=1)
+            scores = np.divide(
+                by_polarity['positive'] - by_polarity['negative'], total,
+                out=np.zeros(len(total), dtype=float), where=total > 0
+            )
+        for polarity in POLARITIES:
+            metrics[f"sentiment_{polarity}"] = by_polarity[polarity]
+        metrics["rusentilex_score"] = scores
+
+    if phrase_dicts is not None:
+        metrics = metrics.join(dictionary_counts(no_punkt, phrase_dicts))
+
+    return metrics
+
+
+def corpus_metrics(
+    df: pd.DataFrame,
+    group_by: Sequence[str] = ("person", "year"),
+    token_column: str = "tokens",
+    lexicon=None,
+    phrase_dicts: Optional[Dict[str, Set[str]]] = None,
+    sentiment_method: str = "sparse",
+    date_column: str = "date"
+) -> pd.DataFrame:
+    """
+    Сводная таблица показателей по авторам и годам (или другим группам) для корпуса из многих авторов —
+    аналог compute_text_statistics, analyze_sentiment и match_custom_dictionaries, посчитанный
+    за один проход и без печати.
+
+    Параметры:
+    - df: pd.DataFrame с записями многих авторов (колонки person, date и лемматизированный текст)
+    - group_by: колонки группировки; колонка year при отсутствии вычисляется из date_column
+    - token_column: колонка с леммами (с пунктуацией)
+    - lexicon: результат load_rusentilex_dict (если None — без сентимента)
+    - phrase_dicts: результат load_custom_dictionaries (если None — без словарей)
+    - sentiment_method: "sparse" или "substring" (см. note_metrics)
+    - date_column: колонка с датой
+
+    Возвращает:
+    - pd.DataFrame — одна строка на группу: records, avg_tokens_per_record, total_tokens,
+      unique_tokens, avg_sentence_length, sentiment_<полярность>, mean_rusentilex_score, dict_<категория>
+    """
+    group_by: List[str] = list(group_by)
+    keys = pd.DataFrame(index=df.index)
+    for column in group_by:
+        if column == "year" and column not in df:
+            keys[column] = ensure_datetime(df[date_column]).dt.year
+        else:
+            keys[column] = df[column]
+
+    metrics = note_metrics(
+        df, token_column=token_column, lexicon=lexicon, phrase_dicts=phrase_dicts, sentiment_method=sentiment_method
+    )
+    frame = pd.concat([keys, metrics], axis=1)
+    grouped = frame.groupby(group_by, dropna=True, observed=True)
+
+    sums = grouped[[column for column in metrics.columns if column != "rusentilex_score"]].sum()
+    table = pd.DataFrame(index=sums.index)
+    table["records"] = grouped.size()
+    table["avg_tokens_per_record"] = sums["tokens_with_punkt"] / table["records"]
+    table["total_tokens"] = sums["tokens"]
+
+    # Уникальные токены группы — число различных слов после разворачивания записей в слова
+    split_words = df[token_column].fillna("").astype(str).apply(clean_punctuation).str.split().rename("word")
+    words = pd.concat([keys, split_words], axis=1)
+    table["unique_tokens"] = words.explode("word").dropna(subset=["word"]).groupby(group_by, observed=True)["word"].nunique()
+    table["unique_tokens"] = table["unique_tokens"].fillna(0).astype(int)
+
+    table["avg_sentence_length"] = (sums["tokens"] / sums["sentences"].where(sums["sentences"] > 0)).fillna(0.0)
+
+    if lexicon is not None:
+        for polarity in POLARITIES:
+            table[f"sentiment_{polarity}"] = sums[f"sentiment_{polarity}"]
+        table["mean_rusentilex_score"] = grouped["rusentilex_score"].mean()
+
+    dict_columns = [column for column in metrics.columns if column.startswith("dict_")]
+    table[dict_columns] = sums[dict_columns]
+
+    return table.reset_index()
@@ -0,0 +1,243 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .lemmatizer import LemmatizerNatasha, lemmatize_column
+from .sentiment import SOURCES, POLARITIES, make_sentiment_scorer
+
+# Простое число Мерсенна 2^31 - 1: произведения a * x остаются в пределах uint64
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def _shingles(text: str, shingle_size: int) -> List[str]:
+    """
+    Разбивает текст на пересекающиеся словесные n-граммы (шинглы).
+    """
+    tokens = re.findall(r'\w+', str(text).lower())
+    if len(tokens) < shingle_size:
+        return [' '.join(tokens)] if tokens else []
+    return [' '.join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+
+
+def minhash_signatures(
+    texts: List[str],
+    num_perm: int = 128,
+    shingle_size: int = 3,
+    seed: int = 1
+) -> np.ndarray:
+    """
+    Вычисляет MinHash-сигнатуры текстов.
+
+    Возвращает:
+    - np.ndarray размера (число текстов × num_perm); доля совпадающих позиций
+      двух сигнатур — оценка коэффициента Жаккара между множествами шинглов.
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)
+    b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)
+
+    signatures = np.full((len(texts), num_perm), _PRIME, dtype=np.uint64)
+    for i, text in enumerate(texts):
+        shingles = set(_shingles(text, shingle_size))
+        if not shingles:
+            continue
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) & 0x7FFFFFFF for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        signatures[i] = ((np.outer(hashes, a) + b) % _PRIME).min(axis=0)
+    return signatures
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(
+    df: pd.DataFrame,
+    text_column: str = "text",
+    threshold: float = 0.9,
+    num_perm: int = 128,
+    bands: int = 16,
+    shingle_size: int = 3
+) -> pd.Series:
+    """
+    Группирует почти одинаковые записи с помощью MinHash и LSH.
+
+    Кандидаты в дубликаты — записи, у которых совпала хотя бы одна «полоса» сигнатуры;
+    в группу они объединяются, если оценка сходства по Жаккару не ниже threshold.
+
+    Параметры:
+    - df: pd.DataFrame с очищенным текстом (после clean_text_column)
+    - text_column: колонка с текстом
+    - threshold: порог сходства (0–1)
+    - num_perm: длина сигнатуры
+    - bands: число полос LSH (num_perm должно делиться на bands)
+    - shingle_size: длина шингла в словах
+
+    Возвращает:
+    - pd.Series с тем же индексом: позиция (0..n-1) представителя группы для каждой записи.
+      Представитель — первая по порядку запись группы.
+    """
+    if num_perm % bands:
+        raise ValueError("num_perm должно делиться на bands без остатка")
+
+    texts = df[text_column].fillna("").astype(str).tolist()
+    signatures = minhash_signatures(texts, num_perm=num_perm, shingle_size=shingle_size)
+    rows = num_perm // bands
+
+    parent = list(range(len(texts)))
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for i in range(len(texts)):
+            buckets[band_values[i].tobytes()].append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            for other in members[1:]:
+                root_first, root_other = _find(parent, first), _find(parent, other)
+                if root_first == root_other:
+                    continue
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= threshold:
+                    # Представителем остаётся запись с меньшей позицией
+                    parent[max(root_first, root_other)] = min(root_first, root_other)
+
+    groups = [_find(parent, i) for i in range(len(texts))]
+    return pd.Series(groups, index=df.index, name="duplicate_group")
+
+
+def dedup_report(df: pd.DataFrame, groups: pd.Series, text_column: str = "text") -> Dict[str, float]:
+    """
+    Сводка о том, сколько работы экономит дедупликация.
+    """
+    positions = np.arange(len(groups))
+    skipped = groups.values != positions
+    lengths = df[text_column].fillna("").astype(str).str.len().values
+    total_chars = int(lengths.sum())
+    skipped_chars = int(lengths[skipped].sum())
+    return {
+        "notes": len(groups),
+        "groups": int((~skipped).sum()),
+        "skipped_notes": int(skipped.sum()),
+        "skipped_chars": skipped_chars,
+        "skipped_share": round(skipped_chars / total_chars, 4) if total_chars else 0.0,
+    }
+
+
+def apply_deduplicated(
+    df: pd.DataFrame,
+    func: Callable[[pd.DataFrame], pd.DataFrame],
+    new_columns: List[str],
+    groups: pd.Series
+) -> pd.DataFrame:
+    """
+    Применяет func только к представителям групп и копирует новые колонки
+    на все записи группы.
+
+    Параметры:
+    - df: исходный DataFrame
+    - func: функция, принимающая DataFrame представителей и возвращающая его с новыми колонками
+    - new_columns: какие колонки результата переносить на остальные записи
+    - groups: результат find_near_duplicates
+
+    Возвращает:
+    - df с новыми колонками
+    """
+    representatives = np.unique(groups.values)
+    processed = func(df.iloc[representatives].copy())
+    df = df.copy()
+    for column in new_columns:
+        values = pd.Series(processed[column].values, index=representatives)
+        df[column] = values.loc[groups.values].values
+    return df
+
+
+def lemmatize_column_dedup(
+    df: pd.DataFrame,
+    text_column: str = "text",
+    new_column: str = "tokens",
+    threshold: float = 0.9,
+    lemmatizer: Optional[LemmatizerNatasha] = None,
+    **minhash_params
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    Лемматизирует только по одной записи из каждой группы почти одинаковых записей
+    и переносит результат на остальные записи группы.
+
+    Возвращает:
+    - df с колонками new_column и duplicate_group
+    - отчёт о пропущенной работе (см. dedup_report)
+    """
+    groups = find_near_duplicates(df, text_column=text_column, threshold=threshold, **minhash_params)
+    df = apply_deduplicated(
+        df,
+        lambda part: lemmatize_column(part, text_column=text_column, new_column=new_column, lemmatizer=lemmatizer),
+        [new_column],
+        groups
+    )
+    df["duplicate_group"] = groups.values
+    return df, dedup_report(df, groups, text_column=text_column)
+
+
+def analyze_sentiment_dedup(
+    df: pd.DataFrame,
+    text_column: str,
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    groups: pd.Series,
+    method: str = "sparse"
+) -> Tuple[Dict, int, Dict[str, int], pd.DataFrame]:
+    """
+    Сентимент-анализ, в котором совпадения с RuSentiLex ищутся только в представителях
+    групп почти одинаковых записей и переносятся на остальные записи группы.
+    Для записей, лемматизированных через lemmatize_column_dedup, результат тот же,
+    что у analyze_sentiment: токены записей группы совпадают.
+
+    Параметры:
+    - df: pd.DataFrame с колонкой text_column
+    - text_column: колонка с лемматизированным текстом
+    - lexicon: словарь RuSentiLex (см. load_rusentilex_dict)
+    - groups: результат find_near_duplicates (или колонка duplicate_group)
+    - method: "sparse" или "substring" (см. make_sentiment_scorer)
+
+    Возвращает:
+    - то же, что analyze_sentiment
+    """
+    scorer = make_sentiment_scorer(lexicon, method)
+    count_columns = [f"_sentiment_{source}_{polarity}" for source, polarity in scorer.columns]
+    words: Dict[Tuple[str, str], Set[str]] = {}
+
+    def score(part: pd.DataFrame) -> pd.DataFrame:
+        counts, found = scorer.score(part[text_column])
+        words.update(found)
+        for col, name in enumerate(count_columns):
+            part[name] = counts[:, col]
+        return part
+
+    df = apply_deduplicated(df, score, count_columns, groups)
+    counts = df[count_columns].to_numpy()
+    df = df.drop(columns=count_columns)
+
+    result = defaultdict(lambda: defaultdict(lambda: {'words': set(), 'count': 0}))
+    for col, (source, polarity) in enumerate(scorer.columns):
+        result[source][polarity]['words'] = words[(source, polarity)]
+        result[source][polarity]['count'] = int(counts[:, col].sum())
+    _, scores = scorer.polarity_scores(counts)
+    df['rusentilex_score'] = scores
+
+    total_unique_words = sum(df[text_column].apply(lambda x: len(set(x.split()))))
+    total_category_words = {
+        source: sum(len(lexicon[source][pol]) for pol in POLARITIES)
+        for source in SOURCES
+    }
+    return result, total_unique_words, total_category_words, df
@@ -1,16 +1,55 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import re
+from collections import Counter
 
-def plot_total_matches(total_matches: dict):
+from .arrow_strings import contains_word, is_arrow_string
+from .rollups import TimeAggregates
+from .viz_utils import apply_compact_layout
+
+# Сколько слов категории показывать в компактном режиме plot_matches_by_category
+COMPACT_MAX_WORDS = 30
+
+
+def _document_frequencies(words, texts) -> dict:
+    """
+    Для каждого слова — число текстов, где оно встречается как отдельное слово
+    (то же, что texts.str.contains(r'\bслово\b').sum()).
+
+    Слова из одних буквенно-цифровых символов считаются за один проход по текстам;
+    фразы и слова с дефисами проверяются регулярным выражением
+    (для строк Arrow — векторизованно, см. contains_word).
+    """
+    texts = texts.fillna("") if is_arrow_string(texts) else texts.fillna("").astype(str)
+    simple = {word for word in words if re.fullmatch(r'\w+', word)}
+    counts = Counter()
+    if simple:
+        for text in texts.tolist():
+            counts.update(simple.intersection(re.findall(r'\w+', text)))
+    for word in set(words) - simple:
+        counts[word] = int(contains_word(texts, word).sum())
+    return {word: counts[word] for word in words}
+
+
+def plot_total_matches(total_matches: dict, compact: bool = False, max_categories: int = None, show: bool = True):
     """
     Рисует интерактивный барчарт с общим количеством совпадений по категориям.
+
+    Параметры:
+    - total_matches: словарь {категория: число совпадений} или дневные суммы TimeAggregates
+    - compact: облегчённый шаблон оформления
+    - max_categories: показать только столько категорий с наибольшим числом совпадений
+    - show: показать график сразу; при show=False фигура возвращается
     """
+    if isinstance(total_matches, TimeAggregates):
+        total_matches = total_matches.dictionary_totals()
     categories = list(total_matches.keys())
     total_counts = [total_matches[cat] for cat in categories]
 
     # Сортируем по убыванию
     sorted_data = sorted(zip(categories, total_counts), key=lambda x: x[1], reverse=True)
+    if max_categories is not None:
+        sorted_data = sorted_data[:max_categories]
     sorted_categories, sorted_counts = zip(*sorted_data) if sorted_data else ([], [])
 
     fig = px.bar(
@@ -21,17 +60,77 @@ def plot_total_matches(total_matches: dict):
     )
     fig.update_traces(marker_color="#E4653F")
     fig.update_layout(xaxis_tickangle=-45)
-    fig.show()
+    if compact:
+        apply_compact_layout(fig)
+
+    if show:
+        fig.show()
+        return None
+    return fig
 
-def plot_matches_by_category(unique_matches: dict, df, token_col: str = "tokens_no_punkt"):
+def plot_matches_by_category(
+    unique_matches: dict,
+    df,
+    token_col: str = "tokens_no_punkt",
+    compact: bool = False,
+    max_words: int = None,
+    show: bool = True
+):
     """
     Рисует интерактивный горизонтальный барчарт с уникальными совпадениями по категориям.
     С выпадающим меню для выбора категории.
+
+    Параметры:
+    - unique_matches: словарь {категория: множество найденных слов}
+    - df: DataFrame с текстами
+    - token_col: колонка с лемматизированным текстом без пунктуации
+    - compact: одна трасса вместо трассы на каждую категорию, не больше max_words слов
+      на категорию и облегчённый шаблон. Данные всех категорий по-прежнему встраиваются
+      в фигуру (в кнопки меню); размер сокращает в основном ограничение max_words
+    - max_words: сколько самых частых слов показывать в категории
+      (в компактном режиме по умолчанию COMPACT_MAX_WORDS)
+    - show: показать график сразу; при show=False фигура возвращается
     """
+    if compact and max_words is None:
+        max_words = COMPACT_MAX_WORDS
 
     filtered_categories = {cat: words for cat, words in unique_matches.items() if words}
     categories_with_matches = list(filtered_categories.keys())
 
+    # Частоты считаются один раз для всех слов всех категорий
+    all_words = list({word for words in filtered_categories.values() for word in words})
+    frequencies = _document_frequencies(all_words, df[token_col])
+
+    category_data = {}
+    for category in categories_with_matches:
+        word_list = list(filtered_categories[category])
+        sorted_data = sorted(((word, frequencies[word]) for word in word_list), key=lambda x: x[1], reverse=True)
+        if max_words is not None:
+            sorted_data = sorted_data[:max_words]
+        category_data[category] = tuple(zip(*sorted_data)) if sorted_data else ((), ())
+
+    if compact:
+        fig = go.Figure(go.Bar(x=[], y=[], orientation='h', marker=dict(color='#E4653F')))
+        buttons = [dict(
+            label="Выберите категорию",
+            method="update",
+            args=[{"x": [[]], "y": [[]]}, {"title": "Уникальные совпадения по категориям"}]
+        )]
+        for category in categories_with_matches:
+            sorted_words, sorted_counts = category_data[category]
+            buttons.append(dict(
+                label=category,
+                method="update",
+                args=[{"x": [list(sorted_counts)], "y": [list(sorted_words)]},
+                      {"title": f"Уникальные совпадения в категории: {category}"}]
+            ))
+        _layout_matches_by_category(fig, buttons)
+        apply_compact_layout(fig)
+        if show:
+            fig.show()
+            return None
+        return fig
+
     data = []
     buttons = []
 
@@ -45,13 +144,7 @@ def plot_matches_by_category(unique_matches: dict, df, token_col: str = "tokens_
     ))
 
     for i, category in enumerate(categories_with_matches):
-        word_list = list(filtered_categories[category])
-        word_counts = [
-            df[token_col].str.contains(r'\b' + re.escape(word) + r'\b').sum()
-            for word in word_list
-        ]
-        sorted_data = sorted(zip(word_list, word_counts), key=lambda x: x[1], reverse=True)
-        sorted_words, sorted_counts = zip(*sorted_data) if sorted_data else ([], [])
+        sorted_words, sorted_counts = category_data[category]
 
         trace = go.Bar(
             x=sorted_counts,
@@ -74,6 +167,15 @@ def plot_matches_by_category(unique_matches: dict, df, token_col: str = "tokens_
         ))
 
     fig = go.Figure(data=data)
+    _layout_matches_by_category(fig, buttons)
+
+    if show:
+        fig.show()
+        return None
+    return fig
+
+
+def _layout_matches_by_category(fig, buttons):
     fig.update_layout(
         title="Уникальные совпадения по категориям",
         xaxis_title="Частота",
@@ -90,4 +192,3 @@ def plot_matches_by_category(unique_matches: dict, df, token_col: str = "tokens_
             "yanchor": "top"
         }]
     )
-    fig.show()
@@ -2,7 +2,11 @@ import os
 import json
 import pandas as pd
 import warnings
-from typing import Optional
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .arrow_strings import read_csv_arrow
+from .schema import apply_schema, to_csv_frame
 
 def split_json_to_csv(
     diaries_path: str,
@@ -22,10 +26,10 @@ def split_json_to_csv(
     - output_dir: str — директория для сохранения файлов (по умолчанию: "diaries")
     - save_csv: bool — сохранять ли CSV-файлы
     - filter_person_id: Optional[int] — если указан, вернуть только записи этого автора
-    - return_dataframe: bool — если True, вернуть DataFrame (только для одного автора)
+    - return_dataframe: bool — если True, вернуть DataFrame (одного автора или всех сразу)
 
     Возвращает:
-    - pd.DataFrame, если return_dataframe=True и указан filter_person_id. Иначе — None.
+    - pd.DataFrame, если return_dataframe=True. Иначе — None.
     """
 
     # Чтение данных из JSON-файлов
@@ -42,15 +46,14 @@ def split_json_to_csv(
     for note in notes_data:
         note["person"] = diary_to_person.get(note["diary"])
 
-    # Преобразование в DataFrame
-    df = pd.DataFrame(notes_data)
-    df = df.dropna(subset=["person"])
+    # Преобразование в DataFrame и приведение типов (даты разбираются один раз)
+    raw = pd.DataFrame(notes_data)
+    df = apply_schema(raw.dropna(subset=["person"]))
 
     # Фильтрация по конкретному автору
     if filter_person_id is not None:
         df = df[df["person"] == filter_person_id]
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
-        df = df.sort_values(by="date")
+        df = df.sort_values(by="date", kind="stable")
 
         if return_dataframe:
             return df.reset_index(drop=True)
@@ -58,18 +61,91 @@ def split_json_to_csv(
         if save_csv:
             os.makedirs(output_dir, exist_ok=True)
             filename = os.path.join(output_dir, f"author_{int(filter_person_id)}.csv")
-            df.to_csv(filename, index=False, encoding="utf-8")
+            to_csv_frame(df, raw=raw).to_csv(filename, index=False, encoding="utf-8")
 
-    elif save_csv:
-        os.makedirs(output_dir, exist_ok=True)
-        grouped = df.groupby("person")
-        for person_id, group in grouped:
-            filename = os.path.join(output_dir, f"author_{int(person_id)}.csv")
-            group.to_csv(filename, index=False, encoding="utf-8")
+    else:
+        if save_csv:
+            os.makedirs(output_dir, exist_ok=True)
+            grouped = df.groupby("person", observed=True)
+            for person_id, group in grouped:
+                filename = os.path.join(output_dir, f"author_{int(person_id)}.csv")
+                to_csv_frame(group, raw=raw).to_csv(filename, index=False, encoding="utf-8")
+
+        if return_dataframe:
+            return df.reset_index(drop=True)
 
     return None
 
-def load_diary_from_csv(file_path: str) -> pd.DataFrame:
+# Последний разобранный JSON: (пути и подписи файлов) → записи по авторам
+_JSON_CACHE: Dict[Tuple, Dict[int, List[Dict[str, Any]]]] = {}
+
+
+def group_notes_by_author(diaries_path: str, notes_path: str) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Читает diaries.json и notes.json и раскладывает записи по авторам (записи без автора отбрасываются).
+
+    JSON разбирается один раз: результат для последней пары файлов запоминается в процессе
+    и сбрасывается, если файлы изменились на диске. Поэтому обработка авторов по одному
+    (author_frame_from_json, iter_authors_from_json) не перечитывает корпус для каждого автора.
+
+    Возвращает:
+    - dict: ID автора → список записей (словари из notes.json с добавленным полем person)
+    """
+    key = tuple(
+        (os.path.abspath(path), os.stat(path).st_size, os.stat(path).st_mtime_ns)
+        for path in (diaries_path, notes_path)
+    )
+    if key not in _JSON_CACHE:
+        with open(diaries_path, "r", encoding="utf-8") as f:
+            diary_to_person = {entry["id"]: entry["person"] for entry in json.load(f)}
+        with open(notes_path, "r", encoding="utf-8") as f:
+            notes_data = json.load(f)
+
+        by_author: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for note in notes_data:
+            note["person"] = diary_to_person.get(note["diary"])
+            if note["person"] is not None:
+                by_author[int(note["person"])].append(note)
+        _JSON_CACHE.clear()
+        _JSON_CACHE[key] = dict(by_author)
+    return _JSON_CACHE[key]
+
+
+def author_frame_from_json(diaries_path: str, notes_path: str, person_id: int) -> pd.DataFrame:
+    """
+    Записи одного автора из JSON — то же, что split_json_to_csv(..., filter_person_id=person_id,
+    return_dataframe=True), но без разбора всего корпуса при каждом вызове (см. group_notes_by_author).
+    Для автора без записей возвращается пустой DataFrame.
+    """
+    notes = group_notes_by_author(diaries_path, notes_path).get(int(person_id))
+    if not notes:
+        return pd.DataFrame()
+    df = apply_schema(pd.DataFrame(notes))
+    return df.sort_values(by="date", kind="stable").reset_index(drop=True)
+
+
+def iter_authors_from_json(
+    diaries_path: str,
+    notes_path: str,
+    person_ids: Optional[Iterable[int]] = None
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Выдаёт записи авторов из JSON по одному автору (см. author_frame_from_json), не записывая CSV:
+    таблица каждого автора строится только тогда, когда до неё дошла очередь.
+
+    Параметры:
+    - person_ids: какие авторы нужны (по умолчанию — все, у кого есть записи, по возрастанию ID)
+
+    Возвращает:
+    - итератор пар (ID автора, DataFrame его записей)
+    """
+    if person_ids is None:
+        person_ids = sorted(group_notes_by_author(diaries_path, notes_path))
+    for person_id in person_ids:
+        yield person_id, author_frame_from_json(diaries_path, notes_path, person_id)
+
+
+def load_diary_from_csv(file_path: str, typed: bool = True, arrow_strings: bool = False) -> pd.DataFrame:
     """
     Загружает дневник из CSV-файла и возвращает его в виде DataFrame.
 
@@ -77,6 +153,14 @@ def load_diary_from_csv(file_path: str) -> pd.DataFrame:
     ----------
     file_path : str
         Путь к CSV-файлу (например, 'diaries/author_12.csv').
+    typed : bool
+        Привести колонки к схеме NOTE_SCHEMA (apply_schema): разобранные даты, год,
+        компактные ID и флаги. При False колонки возвращаются в том виде, в каком их прочитал pandas.
+    arrow_strings : bool
+        Хранить текст в строках Arrow (string[pyarrow]): меньше памяти, векторизованные
+        операции в clean_text_column, compute_text_statistics и dict_viz (быстрее только
+        на больших дневниках, см. benchmark_string_storage). Нужен pyarrow
+        (pip install prozhito_nlp[arrow]).
 
     Возвращает:
     -----------
@@ -90,6 +174,11 @@ def load_diary_from_csv(file_path: str) -> pd.DataFrame:
     pd.set_option("display.max_colwidth", None)
 
     # Чтение файла
-    df = pd.read_csv(file_path, sep=",")
+    if arrow_strings:
+        df = read_csv_arrow(file_path)
+    else:
+        df = pd.read_csv(file_path, sep=",")
 
+    if typed:
+        df = apply_schema(df)
     return df
\ No newline at end of file
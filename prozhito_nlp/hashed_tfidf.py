@@ -0,0 +1,257 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+N_FEATURES = 2 ** 18
+
+
+class HashedTfidfAggregator:
+    """
+    Накопительный TF-IDF по годам на хешировании признаков (HashingVectorizer):
+    словарь не строится, память — несколько массивов по n_features на каждый год,
+    независимо от объёма корпуса.
+
+    Первый проход (update) копит число документов и документную частоту по годам, а также
+    сумму L2-нормированных частот — из неё, как в chunked.TfidfAggregator, получаются
+    приближённые оценки. Второй проход по тем же кускам (rescore) считает TF-IDF каждого
+    документа с итоговым IDF и нормирует его после умножения, как TfidfVectorizer, —
+    тогда результат отличается от compute_tfidf_by_year только из-за коллизий хешей.
+
+    Для вывода хранится таблица «признак → лемма»: в каждой ячейке — лемма, набравшая
+    большинство вхождений среди попавших в неё (алгоритм Мисры — Гриса с одним счётчиком),
+    и отметка, была ли в ячейке коллизия.
+    """
+
+    def __init__(
+        self,
+        text_column: str,
+        year_column: str,
+        stop_words: Optional[List[str]] = None,
+        n_features: int = N_FEATURES
+    ):
+        self.text_column = text_column
+        self.year_column = year_column
+        self.n_features = n_features
+        # Токенизация и стоп-слова — те же, что у TfidfVectorizer
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None, stop_words=stop_words, dtype=np.float64
+        )
+        self.analyzer = self.vectorizer.build_analyzer()
+        self.n_docs: Counter = Counter()
+        self.doc_freq: Dict[Any, np.ndarray] = {}
+        self.norm_tf: Dict[Any, np.ndarray] = {}
+        self.scores: Dict[Any, np.ndarray] = {}
+        self.lemmas = np.full(n_features, None, dtype=object)
+        self.lemma_weights = np.zeros(n_features, dtype=np.int64)
+        self.collided = np.zeros(n_features, dtype=bool)
+
+    def _year_matrices(self, chunk: pd.DataFrame):
+        """Матрицы частот (документы × признаки) записей куска, сгруппированные по годам."""
+        years = chunk[self.year_column]
+        valid = years.notna().to_numpy()
+        texts = chunk[self.text_column].fillna("").astype(str)[valid]
+        counts = self.vectorizer.transform(texts).tocsr()
+        # Год после apply_schema — Int16 с пропусками; разреженной матрице нужна маска numpy
+        years = years[valid].to_numpy()
+        for year in pd.unique(years):
+            yield year, counts[np.asarray(years == year)]
+
+    def _update_lemmas(self, texts: Iterable[str]) -> None:
+        """Обновляет таблицу «признак → лемма» частотами лемм куска."""
+        word_counts = Counter()
+        for text in texts:
+            word_counts.update(self.analyzer(text))
+        if not word_counts:
+            return
+        words = list(word_counts)
+        features = self.vectorizer.transform(words).tocsr().indices
+        for word, feature, count in zip(words, features, word_counts.values()):
+            current = self.lemmas[feature]
+            if current == word:
+                self.lemma_weights[feature] += count
+            elif current is None:
+                self.lemmas[feature] = word
+                self.lemma_weights[feature] = count
+            else:
+                self.collided[feature] = True
+                if self.lemma_weights[feature] > count:
+                    self.lemma_weights[feature] -= count
+                else:
+                    self.lemmas[feature] = word
+                    self.lemma_weights[feature] = count - self.lemma_weights[feature]
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        valid = chunk[self.year_column].notna().to_numpy()
+        self._update_lemmas(chunk[self.text_column].fillna("").astype(str)[valid])
+        for year, counts in self._year_matrices(chunk):
+            if year not in self.doc_freq:
+                self.doc_freq[year] = np.zeros(self.n_features, dtype=np.int32)
+                self.norm_tf[year] = np.zeros(self.n_features, dtype=np.float32)
+            self.n_docs[year] += counts.shape[0]
+            self.doc_freq[year] += np.bincount(counts.indices, minlength=self.n_features).astype(np.int32)
+            self.norm_tf[year] += np.bincount(
+                counts.indices, weights=_l2_normalized_data(counts), minlength=self.n_features
+            ).astype(np.float32)
+        # Новые документы меняют IDF, поэтому оценки второго прохода устаревают
+        self.scores = {}
+
+    def idf(self, year: Any) -> np.ndarray:
+        """Сглаженный IDF признаков за год (как в TfidfVectorizer)."""
+        return np.log((1 + self.n_docs[year]) / (1 + self.doc_freq[year].astype(np.float64))) + 1
+
+    def rescore(self, chunks: Iterable[pd.DataFrame]) -> None:
+        """
+        Второй проход: точные суммы TF-IDF по документам с итоговым IDF.
+        chunks — те же куски, что были переданы в update.
+        """
+        idfs = {year: self.idf(year) for year in self.n_docs}
+        scores = {year: np.zeros(self.n_features, dtype=np.float64) for year in self.n_docs}
+        for chunk in chunks:
+            for year, counts in self._year_matrices(chunk):
+                counts = counts.copy()
+                counts.data *= idfs[year][counts.indices]
+                scores[year] += np.bincount(
+                    counts.indices, weights=_l2_normalized_data(counts), minlength=self.n_features
+                )
+        self.scores = scores
+
+    def merge(self, other: "HashedTfidfAggregator") -> "HashedTfidfAggregator":
+        if other.n_features != self.n_features:
+            raise ValueError("Нельзя объединить агрегаторы с разным n_features")
+        self.n_docs.update(other.n_docs)
+        for year in other.doc_freq:
+            if year in self.doc_freq:
+                self.doc_freq[year] += other.doc_freq[year]
+                self.norm_tf[year] += other.norm_tf[year]
+            else:
+                self.doc_freq[year] = other.doc_freq[year].copy()
+                self.norm_tf[year] = other.norm_tf[year].copy()
+        # Объединение таблиц лемм — тот же шаг Мисры — Гриса, только с накопленными весами
+        same = self.lemmas == other.lemmas
+        self.lemma_weights[same] += other.lemma_weights[same]
+        mine, theirs = pd.isna(self.lemmas), pd.isna(other.lemmas)
+        empty = mine & ~theirs
+        self.lemmas[empty] = other.lemmas[empty]
+        self.lemma_weights[empty] = other.lemma_weights[empty]
+        conflict = ~same & ~mine & ~theirs
+        self.collided |= other.collided | conflict
+        replace = conflict & (other.lemma_weights >= self.lemma_weights)
+        self.lemma_weights[conflict] = np.abs(self.lemma_weights[conflict] - other.lemma_weights[conflict])
+        self.lemmas[replace] = other.lemmas[replace]
+        self.scores = {}
+        return self
+
+    def year_scores(self, year: Any) -> np.ndarray:
+        """Оценки признаков за год: точные после rescore, иначе приближённые."""
+        if year in self.scores:
+            return self.scores[year]
+        return self.norm_tf[year] * self.idf(year)
+
+    def collision_rate(self, year: Any) -> float:
+        """Доля признаков года, в которые попало больше одной леммы."""
+        present = self.doc_freq[year] > 0
+        return float(self.collided[present].mean()) if present.any() else 0.0
+
+    def result(self, top_n: int = 20) -> pd.DataFrame:
+        """
+        Возвращает таблицу в формате compute_tfidf_by_year: TF-IDF, word, year.
+        """
+        frames = []
+        for year in sorted(self.n_docs):
+            scores = self.year_scores(year)
+            nonzero = np.flatnonzero(scores)
+            if not len(nonzero):
+                continue
+            top = nonzero[np.argsort(-scores[nonzero], kind="stable")[:top_n]]
+            temp_df = pd.DataFrame({'TF-IDF': scores[top].astype(float), 'word': self.lemmas[top]})
+            temp_df['year'] = year
+            frames.append(temp_df)
+        if not frames:
+            return pd.DataFrame(columns=['TF-IDF', 'word', 'year'])
+        return pd.concat(frames, ignore_index=True)
+
+
+def _l2_normalized_data(matrix: sparse.csr_matrix) -> np.ndarray:
+    """Значения matrix.data после L2-нормировки строк (в том же порядке, что matrix.indices)."""
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+    return matrix.data / norms[rows]
+
+
+def compute_tfidf_by_year_hashed(
+    df: pd.DataFrame,
+    text_column: str,
+    year_column: str,
+    stop_words: Optional[List[str]] = None,
+    top_n: int = 20,
+    n_features: int = N_FEATURES,
+    chunksize: int = 1000,
+    exact_norm: bool = True
+) -> pd.DataFrame:
+    """
+    TF-IDF по годам с хешированием признаков, кусками по chunksize записей.
+
+    Параметры:
+    - n_features: число хеш-признаков (память — несколько массивов такого размера на год)
+    - exact_norm: делать ли второй проход (rescore) — результат ближе к compute_tfidf_by_year
+
+    Возвращает:
+    - pd.DataFrame в формате compute_tfidf_by_year: TF-IDF, word, year
+    """
+    aggregator = HashedTfidfAggregator(text_column, year_column, stop_words=stop_words, n_features=n_features)
+    chunks = [df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize)]
+    for chunk in chunks:
+        aggregator.update(chunk)
+    if exact_norm:
+        aggregator.rescore(chunks)
+    return aggregator.result(top_n=top_n)
+
+
+def tfidf_error_report(
+    df: pd.DataFrame,
+    text_column: str,
+    year_column: str,
+    stop_words_path: str,
+    top_n: int = 20,
+    n_features: int = N_FEATURES,
+    exact_norm: bool = True
+) -> pd.DataFrame:
+    """
+    Сравнивает хешированный TF-IDF с точным (compute_tfidf_by_year) по годам.
+
+    Возвращает:
+    - pd.DataFrame с колонками year, top_overlap (доля общих слов в топ-n),
+      mean_relative_error и max_relative_error (относительная ошибка оценок общих слов),
+      collision_rate (доля признаков года с коллизиями)
+    """
+    from .resources import load_stop_words
+    from .tfidf import compute_tfidf_by_year
+
+    exact = compute_tfidf_by_year(df, text_column, year_column, stop_words_path, top_n=top_n)
+    aggregator = HashedTfidfAggregator(
+        text_column, year_column, stop_words=load_stop_words(stop_words_path), n_features=n_features
+    )
+    aggregator.update(df)
+    if exact_norm:
+        aggregator.rescore([df])
+    hashed = aggregator.result(top_n=top_n)
+
+    rows = []
+    for year, exact_year in exact.groupby('year', sort=True):
+        hashed_year = hashed[hashed['year'] == year]
+        shared = exact_year.merge(hashed_year, on='word', suffixes=('_exact', '_hashed'))
+        errors = (
+            (shared['TF-IDF_hashed'] - shared['TF-IDF_exact']).abs() / shared['TF-IDF_exact'].astype(float)
+        ).astype(float)
+        rows.append({
+            'year': year,
+            'top_overlap': len(shared) / len(exact_year) if len(exact_year) else 1.0,
+            'mean_relative_error': errors.mean() if len(errors) else np.nan,
+            'max_relative_error': errors.max() if len(errors) else np.nan,
+            'collision_rate': aggregator.collision_rate(year) if year in aggregator.doc_freq else 0.0,
+        })
+    return pd.DataFrame(rows, columns=['year', 'top_overlap', 'mean_relative_error', 'max_relative_error', 'collision_rate'])
@@ -0,0 +1,432 @@
+import os
+import pickle
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .preprocessing import clean_text_column
+from .lemmatizer import LemmatizerNatasha, lemmatize_column
+from .basic_text_metrics import clean_punctuation
+from .tfidf import compute_tfidf_by_year
+from .dict_match import load_custom_dictionaries, find_dictionary_matches
+from .sentiment import load_rusentilex_dict, score_text_sentiment, calculate_sentiment_score
+from .schema import ensure_datetime
+
+STATE_FILE = "incremental_state.pkl"
+SEGMENTS_DIR = "segments"
+INDEX_FILE = "index.pkl"
+
+
+def note_fingerprints(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+    """
+    Вычисляет 64-битный отпечаток каждой записи по указанным колонкам.
+    Изменение текста или даты записи меняет её отпечаток.
+    """
+    return pd.util.hash_pandas_object(df[columns].astype(str), index=False).astype(np.uint64)
+
+
+class IncrementalCorpus:
+    """
+    Хранилище результатов по отдельным записям с инкрементальным обновлением.
+
+    При каждом вызове update() определяются новые и изменённые записи (по id и отпечатку
+    текста и даты), и только они проходят очистку, лемматизацию и подсчёт сентимента
+    и словарных совпадений. Дневные и годовые агрегаты обновляются на месте
+    (вычитаются старые вклады записей, добавляются новые), а TF-IDF пересчитывается
+    только для затронутых пар (автор, год) по уже сохранённым леммам.
+
+    Обработанные записи хранятся на диске сегментами, которые только дописываются:
+    каждое обновление пишет новую папку segments/<номер>/ с файлом на каждого автора
+    (только новые и изменённые записи) и index.pkl (их ID и отпечатки, удалённые ID).
+    Каталог — какая версия записи актуальна и в каком она сегменте — собирается из index.pkl
+    при открытии хранилища и держится в памяти; сами записи читаются с диска только тогда,
+    когда нужны: старые версии изменённых записей (чтобы вычесть их вклад) и записи
+    пересчитываемых пар (автор, год) для TF-IDF. Целиком перезаписываются лишь агрегаты,
+    поэтому объём записи при обновлении пропорционален изменениям, а не корпусу.
+    Старые версии записей остаются в прежних сегментах, пока не вызван compact().
+
+    Параметры:
+    - store_dir: папка, где хранится состояние между запусками
+    - dict_dir: папка со словарями name_lemm.txt
+    - dict_names: список словарей
+    - lexicon_path: путь к rusentilex_clean.txt
+    - stop_words_path: путь к стоп-словам (если не указан, TF-IDF не считается)
+    - top_n: сколько слов TF-IDF хранить на каждый год
+    """
+
+    def __init__(
+        self,
+        store_dir: str,
+        dict_dir: str,
+        dict_names: List[str],
+        lexicon_path: str,
+        stop_words_path: Optional[str] = None,
+        top_n: int = 20,
+        text_column: str = "text",
+        date_column: str = "date",
+        id_column: str = "id",
+        person_column: str = "person",
+        lemmatizer: Optional[LemmatizerNatasha] = None
+    ):
+        self.store_dir = store_dir
+        self.dict_dir = dict_dir
+        self.dict_names = list(dict_names)
+        self.lexicon_path = lexicon_path
+        self.stop_words_path = stop_words_path
+        self.top_n = top_n
+        self.text_column = text_column
+        self.date_column = date_column
+        self.id_column = id_column
+        self.person_column = person_column
+        self._lemmatizer = lemmatizer
+        self._lexicon = None
+        self._phrase_dicts = None
+
+        # Каталог актуальных записей: ID → отпечаток, автор, год и номер сегмента
+        self.catalog = self._empty_catalog()
+        self.segments = 0
+        self.first_segment = 1
+        self._pending: Dict[int, Tuple[pd.DataFrame, List[Any]]] = {}
+        self.daily = pd.DataFrame(columns=["sentiment_sum", "notes"])
+        self.yearly = pd.DataFrame()
+        self.tfidf: Dict[Any, pd.DataFrame] = {}
+        self._load_state()
+
+    # --- Состояние на диске ---
+
+    def _empty_catalog(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "fingerprint": pd.Series(dtype=np.uint64),
+            self.person_column: pd.Series(dtype=object),
+            "year": pd.Series(dtype=float),
+            "segment": pd.Series(dtype=np.int64),
+        })
+
+    def _state_path(self) -> str:
+        return os.path.join(self.store_dir, STATE_FILE)
+
+    def _segment_dir(self, segment: int) -> str:
+        return os.path.join(self.store_dir, SEGMENTS_DIR, f"{segment:06d}")
+
+    def _segment_path(self, segment: int, person: Any) -> str:
+        return os.path.join(self._segment_dir(segment), f"person_{person}.pkl")
+
+    def _load_state(self) -> None:
+        path = self._state_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        self.daily = state["daily"]
+        self.yearly = state["yearly"]
+        self.tfidf = state["tfidf"]
+        if "notes" in state:
+            # Хранилище старого формата (все записи в одном файле) переводится в сегменты
+            if not state["notes"].empty:
+                self._add_segment(state["notes"], [])
+            self.save()
+            return
+
+        # Сегменты с номером больше сохранённого — от прерванного обновления, они не учитываются
+        self.segments = state["segments"]
+        self.first_segment = state["first_segment"]
+        added, removed = [], []
+        for segment in range(self.first_segment, self.segments + 1):
+            with open(os.path.join(self._segment_dir(segment), INDEX_FILE), "rb") as f:
+                index = pickle.load(f)
+            added.append(index["added"].assign(segment=segment))
+            removed.append(pd.DataFrame({"segment": segment}, index=pd.Index(index["removed"])))
+        self.catalog = self._replay(added, removed)
+
+    def _replay(self, added: List[pd.DataFrame], removed: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Собирает каталог из сегментов, идущих по порядку: по каждому ID действует последнее
+        событие — добавление (новая версия записи) или удаление.
+        """
+        if not added:
+            return self._empty_catalog()
+        catalog = pd.concat(added)
+        catalog = catalog[~catalog.index.duplicated(keep="last")]
+        removed = pd.concat(removed)["segment"] if removed else pd.Series(dtype=np.int64)
+        removed = removed[~removed.index.duplicated(keep="last")]
+        # В одном сегменте запись не может быть и добавлена, и удалена
+        removed_later = removed.reindex(catalog.index).fillna(0).to_numpy() > catalog["segment"].to_numpy()
+        return catalog[~removed_later].astype({"segment": np.int64})
+
+    def _add_segment(self, rows: pd.DataFrame, removed: List[Any]) -> None:
+        """
+        Регистрирует новый сегмент: обработанные записи rows и удалённые ID.
+        На диск сегмент пишется при save().
+        """
+        self.segments += 1
+        self._pending[self.segments] = (rows, list(removed))
+        outdated = rows.index.append(pd.Index(removed)) if removed else rows.index
+        catalog = self.catalog.drop(index=self.catalog.index.intersection(outdated))
+        if not rows.empty:
+            entries = rows[["fingerprint", self.person_column, "year"]].assign(segment=self.segments)
+            catalog = pd.concat([catalog, entries]) if not catalog.empty else entries
+        self.catalog = catalog
+
+    def _write_segment(self, segment: int, rows: pd.DataFrame, removed: List[Any]) -> None:
+        directory = self._segment_dir(segment)
+        # Остатки прерванного обновления с тем же номером
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        if not rows.empty:
+            for person, person_rows in rows.groupby(self.person_column, sort=False, observed=True):
+                with open(self._segment_path(segment, person), "wb") as f:
+                    pickle.dump(person_rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        index = {"added": rows.reindex(columns=["fingerprint", self.person_column, "year"]), "removed": removed}
+        with open(os.path.join(directory, INDEX_FILE), "wb") as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def save(self) -> None:
+        """
+        Дописывает на диск новые сегменты записей и сохраняет агрегаты
+        (атомарно, через временный файл: пока он не заменён, новые сегменты не учитываются).
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        for segment, (rows, removed) in sorted(self._pending.items()):
+            self._write_segment(segment, rows, removed)
+        self._pending = {}
+
+        path = self._state_path()
+        state = {
+            "segments": self.segments, "first_segment": self.first_segment,
+            "daily": self.daily, "yearly": self.yearly, "tfidf": self.tfidf
+        }
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def load_notes(self, ids: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        Читает обработанные записи (актуальные версии) из сегментов.
+        Читаются только файлы тех сегментов и авторов, где лежат запрошенные записи.
+
+        Параметры:
+        - ids: ID записей (по умолчанию — все записи хранилища)
+        """
+        entries = self.catalog if ids is None else self.catalog.loc[ids]
+        frames = []
+        for (segment, person), group in entries.groupby(["segment", self.person_column], sort=True, observed=True):
+            if segment in self._pending:
+                rows = self._pending[segment][0]
+            else:
+                with open(self._segment_path(segment, person), "rb") as f:
+                    rows = pickle.load(f)
+            frames.append(rows.loc[group.index])
+        if not frames:
+            return pd.DataFrame()
+        notes = pd.concat(frames)
+        return notes.loc[entries.index]
+
+    @property
+    def notes(self) -> pd.DataFrame:
+        """Все обработанные записи хранилища (читаются с диска, см. load_notes)."""
+        return self.load_notes()
+
+    def compact(self) -> None:
+        """
+        Переписывает все актуальные записи в один сегмент и удаляет старые сегменты
+        вместе с устаревшими версиями записей.
+        """
+        notes = self.load_notes()
+        old_segments = range(self.first_segment, self.segments + 1)
+        self._pending = {}
+        self.catalog = self._empty_catalog()
+        self.first_segment = self.segments + 1
+        if not notes.empty:
+            self._add_segment(notes, [])
+        self.save()
+        for segment in old_segments:
+            shutil.rmtree(self._segment_dir(segment), ignore_errors=True)
+
+    # --- Ресурсы загружаются лениво, один раз на объект ---
+
+    @property
+    def lemmatizer(self) -> LemmatizerNatasha:
+        if self._lemmatizer is None:
+            self._lemmatizer = LemmatizerNatasha()
+        return self._lemmatizer
+
+    @property
+    def lexicon(self):
+        if self._lexicon is None:
+            self._lexicon = load_rusentilex_dict(self.lexicon_path)
+        return self._lexicon
+
+    @property
+    def phrase_dicts(self):
+        if self._phrase_dicts is None:
+            self._phrase_dicts = load_custom_dictionaries(self.dict_dir, self.dict_names)
+        return self._phrase_dicts
+
+    # --- Обработка ---
+
+    def _process_notes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Прогоняет записи через очистку, лемматизацию и подсчёт показателей.
+        """
+        processed = clean_text_column(df.copy(), text_column=self.text_column)
+        processed = lemmatize_column(processed, text_column=self.text_column, new_column="tokens", lemmatizer=self.lemmatizer)
+        processed["tokens_no_punkt"] = processed["tokens"].apply(clean_punctuation)
+        processed["n_tokens"] = processed["tokens_no_punkt"].str.split().map(len)
+
+        counts = processed["tokens"].apply(lambda text: score_text_sentiment(text, self.lexicon))
+        processed["positive"] = counts.str[0].astype(int)
+        processed["neutral"] = counts.str[1].astype(int)
+        processed["negative"] = counts.str[2].astype(int)
+        processed["rusentilex_score"] = [
+            calculate_sentiment_score(pos, neu, neg)
+            for pos, neu, neg in zip(processed["positive"], processed["neutral"], processed["negative"])
+        ]
+
+        for category in self.phrase_dicts:
+            processed[f"dict_{category}"] = 0
+        for idx, text in processed["tokens_no_punkt"].items():
+            for category, matches in find_dictionary_matches(text, self.phrase_dicts).items():
+                processed.at[idx, f"dict_{category}"] = len(matches)
+
+        processed["date"] = ensure_datetime(processed[self.date_column])
+        processed["year"] = processed["date"].dt.year
+        return processed.set_index(self.id_column)
+
+    def _aggregate_columns(self) -> List[str]:
+        return ["n_tokens", "positive", "neutral", "negative"] + [f"dict_{category}" for category in self.phrase_dicts]
+
+    def _apply_to_aggregates(self, rows: pd.DataFrame, sign: int) -> None:
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) вклад записей в дневные и годовые агрегаты.
+        """
+        if rows.empty:
+            return
+
+        daily_rows = rows.dropna(subset=["date"])
+        daily_delta = pd.DataFrame({
+            "sentiment_sum": daily_rows["rusentilex_score"],
+            "notes": 1,
+        }).groupby([daily_rows[self.person_column], daily_rows["date"]], observed=True).sum() * sign
+        self.daily = daily_delta if self.daily.empty else self.daily.add(daily_delta, fill_value=0)
+        self.daily = self.daily[self.daily["notes"] > 0].sort_index().astype({"notes": int})
+
+        yearly_rows = rows.dropna(subset=["year"])
+        columns = self._aggregate_columns()
+        yearly_delta = yearly_rows[columns].assign(notes=1).groupby(
+            [yearly_rows[self.person_column], yearly_rows["year"].astype(int)], observed=True
+        ).sum() * sign
+        self.yearly = yearly_delta if self.yearly.empty else self.yearly.add(yearly_delta, fill_value=0)
+        self.yearly = self.yearly[self.yearly["notes"] > 0].sort_index().astype(int)
+
+    def _year_keys(self, rows: pd.DataFrame) -> set:
+        rows = rows.dropna(subset=["year"])
+        return set(zip(rows[self.person_column], rows["year"].astype(int)))
+
+    def _refresh_tfidf(self, keys) -> None:
+        """
+        Пересчитывает TF-IDF для затронутых пар (автор, год) по сохранённым леммам.
+        """
+        if self.stop_words_path is None or not keys:
+            return
+        # Записи всех затронутых пар читаются за один проход по сегментам
+        catalog_keys = pd.MultiIndex.from_arrays([self.catalog[self.person_column], self.catalog["year"]])
+        notes = self.load_notes(self.catalog.index[catalog_keys.isin(list(keys))])
+        for person, year in keys:
+            year_notes = notes[(notes[self.person_column] == person) & (notes["year"] == year)] if not notes.empty else notes
+            if year_notes.empty:
+                self.tfidf.pop((person, year), None)
+                continue
+            self.tfidf[(person, year)] = compute_tfidf_by_year(
+                year_notes, "tokens", "year", self.stop_words_path, top_n=self.top_n
+            )
+
+    def update(self, df: pd.DataFrame, full_snapshot: bool = False, save: bool = True) -> Dict[str, int]:
+        """
+        Обновляет хранилище новыми данными.
+
+        Параметры:
+        - df: записи в исходном виде (как после split_json_to_csv / load_diary_from_csv);
+          достаточно передать только новые и изменённые записи — отпечатки считаются по df
+        - full_snapshot: если True, df считается полной выгрузкой по своим авторам,
+          и записи этих авторов, которых в df нет, удаляются из хранилища
+        - save: сохранить состояние на диск после обновления
+
+        Возвращает:
+        - dict с количеством новых, изменённых, удалённых и неизменных записей
+        """
+        df = df.drop_duplicates(subset=self.id_column, keep="last").set_index(self.id_column, drop=False)
+        fingerprints = note_fingerprints(df, [self.text_column, self.date_column])
+        fingerprints.index = df.index
+
+        known = self.catalog["fingerprint"]
+
+        is_known = df.index.isin(known.index)
+        new_ids = df.index[~is_known]
+        common = df.index[is_known]
+        changed_ids = common[fingerprints.loc[common].values != known.loc[common].values]
+
+        removed_ids = pd.Index([])
+        if full_snapshot and not self.catalog.empty:
+            persons = df[self.person_column].unique()
+            stored = self.catalog[self.catalog[self.person_column].isin(persons)].index
+            removed_ids = stored.difference(df.index)
+
+        # Вычитаем вклад устаревших версий записей (читаются только их сегменты)
+        outdated = self.load_notes(changed_ids.append(removed_ids)) if len(changed_ids) + len(removed_ids) else pd.DataFrame()
+        self._apply_to_aggregates(outdated, sign=-1)
+        dirty = set()
+        if not outdated.empty:
+            dirty.update(self._year_keys(outdated))
+
+        delta_ids = new_ids.append(changed_ids)
+        if len(delta_ids) or len(removed_ids):
+            if len(delta_ids):
+                processed = self._process_notes(df.loc[delta_ids].reset_index(drop=True))
+                processed["fingerprint"] = fingerprints.loc[processed.index].values
+                self._apply_to_aggregates(processed, sign=1)
+                dirty.update(self._year_keys(processed))
+            else:
+                processed = pd.DataFrame()
+            self._add_segment(processed, list(removed_ids))
+
+        self._refresh_tfidf(sorted(dirty))
+        if save:
+            self.save()
+
+        return {
+            "new": len(new_ids),
+            "changed": len(changed_ids),
+            "removed": len(removed_ids),
+            "unchanged": len(common) - len(changed_ids),
+        }
+
+    # --- Доступ к результатам ---
+
+    def daily_sentiment(self, person: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Возвращает средний сентимент по дням (колонки date, rusentilex_score),
+        совместимый с plot_sentiment_dynamics и plot_sentiment_calendar.
+        """
+        daily = self.daily
+        if person is not None:
+            daily = daily.xs(person, level=0, drop_level=False)
+        return (daily["sentiment_sum"] / daily["notes"]).rename("rusentilex_score").reset_index()
+
+    def yearly_totals(self, person: Optional[Any] = None) -> pd.DataFrame:
+        """
+        Возвращает годовые суммы: число записей и токенов, совпадения по полярностям и словарям.
+        """
+        if person is None:
+            return self.yearly.copy()
+        return self.yearly.xs(person, level=0)
+
+    def tfidf_by_year(self, person: Any) -> pd.DataFrame:
+        """
+        Возвращает TF-IDF по годам для автора в формате compute_tfidf_by_year.
+        """
+        frames = [frame for (p, _), frame in sorted(self.tfidf.items()) if p == person]
+        if not frames:
+            return pd.DataFrame(columns=['TF-IDF', 'word', 'year'])
+        return pd.concat(frames, ignore_index=True)
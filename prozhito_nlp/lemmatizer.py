@@ -1,7 +1,11 @@
 from natasha import Doc, MorphVocab, NewsMorphTagger, NewsEmbedding, Segmenter
+from natasha.doc import inject_morph, sent_words
 from tqdm import tqdm
+from typing import List, Optional
 import pandas as pd
 
+from .arrow_strings import is_arrow_string
+
 tqdm.pandas(desc="Лемматизация записей")
 
 class LemmatizerNatasha:
@@ -9,10 +13,11 @@ class LemmatizerNatasha:
     Класс-обёртка для лемматизации текстов с помощью Natasha.
     """
 
-    def __init__(self):
+    def __init__(self, emb: Optional[NewsEmbedding] = None, tagger: Optional[NewsMorphTagger] = None):
+        # Готовые эмбеддинги и теггер можно передать извне, чтобы не загружать их повторно
         self.segmenter = Segmenter()
-        self.emb = NewsEmbedding()
-        self.tagger = NewsMorphTagger(self.emb)
+        self.emb = emb if emb is not None else NewsEmbedding()
+        self.tagger = tagger if tagger is not None else NewsMorphTagger(self.emb)
         self.morph_vocab = MorphVocab()
 
     def lemmatize_text(self, text: str) -> str:
@@ -23,7 +28,35 @@ class LemmatizerNatasha:
             token.lemmatize(self.morph_vocab)
         return ' '.join([token.lemma for token in doc.tokens])
 
-def lemmatize_column(df: pd.DataFrame, text_column: str = "text", new_column: str = "tokens") -> pd.DataFrame:
+    def lemmatize_texts(self, texts: List[str]) -> List[str]:
+        """
+        Лемматизирует несколько текстов за один проход теггера:
+        предложения всех текстов размечаются общими пакетами.
+        """
+        docs = []
+        for text in texts:
+            doc = Doc(text)
+            doc.segment(self.segmenter)
+            docs.append(doc)
+
+        sents = [sent for doc in docs for sent in doc.sents]
+        markups = self.tagger.map([sent_words(sent) for sent in sents])
+        for sent, markup in zip(sents, markups):
+            inject_morph(sent.tokens, markup.tokens)
+
+        lemmas = []
+        for doc in docs:
+            for token in doc.tokens:
+                token.lemmatize(self.morph_vocab)
+            lemmas.append(' '.join([token.lemma for token in doc.tokens]))
+        return lemmas
+
+def lemmatize_column(
+    df: pd.DataFrame,
+    text_column: str = "text",
+    new_column: str = "tokens",
+    lemmatizer: Optional[LemmatizerNatasha] = None
+) -> pd.DataFrame:
     """
     Лемматизирует тексты из указанной колонки и сохраняет результат в новой колонке.
 
@@ -31,10 +64,14 @@ def lemmatize_column(df: pd.DataFrame, text_column: str = "text", new_column: st
     - df: pd.DataFrame — датафрейм с текстами
     - text_column: str — колонка с исходным текстом
     - new_column: str — колонка для записи результата
+    - lemmatizer: LemmatizerNatasha — готовый лемматизатор (если не указан, создаётся новый)
 
     Возвращает:
-    - df: pd.DataFrame с новой колонкой
+    - df: pd.DataFrame с новой колонкой (для текстов в строках Arrow — тоже в строках Arrow)
     """
-    lemmatizer = LemmatizerNatasha()
+    if lemmatizer is None:
+        lemmatizer = LemmatizerNatasha()
     df[new_column] = df[text_column].progress_apply(lemmatizer.lemmatize_text)
+    if is_arrow_string(df[text_column]):
+        df[new_column] = df[new_column].astype(df[text_column].dtype)
     return df
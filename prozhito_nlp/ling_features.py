@@ -1,16 +1,17 @@
 import re
 from collections import Counter
-from typing import List, Dict, Set, Union
+from typing import List, Dict, Optional, Set, Union
 from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsMorphTagger, Doc
+from natasha.doc import inject_morph, sent_words
 
 
 class NatashaAnalyzer:
     """Инициализация и обработка текста с помощью Natasha."""
-    def __init__(self):
+    def __init__(self, emb: Optional[NewsEmbedding] = None, morph_tagger: Optional[NewsMorphTagger] = None):
         self.segmenter = Segmenter()
         self.morph_vocab = MorphVocab()
-        self.emb = NewsEmbedding()
-        self.morph_tagger = NewsMorphTagger(self.emb)
+        self.emb = emb if emb is not None else NewsEmbedding()
+        self.morph_tagger = morph_tagger if morph_tagger is not None else NewsMorphTagger(self.emb)
 
     def process(self, text: str) -> Doc:
         doc = Doc(text)
@@ -18,6 +19,19 @@ class NatashaAnalyzer:
         doc.tag_morph(self.morph_tagger)
         return doc
 
+    def process_texts(self, texts: List[str]) -> List[Doc]:
+        """То же, что process для каждого текста, но предложения всех текстов размечаются общими пакетами."""
+        docs = []
+        for text in texts:
+            doc = Doc(text)
+            doc.segment(self.segmenter)
+            docs.append(doc)
+        sents = [sent for doc in docs for sent in doc.sents]
+        markups = self.morph_tagger.map([sent_words(sent) for sent in sents])
+        for sent, markup in zip(sents, markups):
+            inject_morph(sent.tokens, markup.tokens)
+        return docs
+
 
 def calc_percentage(count: int, total: int) -> float:
     """Вычислить процент с округлением."""
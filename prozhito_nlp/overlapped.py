@@ -0,0 +1,252 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .file_reader import load_diary_from_csv, author_frame_from_json
+from .lemmatizer import LemmatizerNatasha
+from .dict_match import load_custom_dictionaries
+from .sentiment import load_rusentilex_dict
+from .pipeline import DATA_DIR, DEFAULT_DICT_NAMES, list_person_ids
+from .batch import prepare_author, resolve_author_files, score_author
+
+# Сколько готовых результатов может ждать между соседними этапами: при полной очереди
+# этап останавливается, пока следующий не заберёт работу (в памяти — не больше queue_size
+# авторов на каждую очередь)
+DEFAULT_QUEUE_SIZE = 2
+
+# Как часто заблокированный поток проверяет, не остановлен ли конвейер, с
+_POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+_SCORER: Dict[str, Any] = {}
+
+
+class AuthorSkipped(Exception):
+    """Автора нечего обрабатывать (нет файла или записей); текст ошибки попадает в сводную таблицу."""
+
+
+class _Failed:
+    """Ошибка обработки элемента: передаётся дальше по конвейеру вместо результата."""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+def _put(target: queue.Queue, value: Any, stop: threading.Event) -> bool:
+    """Кладёт значение в очередь, ожидая места; False, если конвейер остановлен."""
+    while not stop.is_set():
+        try:
+            target.put(value, timeout=_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source: queue.Queue, stop: threading.Event) -> Any:
+    """Берёт значение из очереди, ожидая его; _DONE, если конвейер остановлен."""
+    while not stop.is_set():
+        try:
+            return source.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def iter_overlapped(
+    items: Iterable[Any],
+    stages: Sequence[Tuple[str, Callable[[Any], Any]]],
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Пропускает элементы через цепочку этапов, выполняя этапы одновременно:
+    у каждого этапа свой поток, между соседними этапами — очередь на queue_size элементов.
+    Пока один этап ждёт диска, другой работает с уже прочитанными данными; если этап
+    не успевает, предыдущие останавливаются на полной очереди (обратное давление).
+
+    Порядок элементов сохраняется. Ошибка этапа не останавливает конвейер: следующие этапы
+    пропускают этот элемент, а вместо результата выдаётся исключение.
+
+    Параметры:
+    - items: входные элементы (их перебор идёт в отдельном потоке)
+    - stages: список (название, функция); функция получает результат предыдущего этапа
+      (первая — сам элемент)
+    - queue_size: размер очередей между этапами
+    - stats: если передан словарь, в него по каждому этапу записываются items (обработано),
+      busy (время работы, с), starved (ожидание входа, с), blocked (ожидание места в очереди, с)
+
+    Возвращает:
+    - итератор пар (элемент, результат последнего этапа или исключение)
+    """
+    if queue_size < 1:
+        raise ValueError("queue_size должен быть не меньше 1")
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    if stats is not None:
+        for name, _ in stages:
+            stats[name] = {"items": 0, "busy": 0.0, "starved": 0.0, "blocked": 0.0}
+
+    def feed():
+        try:
+            for item in items:
+                if not _put(queues[0], (item, item), stop):
+                    return
+        except BaseException as exc:
+            _put(queues[0], (_DONE, exc), stop)
+        _put(queues[0], _DONE, stop)
+
+    def work(name, func, source, target):
+        counters = stats[name] if stats is not None else {"items": 0, "busy": 0.0, "starved": 0.0, "blocked": 0.0}
+        while True:
+            start = time.perf_counter()
+            entry = _get(source, stop)
+            counters["starved"] += time.perf_counter() - start
+            if entry is _DONE:
+                _put(target, _DONE, stop)
+                return
+            item, value = entry
+            if item is not _DONE and not isinstance(value, _Failed):
+                start = time.perf_counter()
+                try:
+                    value = func(value)
+                except Exception as exc:
+                    value = _Failed(name, exc)
+                counters["busy"] += time.perf_counter() - start
+                counters["items"] += 1
+            start = time.perf_counter()
+            if not _put(target, (item, value), stop):
+                return
+            counters["blocked"] += time.perf_counter() - start
+
+    threads = [threading.Thread(target=feed, name="overlapped-feed", daemon=True)]
+    for index, (name, func) in enumerate(stages):
+        threads.append(threading.Thread(
+            target=work, args=(name, func, queues[index], queues[index + 1]),
+            name=f"overlapped-{name}", daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            entry = queues[-1].get()
+            if entry is _DONE:
+                break
+            item, value = entry
+            if item is _DONE:
+                # Ошибка при переборе входных элементов
+                raise value
+            yield item, value.error if isinstance(value, _Failed) else value
+    finally:
+        # Потребитель остановился раньше (или произошла ошибка) — освобождаем потоки
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _init_scorer(data_dir: str, dict_names: List[str]) -> None:
+    """Загружает RuSentiLex и словари один раз на процесс подсчёта."""
+    _SCORER["lexicon"] = load_rusentilex_dict(os.path.join(data_dir, "rusentilex_clean.txt"))
+    _SCORER["phrase_dicts"] = load_custom_dictionaries(data_dir, dict_names)
+
+
+def _score_in_process(df) -> Dict[str, Any]:
+    return score_author(df, _SCORER["lexicon"], _SCORER["phrase_dicts"])
+
+
+def iter_process_authors_overlapped(
+    person_ids: Union[List[int], str],
+    diaries_path: Optional[str] = None,
+    notes_path: Optional[str] = None,
+    csv_dir: Optional[str] = None,
+    data_dir: str = DATA_DIR,
+    dict_names: Optional[List[str]] = None,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    lemmatizer: Optional[LemmatizerNatasha] = None,
+    score_in_process: bool = True,
+    stats: Optional[Dict[str, Dict[str, float]]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Обрабатывает авторов в одном процессе, совмещая этапы разных авторов:
+    пока размечается один автор, следующий уже читается с диска и очищается,
+    а предыдущий считается. Строки сводной таблицы — те же, что у iter_process_authors.
+
+    Подходит, когда пул процессов не помещается в память (модели Natasha загружаются
+    один раз), и для долгих прогонов, где чтение и очистка иначе простаивают в ожидании разметки.
+
+    Этапы: load → clean (clean_text_column, add_year_column) →
+    lemmatize (разметка Natasha) → score (статистики, сентимент, словари).
+    Этап load читает CSV автора (load_diary_from_csv), а при входе в JSON строит таблицу
+    автора прямо из JSON (author_frame_from_json): JSON разбирается один раз при загрузке
+    первого автора, CSV не пишутся, а авторы, которых нет в person_ids, не обрабатываются.
+
+    Параметры:
+    - person_ids, diaries_path, notes_path, csv_dir, data_dir, dict_names — как у iter_process_authors
+    - queue_size: сколько авторов может ждать между соседними этапами
+    - lemmatizer: готовый лемматизатор (если не указан, создаётся новый)
+    - score_in_process: считать показатели в отдельном процессе. Подсчёт — чистый Python
+      и в потоке соперничает с разметкой за GIL; в отдельном процессе (без моделей Natasha,
+      только словари) этапы действительно идут параллельно
+    - stats: словарь для счётчиков этапов (см. iter_overlapped)
+    """
+    dict_names = list(dict_names or DEFAULT_DICT_NAMES)
+    tmp_dir = None
+    if csv_dir is not None:
+        person_ids, csv_dir, tmp_dir = resolve_author_files(person_ids, diaries_path, notes_path, csv_dir)
+    elif diaries_path is None or notes_path is None:
+        raise ValueError("Укажите csv_dir или оба пути: diaries_path и notes_path")
+    elif isinstance(person_ids, str):
+        if person_ids != "all":
+            raise ValueError("person_ids должен быть списком ID или строкой 'all'")
+        person_ids = list_person_ids(diaries_path)
+
+    scorer = None
+    try:
+        if lemmatizer is None:
+            lemmatizer = LemmatizerNatasha()
+        if score_in_process:
+            scorer = ProcessPoolExecutor(max_workers=1, initializer=_init_scorer, initargs=(data_dir, dict_names))
+        else:
+            _init_scorer(data_dir, dict_names)
+
+        def load(person_id):
+            if csv_dir is None:
+                df = author_frame_from_json(diaries_path, notes_path, person_id)
+                if df.empty:
+                    raise AuthorSkipped("нет записей")
+                return df
+            csv_path = os.path.join(csv_dir, f"author_{int(person_id)}.csv")
+            if not os.path.exists(csv_path):
+                raise AuthorSkipped("файл автора не найден")
+            df = load_diary_from_csv(csv_path)
+            if df.empty:
+                raise AuthorSkipped("нет записей")
+            return df
+
+        def lemmatize(df):
+            # Тексты автора размечаются пакетно, за один проход теггера
+            df["tokens"] = lemmatizer.lemmatize_texts(df["text"].astype(str).tolist())
+            return df
+
+        def score(df):
+            if scorer is not None:
+                return scorer.submit(_score_in_process, df).result()
+            return _score_in_process(df)
+
+        stages = [("load", load), ("clean", prepare_author), ("lemmatize", lemmatize), ("score", score)]
+        for person_id, result in iter_overlapped(person_ids, stages, queue_size=queue_size, stats=stats):
+            if isinstance(result, BaseException):
+                yield {"person": person_id, "error": str(result) if isinstance(result, AuthorSkipped) else repr(result)}
+            else:
+                yield {"person": person_id, **result}
+    finally:
+        if scorer is not None:
+            scorer.shutdown()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
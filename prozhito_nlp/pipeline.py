@@ -0,0 +1,413 @@
+import os
+import json
+import pickle
+import hashlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import pandas as pd
+
+from .file_reader import load_diary_from_csv, author_frame_from_json
+from .preprocessing import clean_text_column, add_year_column
+from .lemmatizer import LemmatizerNatasha, lemmatize_column
+from .dedup import lemmatize_column_dedup, analyze_sentiment_dedup
+from .basic_text_metrics import clean_punctuation, compute_text_statistics
+from .tfidf import compute_tfidf_by_year
+from .dict_match import match_custom_dictionaries
+from .sentiment import load_rusentilex_dict, analyze_sentiment
+from .resources import DATA_DIR, BUNDLE_FILE
+
+
+DEFAULT_DICT_NAMES = [
+    'phraseologisms_wiki', 'clothes', 'weather', 'health', 'items',
+    'money', 'ratio', 'relatives', 'work_school', 'culture',
+    'festivals', 'domestic'
+]
+
+
+def _path_signature(path: str) -> Any:
+    """
+    Возвращает «подпись» файла или папки (размер и время изменения),
+    чтобы изменение ресурсов на диске сбрасывало контрольные точки.
+    """
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    if os.path.isdir(path):
+        return sorted(
+            [name, *_path_signature(os.path.join(path, name))]
+            for name in os.listdir(path)
+            # Пакет ресурсов собирается из файлов той же папки и не меняет результатов
+            if os.path.isfile(os.path.join(path, name)) and not name.startswith(BUNDLE_FILE)
+        )
+    return None
+
+
+def _param_signature(value: Any) -> Any:
+    """
+    Приводит параметр этапа к виду, пригодному для хеширования.
+    Для путей к существующим файлам и папкам учитывается их содержимое на диске.
+    """
+    if isinstance(value, Path):
+        value = str(value)
+    if isinstance(value, str) and os.path.exists(value):
+        return {"path": os.path.abspath(value), "signature": _path_signature(value)}
+    if isinstance(value, dict):
+        return {str(k): _param_signature(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_param_signature(v) for v in value]
+        return sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+class Stage:
+    """
+    Один этап конвейера: функция, её зависимости и параметры.
+
+    Функция этапа без зависимостей вызывается как func(person_id, **params),
+    функция этапа с зависимостями — как func(*результаты_зависимостей, **params).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        depends_on: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        version: str = "1"
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.params = dict(params or {})
+        self.version = version
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, depends_on={self.depends_on})"
+
+
+class Pipeline:
+    """
+    Конвейер обработки дневников в виде ациклического графа этапов.
+
+    Результат каждого этапа сохраняется на диск (контрольная точка) вместе с ключом,
+    вычисленным по параметрам этапа, ключам его зависимостей и подписям входных файлов.
+    При повторном запуске этап пропускается, если ключ не изменился, —
+    так длинные прогоны по корпусу продолжаются с места остановки, а не начинаются заново.
+    """
+
+    def __init__(self, checkpoint_dir: str = "checkpoints", verbose: bool = True):
+        self.checkpoint_dir = checkpoint_dir
+        self.verbose = verbose
+        self.stages: Dict[str, Stage] = {}
+        self.last_status: Dict[str, str] = {}
+
+    def add_stage(
+        self,
+        name: str,
+        func: Callable,
+        depends_on: Sequence[str] = (),
+        version: str = "1",
+        **params
+    ) -> "Pipeline":
+        """
+        Добавляет этап в конвейер. Зависимости должны быть добавлены раньше.
+        """
+        if name in self.stages:
+            raise ValueError(f"Этап '{name}' уже добавлен в конвейер")
+        missing = [dep for dep in depends_on if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Этап '{name}' зависит от неизвестных этапов: {missing}")
+        self.stages[name] = Stage(name, func, depends_on, params, version)
+        return self
+
+    def _required_stages(self, targets: Optional[Iterable[str]]) -> List[str]:
+        """
+        Возвращает этапы, необходимые для получения целевых, в порядке выполнения.
+        """
+        if targets is None:
+            return list(self.stages)
+        required = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"Неизвестный этап: '{name}'")
+            if name not in required:
+                required.add(name)
+                stack.extend(self.stages[name].depends_on)
+        # Этапы добавляются только после своих зависимостей, поэтому порядок добавления топологический
+        return [name for name in self.stages if name in required]
+
+    def _stage_key(self, stage: Stage, person_id: Any, dep_keys: List[str]) -> str:
+        payload = {
+            "stage": stage.name,
+            "version": stage.version,
+            "func": f"{getattr(stage.func, '__module__', '')}.{getattr(stage.func, '__qualname__', repr(stage.func))}",
+            "person": str(person_id),
+            "params": _param_signature(stage.params),
+            "deps": dep_keys,
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _checkpoint_paths(self, person_id: Any, stage_name: str):
+        author_dir = os.path.join(self.checkpoint_dir, f"author_{person_id}")
+        return (
+            os.path.join(author_dir, f"{stage_name}.pkl"),
+            os.path.join(author_dir, f"{stage_name}.key"),
+        )
+
+    def _read_key(self, person_id: Any, stage_name: str) -> Optional[str]:
+        data_path, key_path = self._checkpoint_paths(person_id, stage_name)
+        if not (os.path.exists(data_path) and os.path.exists(key_path)):
+            return None
+        with open(key_path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    def _load_checkpoint(self, person_id: Any, stage_name: str) -> Any:
+        data_path, _ = self._checkpoint_paths(person_id, stage_name)
+        with open(data_path, "rb") as f:
+            return pickle.load(f)
+
+    def _save_checkpoint(self, person_id: Any, stage_name: str, key: str, value: Any) -> None:
+        data_path, key_path = self._checkpoint_paths(person_id, stage_name)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+        # Запись через временный файл, чтобы прерванный запуск не оставил битую контрольную точку
+        tmp_path = data_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, data_path)
+        with open(key_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(key)
+        os.replace(key_path + ".tmp", key_path)
+
+    def run(
+        self,
+        person_id: Any,
+        targets: Optional[Iterable[str]] = None,
+        force: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Выполняет конвейер для одного автора.
+
+        Параметры:
+        - person_id: идентификатор автора (передаётся в этапы без зависимостей)
+        - targets: этапы, результаты которых нужны (по умолчанию — все)
+        - force: пересчитать этапы, даже если контрольные точки актуальны
+
+        Возвращает:
+        - dict: этап → результат (для целевых этапов)
+        """
+        order = self._required_stages(targets)
+        targets = set(order if targets is None else targets)
+
+        keys: Dict[str, str] = {}
+        fresh: Dict[str, bool] = {}
+        for name in order:
+            stage = self.stages[name]
+            keys[name] = self._stage_key(stage, person_id, [keys[dep] for dep in stage.depends_on])
+            fresh[name] = not force and self._read_key(person_id, name) == keys[name]
+
+        # Какие результаты нужно держать в памяти: целевые и входы пересчитываемых этапов
+        needed = set(targets)
+        for name in order:
+            if not fresh[name]:
+                needed.update(self.stages[name].depends_on)
+
+        outputs: Dict[str, Any] = {}
+        self.last_status = {}
+        for name in order:
+            stage = self.stages[name]
+            if fresh[name]:
+                self.last_status[name] = "cached"
+                if name in needed:
+                    outputs[name] = self._load_checkpoint(person_id, name)
+                continue
+
+            if self.verbose:
+                print(f"[author_{person_id}] {name}...")
+            if stage.depends_on:
+                value = stage.func(*[outputs[dep] for dep in stage.depends_on], **stage.params)
+            else:
+                value = stage.func(person_id, **stage.params)
+            self._save_checkpoint(person_id, name, keys[name], value)
+            self.last_status[name] = "computed"
+            outputs[name] = value
+
+        return {name: outputs[name] for name in order if name in targets}
+
+    def run_many(
+        self,
+        person_ids: Iterable[Any],
+        targets: Optional[Iterable[str]] = None,
+        force: bool = False
+    ) -> Dict[Any, Dict[str, Any]]:
+        """
+        Выполняет конвейер для нескольких авторов по очереди.
+        """
+        targets = list(targets) if targets is not None else None
+        return {person_id: self.run(person_id, targets=targets, force=force) for person_id in person_ids}
+
+
+_LEMMATIZER: Optional[LemmatizerNatasha] = None
+
+
+def _get_lemmatizer() -> LemmatizerNatasha:
+    """Лемматизатор создаётся один раз на процесс: загрузка моделей Natasha дорогая."""
+    global _LEMMATIZER
+    if _LEMMATIZER is None:
+        _LEMMATIZER = LemmatizerNatasha()
+    return _LEMMATIZER
+
+
+def _stage_load(person_id, diaries_path=None, notes_path=None, csv_dir=None):
+    if csv_dir is not None:
+        return load_diary_from_csv(os.path.join(csv_dir, f"author_{int(person_id)}.csv"))
+    # JSON разбирается один раз для всех авторов запуска (см. group_notes_by_author)
+    return author_frame_from_json(diaries_path, notes_path, person_id)
+
+
+def _stage_clean(df, text_column="text"):
+    return clean_text_column(df.copy(), text_column=text_column)
+
+
+def _stage_year(df, date_column="date"):
+    return add_year_column(df, date_column=date_column)
+
+
+def _stage_lemmatize(df, text_column="text", new_column="tokens", dedup_threshold=None):
+    df = df.copy()
+    if dedup_threshold is None:
+        df = lemmatize_column(df, text_column=text_column, new_column=new_column, lemmatizer=_get_lemmatizer())
+    else:
+        df, report = lemmatize_column_dedup(
+            df, text_column=text_column, new_column=new_column,
+            threshold=dedup_threshold, lemmatizer=_get_lemmatizer()
+        )
+        df.attrs["dedup_report"] = report
+    df["tokens_no_punkt"] = df[new_column].apply(clean_punctuation)
+    return df
+
+
+def _stage_statistics(df, token_column="tokens"):
+    return compute_text_statistics(df.copy(), token_column=token_column)
+
+
+def _stage_tfidf(df, stop_words_path, text_column="tokens", year_column="year", top_n=20):
+    return compute_tfidf_by_year(df, text_column, year_column, stop_words_path, top_n=top_n)
+
+
+def _stage_dictionaries(df, dict_dir, dict_names, text_column="tokens_no_punkt"):
+    total_matches, unique_matches = match_custom_dictionaries(
+        df, text_column, dict_dir, dict_names, show_details=False, verbose=False
+    )
+    return dict(total_matches), dict(unique_matches)
+
+
+def _stage_sentiment(df, lexicon_path, text_column="tokens"):
+    lexicon = load_rusentilex_dict(lexicon_path)
+    if "duplicate_group" in df.columns:
+        # Лемматизация шла с дедупликацией: совпадения ищутся только в представителях групп
+        groups = pd.Series(df["duplicate_group"].values, index=df.index)
+        result, total_unique_words, total_category_words, scored = analyze_sentiment_dedup(
+            df.copy(), text_column, lexicon, groups
+        )
+    else:
+        result, total_unique_words, total_category_words, scored = analyze_sentiment(
+            df.copy(), text_column, lexicon
+        )
+    # defaultdict с лямбдами не сериализуется, поэтому приводим к обычным словарям
+    result = {
+        source: {polarity: dict(values) for polarity, values in polarities.items()}
+        for source, polarities in result.items()
+    }
+    columns = [col for col in ("id", "date", "year", "rusentilex_score") if col in scored.columns]
+    return result, total_unique_words, total_category_words, scored[columns]
+
+
+def build_default_pipeline(
+    diaries_path: Optional[str] = None,
+    notes_path: Optional[str] = None,
+    csv_dir: Optional[str] = None,
+    data_dir: str = DATA_DIR,
+    dict_names: Optional[List[str]] = None,
+    checkpoint_dir: str = "checkpoints",
+    top_n: int = 20,
+    dedup_threshold: Optional[float] = None,
+    verbose: bool = True
+) -> Pipeline:
+    """
+    Собирает стандартный конвейер из ноутбука usage_guide.ipynb:
+    загрузка → очистка → год → лемматизация → статистики / TF-IDF / словари / сентимент.
+
+    Параметры:
+    - diaries_path, notes_path: пути к diaries.json и notes.json
+    - csv_dir: папка с файлами author_<id>.csv (используется вместо JSON, если указана)
+    - data_dir: папка со стоп-словами, словарями и RuSentiLex
+    - dict_names: список словарей (по умолчанию — все встроенные)
+    - checkpoint_dir: папка для контрольных точек
+    - top_n: сколько слов TF-IDF сохранять на каждый год
+    - dedup_threshold: если указан, почти одинаковые записи (сходство не ниже порога)
+      лемматизируются и оцениваются по RuSentiLex один раз, см. lemmatize_column_dedup
+      и analyze_sentiment_dedup; отчёт об экономии — в attrs["dedup_report"] результата lemmatize
+    - verbose: печатать ли выполняемые этапы
+
+    Возвращает:
+    - Pipeline
+    """
+    if csv_dir is None and (diaries_path is None or notes_path is None):
+        raise ValueError("Укажите csv_dir или оба пути: diaries_path и notes_path")
+
+    pipeline = Pipeline(checkpoint_dir=checkpoint_dir, verbose=verbose)
+    pipeline.add_stage("load", _stage_load, diaries_path=diaries_path, notes_path=notes_path, csv_dir=csv_dir)
+    pipeline.add_stage("clean", _stage_clean, depends_on=["load"])
+    pipeline.add_stage("year", _stage_year, depends_on=["clean"])
+    pipeline.add_stage("lemmatize", _stage_lemmatize, depends_on=["year"], dedup_threshold=dedup_threshold)
+    pipeline.add_stage("statistics", _stage_statistics, depends_on=["lemmatize"])
+    pipeline.add_stage(
+        "tfidf", _stage_tfidf, depends_on=["lemmatize"],
+        stop_words_path=os.path.join(data_dir, "stop_words.txt"), top_n=top_n
+    )
+    pipeline.add_stage(
+        "dictionaries", _stage_dictionaries, depends_on=["lemmatize"],
+        dict_dir=data_dir, dict_names=list(dict_names or DEFAULT_DICT_NAMES)
+    )
+    pipeline.add_stage(
+        "sentiment", _stage_sentiment, depends_on=["lemmatize"],
+        lexicon_path=os.path.join(data_dir, "rusentilex_clean.txt")
+    )
+    return pipeline
+
+
+def list_person_ids(diaries_path: str) -> List[int]:
+    """
+    Возвращает список всех авторов из diaries.json.
+    """
+    with open(diaries_path, "r", encoding="utf-8") as f:
+        diaries_data = json.load(f)
+    return sorted({int(entry["person"]) for entry in diaries_data if entry.get("person") is not None})
+
+
+def summarize_results(results: Dict[Any, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Сводит результаты конвейера по авторам в одну таблицу (одна строка на автора).
+    """
+    rows = []
+    for person_id, outputs in results.items():
+        row: Dict[str, Union[int, float, str]] = {"person": person_id}
+        if "statistics" in outputs:
+            row.update(outputs["statistics"])
+        if "dictionaries" in outputs:
+            total_matches, _ = outputs["dictionaries"]
+            row.update({f"dict_{name}": count for name, count in total_matches.items()})
+        if "sentiment" in outputs:
+            scored = outputs["sentiment"][3]
+            row["mean_rusentilex_score"] = round(float(scored["rusentilex_score"].mean()), 4) if len(scored) else 0.0
+        if "lemmatize" in outputs and "dedup_report" in outputs["lemmatize"].attrs:
+            row.update({f"dedup_{key}": value for key, value in outputs["lemmatize"].attrs["dedup_report"].items()})
+        rows.append(row)
+    return pd.DataFrame(rows)
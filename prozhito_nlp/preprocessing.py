@@ -1,11 +1,13 @@
-import pandas as pd
-import re
+from .arrow_strings import regex_replace
+from .schema import ensure_datetime, has_schema
 
 def clean_text_column(df, text_column="text"):
     """
     Очищает текстовую колонку DataFrame от HTML-тегов, markdown-разметки,
     типографических артефактов и раскрытых сокращений.
 
+    Колонка со строками Arrow (string[pyarrow]) обрабатывается векторизованно и сохраняет свой тип.
+
     Параметры:
     - df: pd.DataFrame
     - text_column: str, название колонки с текстом
@@ -25,11 +27,11 @@ def clean_text_column(df, text_column="text"):
         r'#'
     ]
     for pattern in patterns:
-        df[text_column] = df[text_column].str.replace(pattern, '', regex=True)
+        df[text_column] = regex_replace(df[text_column], pattern, '')
 
     # Удаление закодированных HTML-тегов
-    df[text_column] = df[text_column].str.replace(r'&lt;.*?&gt;', '', regex=True)
-    df[text_column] = df[text_column].str.replace(r'&nbsp;', ' ', regex=True)
+    df[text_column] = regex_replace(df[text_column], r'&lt;.*?&gt;', '')
+    df[text_column] = regex_replace(df[text_column], r'&nbsp;', ' ')
 
     # Замена HTML-сущностей на символы
     html_entities = {
@@ -42,26 +44,29 @@ def clean_text_column(df, text_column="text"):
         '&gt;': '>',
     }
     for entity, symbol in html_entities.items():
-        df[text_column] = df[text_column].str.replace(entity, symbol, regex=True)
+        df[text_column] = regex_replace(df[text_column], entity, symbol)
 
     # Удаление следов плохой типографики (переносов)
-    df[text_column] = df[text_column].str.replace(r'(\w+-)\s([го|я|й])', r'\1\2', regex=True)
+    df[text_column] = regex_replace(df[text_column], r'(\w+-)\s([го|я|й])', r'\1\2')
 
     # Удаление раскрытий сокращений: М[ария] → Мария
-    df[text_column] = df[text_column].str.replace(r'(\w)\[(\w+)\]', r'\1\2', regex=True)
+    df[text_column] = regex_replace(df[text_column], r'(\w)\[(\w+)\]', r'\1\2')
 
     # Удаление дополнительных HTML-тегов
-    df[text_column] = df[text_column].str.replace(r'<br\s*/?>', ' ', regex=True)
-    df[text_column] = df[text_column].str.replace(r'<img[^>]*>', '', regex=True)
-    df[text_column] = df[text_column].str.replace(r'<a[^>]*>(.*?)</a>', r'\1', regex=True)
-    df[text_column] = df[text_column].str.replace(r'<!--.*?-->', '', regex=True)
+    df[text_column] = regex_replace(df[text_column], r'<br\s*/?>', ' ')
+    df[text_column] = regex_replace(df[text_column], r'<img[^>]*>', '')
+    df[text_column] = regex_replace(df[text_column], r'<a[^>]*>(.*?)</a>', r'\1')
+    df[text_column] = regex_replace(df[text_column], r'<!--.*?-->', '')
 
     return df
 
 def add_year_column(df, date_column="date"):
     """
     Добавляет колонку 'year' на основе даты (в формате YYYY-MM-DD).
+    Если к записям применена схема (apply_schema), год уже посчитан и даты заново не разбираются.
     """
     df = df.copy()
-    df['year'] = pd.to_datetime(df[date_column], errors='coerce').dt.year
+    if has_schema(df, date_column):
+        return df
+    df['year'] = ensure_datetime(df[date_column]).dt.year
     return df
@@ -0,0 +1,314 @@
+import time
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from .preprocessing import clean_text_column, add_year_column
+from .lemmatizer import LemmatizerNatasha
+from .basic_text_metrics import clean_punctuation, count_sentences
+from .corpus_metrics import dictionary_counts
+from .sentiment import SparseSentimentScorer
+from .schema import ensure_datetime
+
+SAMPLE_SIZE = 300
+N_BOOT = 1000
+
+
+class PreviewSample:
+    """
+    Стратифицированная по годам выборка записей, прошедшая очистку и лемматизацию,
+    с весами для оценки показателей всего корпуса и замерами времени обработки.
+
+    - notes: записи выборки (колонки text, year, tokens, tokens_no_punkt)
+    - strata: номер страты (года) для каждой записи выборки
+    - weights: вес записи — число записей корпуса на одну запись выборки в её страте
+    - population: число записей корпуса
+    - timings: время этапов на выборке, секунды
+    - sample_chars, population_chars: объём текста выборки и корпуса в символах
+    """
+
+    def __init__(
+        self,
+        notes: pd.DataFrame,
+        strata: np.ndarray,
+        weights: np.ndarray,
+        population: int,
+        timings: Dict[str, float],
+        sample_chars: int,
+        population_chars: int
+    ):
+        self.notes = notes
+        self.strata = strata
+        self.weights = weights
+        self.population = population
+        self.timings = timings
+        self.sample_chars = sample_chars
+        self.population_chars = population_chars
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+
+def _allocate(stratum_sizes: pd.Series, sample_size: int) -> pd.Series:
+    """
+    Пропорциональное распределение выборки по стратам: не меньше одной записи на страту
+    и не больше её размера.
+    """
+    if sample_size >= stratum_sizes.sum():
+        return stratum_sizes.copy()
+    quotas = np.maximum(1, np.floor(stratum_sizes * sample_size / stratum_sizes.sum())).astype(int)
+    quotas = np.minimum(quotas, stratum_sizes)
+    # Остаток раздаём стратам с наибольшей дробной частью
+    fractions = (stratum_sizes * sample_size / stratum_sizes.sum()) % 1
+    for stratum in fractions.sort_values(ascending=False).index:
+        if quotas.sum() >= sample_size:
+            break
+        if quotas[stratum] < stratum_sizes[stratum]:
+            quotas[stratum] += 1
+    return quotas
+
+
+def preview_sample(
+    df: pd.DataFrame,
+    sample_size: int = SAMPLE_SIZE,
+    text_column: str = "text",
+    date_column: str = "date",
+    lemmatizer: Optional[LemmatizerNatasha] = None,
+    random_state: int = 0
+) -> PreviewSample:
+    """
+    Отбирает стратифицированную по годам выборку из сырых записей и прогоняет её
+    через clean_text_column, add_year_column и лемматизацию, замеряя время каждого этапа.
+
+    Параметры:
+    - df: pd.DataFrame с сырыми записями (как после load_diary_from_csv)
+    - sample_size: размер выборки
+    - text_column, date_column: колонки с текстом и датой
+    - lemmatizer: готовый лемматизатор (если не указан, создаётся новый; время загрузки учитывается)
+    - random_state: зерно генератора случайных чисел
+
+    Возвращает:
+    - PreviewSample
+    """
+    years = ensure_datetime(df[date_column]).dt.year
+    # Записи без даты — отдельная страта
+    strata_keys = years.fillna(-1).astype(int)
+    stratum_sizes = strata_keys.value_counts().sort_index()
+    quotas = _allocate(stratum_sizes, sample_size)
+
+    rng = np.random.default_rng(random_state)
+    positions = []
+    for stratum, quota in quotas.items():
+        members = np.flatnonzero(strata_keys.values == stratum)
+        positions.extend(rng.choice(members, size=quota, replace=False))
+    positions = np.sort(np.array(positions, dtype=int))
+
+    notes = df.iloc[positions].copy()
+    strata, _ = pd.factorize(strata_keys.iloc[positions], sort=True)
+    weights = (stratum_sizes / quotas).reindex(strata_keys.iloc[positions]).values
+
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    if lemmatizer is None:
+        lemmatizer = LemmatizerNatasha()
+    timings["load_models"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    notes[text_column] = notes[text_column].fillna("").astype(str)
+    notes = add_year_column(clean_text_column(notes, text_column=text_column), date_column=date_column)
+    timings["clean"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    notes["tokens"] = lemmatizer.lemmatize_texts(notes[text_column].tolist())
+    notes["tokens_no_punkt"] = notes["tokens"].apply(clean_punctuation)
+    timings["lemmatize"] = time.perf_counter() - start
+
+    return PreviewSample(
+        notes=notes.reset_index(drop=True),
+        strata=strata,
+        weights=weights,
+        population=len(df),
+        timings=timings,
+        sample_chars=int(notes[text_column].str.len().sum()),
+        population_chars=int(df[text_column].fillna("").astype(str).str.len().sum())
+    )
+
+
+def _bootstrap_totals(values: np.ndarray, sample: PreviewSample, n_boot: int, random_state: int) -> np.ndarray:
+    """
+    Оценки сумм по корпусу для каждой колонки values: точечная (первая строка)
+    и n_boot стратифицированных бутстреп-повторов (остальные строки).
+    """
+    values = np.asarray(values, dtype=float).reshape(len(sample), -1)
+    point = sample.weights @ values
+    rng = np.random.default_rng(random_state)
+    replicates = np.zeros((n_boot, values.shape[1]))
+    for stratum in np.unique(sample.strata):
+        members = np.flatnonzero(sample.strata == stratum)
+        draws = rng.integers(0, len(members), size=(n_boot, len(members)))
+        # Внутри страты вес у всех записей одинаковый
+        replicates += sample.weights[members[0]] * values[members[draws]].sum(axis=1)
+    return np.vstack([point, replicates])
+
+
+def _estimates(totals: Dict[str, np.ndarray], confidence: float) -> pd.DataFrame:
+    """Точечные оценки и перцентильные доверительные интервалы по результатам бутстрепа."""
+    alpha = (1 - confidence) / 2
+    rows = {}
+    for name, values in totals.items():
+        replicates = values[1:]
+        rows[name] = {
+            "estimate": values[0],
+            "ci_low": np.nanquantile(replicates, alpha) if len(replicates) else np.nan,
+            "ci_high": np.nanquantile(replicates, 1 - alpha) if len(replicates) else np.nan,
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=float), where=denominator > 0)
+
+
+def preview_text_statistics(
+    sample: PreviewSample,
+    n_boot: int = N_BOOT,
+    confidence: float = 0.95,
+    random_state: int = 0
+) -> pd.DataFrame:
+    """
+    Оценки показателей compute_text_statistics для всего корпуса по выборке.
+
+    Возвращает:
+    - pd.DataFrame с индексом из названий показателей compute_text_statistics
+      и колонками estimate, ci_low, ci_high. Число уникальных токенов по выборке не экстраполируется:
+      оценка — число уникальных токенов выборки, то есть нижняя граница
+    """
+    tokens = sample.notes["tokens"]
+    values = np.column_stack([
+        tokens.str.split().map(len),
+        sample.notes["tokens_no_punkt"].str.split().map(len),
+        tokens.apply(count_sentences),
+    ])
+    totals = _bootstrap_totals(values, sample, n_boot, random_state)
+    tokens_with_punkt, total_tokens, sentences = totals.T
+
+    unique_tokens = float(len(set(sample.notes["tokens_no_punkt"].str.split().sum() or [])))
+    result = _estimates({
+        "Количество записей": np.full(len(totals), float(sample.population)),
+        "Средний объем записей (в токенах)": tokens_with_punkt / sample.population,
+        "Общее количество токенов": total_tokens,
+        "Количество уникальных токенов": np.full(len(totals), unique_tokens),
+        "Средняя длина предложения (в токенах)": _ratio(total_tokens, sentences),
+    }, confidence)
+    result.loc["Количество уникальных токенов", "ci_high"] = np.nan
+    return result
+
+
+def preview_sentiment(
+    sample: PreviewSample,
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    n_boot: int = N_BOOT,
+    confidence: float = 0.95,
+    random_state: int = 0
+) -> pd.DataFrame:
+    """
+    Оценки числа совпадений с RuSentiLex по категориям и среднего rusentilex_score
+    для всего корпуса по выборке. Совпадения те же, что у analyze_sentiment по умолчанию
+    (поиск фраз как подстрок), но считаются векторизованно (см. SparseSentimentScorer).
+
+    Возвращает:
+    - pd.DataFrame с индексом <источник>/<полярность> и mean_rusentilex_score
+      и колонками estimate, ci_low, ci_high
+    """
+    start = time.perf_counter()
+    scorer = SparseSentimentScorer(lexicon)
+    counts, _ = scorer.score(sample.notes["tokens"])
+    _, scores = scorer.polarity_scores(counts)
+    sample.timings["sentiment"] = time.perf_counter() - start
+
+    totals = _bootstrap_totals(np.column_stack([counts, scores]), sample, n_boot, random_state)
+    estimates = {f"{source}/{polarity}": totals[:, col] for col, (source, polarity) in enumerate(scorer.columns)}
+    estimates["mean_rusentilex_score"] = totals[:, -1] / sample.population
+    return _estimates(estimates, confidence)
+
+
+def preview_dictionaries(
+    sample: PreviewSample,
+    phrase_dicts: Dict[str, Set[str]],
+    n_boot: int = N_BOOT,
+    confidence: float = 0.95,
+    random_state: int = 0
+) -> pd.DataFrame:
+    """
+    Оценки общего числа совпадений по словарям (total_matches из match_custom_dictionaries)
+    для всего корпуса по выборке.
+
+    Возвращает:
+    - pd.DataFrame с индексом из названий словарей и колонками estimate, ci_low, ci_high
+    """
+    start = time.perf_counter()
+    counts = dictionary_counts(sample.notes["tokens_no_punkt"], phrase_dicts)
+    sample.timings["dictionaries"] = time.perf_counter() - start
+
+    totals = _bootstrap_totals(counts.values, sample, n_boot, random_state)
+    return _estimates(
+        {column[len("dict_"):]: totals[:, col] for col, column in enumerate(counts.columns)}, confidence
+    )
+
+
+def projected_cost(sample: PreviewSample) -> pd.DataFrame:
+    """
+    Прогноз времени полного прогона по замерам на выборке: время этапов пересчитывается
+    пропорционально объёму текста (в символах), загрузка моделей учитывается один раз.
+    Учитываются этапы, уже выполненные на выборке (preview_sentiment и preview_dictionaries
+    добавляют свои замеры в sample.timings).
+
+    Возвращает:
+    - pd.DataFrame с индексом из этапов (и строкой total) и колонками sample_seconds, projected_seconds
+    """
+    scale = sample.population_chars / sample.sample_chars if sample.sample_chars else 0.0
+    rows = {}
+    for stage, seconds in sample.timings.items():
+        rows[stage] = {"sample_seconds": seconds, "projected_seconds": seconds if stage == "load_models" else seconds * scale}
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=["sample_seconds", "projected_seconds"])
+    table.loc["total"] = table.sum()
+    return table
+
+
+def preview_corpus(
+    df: pd.DataFrame,
+    lexicon: Optional[Dict[str, Dict[str, Set[str]]]] = None,
+    phrase_dicts: Optional[Dict[str, Set[str]]] = None,
+    sample_size: int = SAMPLE_SIZE,
+    n_boot: int = N_BOOT,
+    confidence: float = 0.95,
+    lemmatizer: Optional[LemmatizerNatasha] = None,
+    random_state: int = 0
+) -> Dict[str, Any]:
+    """
+    Быстрая предварительная оценка корпуса перед полным прогоном: выборка, оценки
+    compute_text_statistics, analyze_sentiment и match_custom_dictionaries с доверительными
+    интервалами и прогноз времени полного прогона.
+
+    Параметры:
+    - df: pd.DataFrame с сырыми записями
+    - lexicon: результат load_rusentilex_dict (если None — без сентимента)
+    - phrase_dicts: результат load_custom_dictionaries (если None — без словарей)
+    - sample_size: размер выборки
+    - n_boot: число бутстреп-повторов
+    - confidence: уровень доверия интервалов
+
+    Возвращает:
+    - словарь с ключами text_statistics, sentiment, dictionaries (если заданы) и cost
+    """
+    sample = preview_sample(df, sample_size=sample_size, lemmatizer=lemmatizer, random_state=random_state)
+    result: Dict[str, Any] = {
+        "text_statistics": preview_text_statistics(sample, n_boot, confidence, random_state)
+    }
+    if lexicon is not None:
+        result["sentiment"] = preview_sentiment(sample, lexicon, n_boot, confidence, random_state)
+    if phrase_dicts is not None:
+        result["dictionaries"] = preview_dictionaries(sample, phrase_dicts, n_boot, confidence, random_state)
+    result["cost"] = projected_cost(sample)
+    return result
@@ -0,0 +1,377 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+BUNDLE_FILE = "resources.bundle"
+BUNDLE_MAGIC = b"PZNLPRB1"
+
+# Увеличивается при изменении формата пакета или правил разбора файлов
+BUNDLE_VERSION = 1
+
+STOP_WORDS_FILE = "stop_words.txt"
+RUSENTILEX_FILE = "rusentilex_clean.txt"
+DICTIONARY_SUFFIX = "_lemm.txt"
+
+# Пакеты ресурсов, уже открытые в этом процессе: папка с данными → пакет
+_REGISTRY: Dict[str, "ResourceBundle"] = {}
+
+
+# --- Разбор исходных текстовых файлов ---
+
+
+def parse_stop_words(path: str) -> List[str]:
+    """Читает стоп-слова (разделены пробелами или переводами строк)."""
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read().split()
+
+
+def parse_dictionary(path: str) -> List[str]:
+    """Читает словарь name_lemm.txt: одна лемма или фраза на строку."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f]
+
+
+def parse_rusentilex(path: str) -> Dict[str, Dict[str, List[str]]]:
+    """Читает RuSentiLex: тип лексики → полярность → список фраз."""
+    lexicon: Dict[str, Dict[str, List[str]]] = defaultdict(lambda: defaultdict(list))
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split(',')
+            if len(parts) < 5:
+                continue
+            phrase = parts[2].strip()
+            polarity = parts[3].strip().lower()
+            source = parts[4].strip().lower()
+            lexicon[source][polarity].append(phrase)
+    return lexicon
+
+
+def _source_files(data_dir: str) -> List[str]:
+    names = sorted(os.listdir(data_dir))
+    sources = [name for name in names if name.endswith(DICTIONARY_SUFFIX)]
+    sources += [name for name in (STOP_WORDS_FILE, RUSENTILEX_FILE) if name in names]
+    return sources
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _sources_digest(data_dir: str) -> Dict[str, str]:
+    return {name: _file_sha256(os.path.join(data_dir, name)) for name in _source_files(data_dir)}
+
+
+# --- Сборка пакета ---
+
+
+def compile_resource_bundle(data_dir: str = DATA_DIR, output_path: Optional[str] = None) -> str:
+    """
+    Собирает стоп-слова, словари name_lemm.txt и RuSentiLex из data_dir в один бинарный файл.
+
+    Все строки хранятся один раз в отсортированной таблице и получают целочисленные ID;
+    каждый ресурс — отсортированный массив ID, а фразы заранее разбиты на ID токенов.
+    Файл открывается через mmap (см. ResourceBundle), поэтому его страницы
+    разделяются между процессами.
+
+    Параметры:
+    - data_dir: папка с исходными файлами
+    - output_path: куда записать пакет (по умолчанию data_dir/resources.bundle)
+
+    Возвращает:
+    - путь к пакету
+    """
+    output_path = output_path or os.path.join(data_dir, BUNDLE_FILE)
+
+    resources: Dict[str, List[str]] = {}
+    for name in _source_files(data_dir):
+        path = os.path.join(data_dir, name)
+        if name == STOP_WORDS_FILE:
+            resources["stop_words"] = parse_stop_words(path)
+        elif name == RUSENTILEX_FILE:
+            for source, polarities in parse_rusentilex(path).items():
+                for polarity, phrases in polarities.items():
+                    resources[f"rusentilex:{source}:{polarity}"] = phrases
+        else:
+            resources[f"dict:{name[:-len(DICTIONARY_SUFFIX)]}"] = parse_dictionary(path)
+
+    # Таблица строк: все элементы ресурсов и все токены многословных фраз
+    strings = set()
+    for values in resources.values():
+        for value in values:
+            strings.add(value)
+            strings.update(value.split())
+    strings = sorted(strings)
+    string_ids = {value: i for i, value in enumerate(strings)}
+
+    encoded = [value.encode("utf-8") for value in strings]
+    arrays: Dict[str, np.ndarray] = {
+        "strings.blob": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "strings.offsets": np.concatenate([[0], np.cumsum([len(value) for value in encoded])]).astype(np.int64),
+    }
+
+    # Токены каждой строки (для многословных фраз и деревьев фраз)
+    token_ids = [[string_ids[token] for token in value.split()] for value in strings]
+    arrays["tokens.offsets"] = np.concatenate([[0], np.cumsum([len(ids) for ids in token_ids])]).astype(np.int64)
+    arrays["tokens.ids"] = np.array([i for ids in token_ids for i in ids], dtype=np.int32)
+
+    for key, values in resources.items():
+        arrays[f"resource.{key}"] = np.unique(np.array([string_ids[value] for value in values], dtype=np.int32))
+
+    # Заголовок: версия, хеши исходных файлов и расположение массивов в файле (с выравниванием по 8 байт)
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "count": int(array.size), "offset": offset}
+        offset += (array.nbytes + 7) // 8 * 8
+    header = json.dumps({
+        "version": BUNDLE_VERSION,
+        "sources": _sources_digest(data_dir),
+        "resources": sorted(resources),
+        "arrays": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(BUNDLE_MAGIC) + 8 + len(header)) % 8)
+
+    # Несколько процессов могут собирать пакет одновременно — у каждого свой временный файл
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for array in arrays.values():
+            data = array.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+# --- Чтение пакета ---
+
+
+class ResourceBundle:
+    """
+    Пакет ресурсов, открытый через mmap.
+
+    Массивы ID читаются прямо из отображённого файла; Python-объекты (frozenset строк,
+    словарь лексикона, дерево фраз) создаются при первом обращении и дальше берутся из кэша.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+            raise ValueError(f"Файл {path} не является пакетом ресурсов prozhito_nlp")
+        start = len(BUNDLE_MAGIC) + 8
+        (header_len,) = struct.unpack("<Q", self._mmap[len(BUNDLE_MAGIC):start])
+        self.header = json.loads(self._mmap[start:start + header_len].decode("utf-8"))
+        data_start = start + header_len
+
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, info in self.header["arrays"].items():
+            self._arrays[name] = np.frombuffer(
+                self._mmap, dtype=np.dtype(info["dtype"]), count=info["count"], offset=data_start + info["offset"]
+            )
+        self._blob = self._arrays["strings.blob"]
+        self._offsets = self._arrays["strings.offsets"]
+        self._sets: Dict[str, FrozenSet[str]] = {}
+        self._tries: Dict[str, dict] = {}
+        self._lexicon = None
+
+    @property
+    def version(self) -> int:
+        return self.header["version"]
+
+    @property
+    def sources(self) -> Dict[str, str]:
+        """Хеши исходных файлов, из которых собран пакет."""
+        return self.header["sources"]
+
+    @property
+    def resource_names(self) -> List[str]:
+        return self.header["resources"]
+
+    def string(self, string_id: int) -> str:
+        """Строка по её ID."""
+        return self._blob[self._offsets[string_id]:self._offsets[string_id + 1]].tobytes().decode("utf-8")
+
+    def string_id(self, value: str) -> Optional[int]:
+        """ID строки (двоичный поиск по отсортированной таблице) или None."""
+        low, high = 0, len(self._offsets) - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self.string(mid) < value:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self._offsets) - 1 and self.string(low) == value:
+            return low
+        return None
+
+    def ids(self, resource: str) -> np.ndarray:
+        """Отсортированный массив ID элементов ресурса (только для чтения)."""
+        return self._arrays[f"resource.{resource}"]
+
+    def contains(self, resource: str, value: str) -> bool:
+        """Проверяет принадлежность строки ресурсу без создания множества."""
+        string_id = self.string_id(value)
+        if string_id is None:
+            return False
+        ids = self.ids(resource)
+        position = np.searchsorted(ids, string_id)
+        return bool(position < len(ids) and ids[position] == string_id)
+
+    def words(self, resource: str) -> FrozenSet[str]:
+        """Элементы ресурса в виде frozenset (создаётся один раз на процесс)."""
+        if resource not in self._sets:
+            self._sets[resource] = frozenset(self.string(int(i)) for i in self.ids(resource))
+        return self._sets[resource]
+
+    def tokens(self, string_id: int) -> Tuple[int, ...]:
+        """ID токенов строки (для многословных фраз — несколько ID)."""
+        offsets = self._arrays["tokens.offsets"]
+        return tuple(int(i) for i in self._arrays["tokens.ids"][offsets[string_id]:offsets[string_id + 1]])
+
+    def phrase_trie(self, resource: str) -> dict:
+        """
+        Дерево фраз ресурса по токенам: {токен: {токен: ..., None: фраза}}.
+        Ключ None отмечает конец фразы.
+        """
+        if resource not in self._tries:
+            trie: dict = {}
+            for string_id in self.ids(resource):
+                node = trie
+                for token_id in self.tokens(int(string_id)):
+                    node = node.setdefault(self.string(token_id), {})
+                node[None] = self.string(int(string_id))
+            self._tries[resource] = trie
+        return self._tries[resource]
+
+    def stop_words(self) -> List[str]:
+        """Стоп-слова (список — в таком виде их принимает TfidfVectorizer)."""
+        return sorted(self.words("stop_words"))
+
+    def dictionary(self, name: str) -> FrozenSet[str]:
+        """Словарь name_lemm.txt."""
+        return self.words(f"dict:{name}")
+
+    def dictionary_names(self) -> List[str]:
+        return [name[len("dict:"):] for name in self.resource_names if name.startswith("dict:")]
+
+    def rusentilex(self) -> Dict[str, Dict[str, FrozenSet[str]]]:
+        """Лексикон RuSentiLex: тип лексики → полярность → frozenset фраз."""
+        if self._lexicon is None:
+            lexicon: Dict[str, Dict[str, FrozenSet[str]]] = {}
+            for name in self.resource_names:
+                if name.startswith("rusentilex:"):
+                    _, source, polarity = name.split(":", 2)
+                    lexicon.setdefault(source, {})[polarity] = self.words(name)
+            self._lexicon = lexicon
+        return self._lexicon
+
+
+# --- Реестр ---
+
+
+def _bundle_path(data_dir: str) -> str:
+    path = os.path.join(data_dir, BUNDLE_FILE)
+    if os.access(data_dir, os.W_OK) or os.path.exists(path):
+        return path
+    # Папка пакета недоступна для записи (например, site-packages) — пакет хранится в кэше пользователя
+    cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "prozhito_nlp")
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, hashlib.sha256(data_dir.encode("utf-8")).hexdigest()[:16] + ".bundle")
+
+
+def get_resource_bundle(data_dir: str = DATA_DIR) -> ResourceBundle:
+    """
+    Возвращает пакет ресурсов для папки data_dir. В процессе пакет открывается один раз;
+    если пакета нет, он устарел (изменились исходные файлы) или собран другой версией,
+    он пересобирается.
+    """
+    data_dir = os.path.abspath(data_dir)
+    if data_dir in _REGISTRY:
+        return _REGISTRY[data_dir]
+
+    path = _bundle_path(data_dir)
+    bundle = None
+    if os.path.exists(path):
+        try:
+            bundle = ResourceBundle(path)
+        except ValueError:
+            bundle = None
+        if bundle is not None and (bundle.version != BUNDLE_VERSION or bundle.sources != _sources_digest(data_dir)):
+            bundle = None
+    if bundle is None:
+        bundle = ResourceBundle(compile_resource_bundle(data_dir, path))
+
+    _REGISTRY[data_dir] = bundle
+    return bundle
+
+
+def clear_resource_registry() -> None:
+    """Забывает открытые пакеты (например, после изменения файлов словарей)."""
+    _REGISTRY.clear()
+
+
+def uses_bundle(data_dir: str) -> bool:
+    """
+    Читаются ли ресурсы папки через пакет: только для data пакета (DATA_DIR).
+    Файлы в других папках разбираются напрямую — пакет не создаётся рядом с файлами пользователя.
+    """
+    return os.path.realpath(str(data_dir)) == os.path.realpath(DATA_DIR)
+
+
+def _packaged_file(path: str) -> Optional[Tuple[str, str]]:
+    """
+    Если path — один из исходных файлов ресурсов в DATA_DIR, возвращает (папка, имя файла).
+    """
+    path = os.path.abspath(str(path))
+    name = os.path.basename(path)
+    if not uses_bundle(os.path.dirname(path)):
+        return None
+    if name in (STOP_WORDS_FILE, RUSENTILEX_FILE) or name.endswith(DICTIONARY_SUFFIX):
+        return os.path.dirname(path), name
+    return None
+
+
+def load_stop_words(path: str) -> List[str]:
+    """
+    Стоп-слова из файла: для stop_words.txt из DATA_DIR — через пакет ресурсов, иначе — чтением файла.
+    """
+    packaged = _packaged_file(path)
+    if packaged is not None and packaged[1] == STOP_WORDS_FILE:
+        return get_resource_bundle(packaged[0]).stop_words()
+    return parse_stop_words(path)
+
+
+def load_dictionary(dict_dir: str, name: str) -> FrozenSet[str]:
+    """Словарь name_lemm.txt из папки dict_dir: для DATA_DIR — через пакет ресурсов, иначе — чтением файла."""
+    path = os.path.join(dict_dir, f"{name}{DICTIONARY_SUFFIX}")
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    if uses_bundle(dict_dir):
+        return get_resource_bundle(dict_dir).dictionary(name)
+    return frozenset(parse_dictionary(path))
+
+
+def load_rusentilex(path: str) -> Dict[str, Dict[str, FrozenSet[str]]]:
+    """
+    Лексикон RuSentiLex: для rusentilex_clean.txt из DATA_DIR — через пакет ресурсов, иначе — разбором файла.
+    """
+    packaged = _packaged_file(path)
+    if packaged is not None and packaged[1] == RUSENTILEX_FILE:
+        return get_resource_bundle(packaged[0]).rusentilex()
+    return {
+        source: {polarity: frozenset(phrases) for polarity, phrases in polarities.items()}
+        for source, polarities in parse_rusentilex(path).items()
+    }
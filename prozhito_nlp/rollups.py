@@ -0,0 +1,246 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from .corpus_metrics import note_metrics
+from .schema import ensure_datetime
+from .sentiment import POLARITIES
+
+FREQUENCIES = ("day", "week", "month", "year", "decade")
+
+
+def _bucket_keys(dates: pd.Series, freq: str) -> pd.Series:
+    """
+    Ключ интервала для каждой даты: сама дата, понедельник недели, первое число месяца,
+    год или первый год десятилетия.
+    """
+    if freq == "day":
+        return dates
+    if freq == "week":
+        return dates.dt.to_period("W").dt.start_time
+    if freq == "month":
+        return dates.dt.to_period("M").dt.start_time
+    if freq == "year":
+        return dates.dt.year
+    if freq == "decade":
+        return dates.dt.year // 10 * 10
+    raise ValueError(f"Неизвестный интервал: {freq}. Допустимые значения: {', '.join(FREQUENCIES)}")
+
+
+def _group_matrix(keys: pd.Series):
+    """
+    Разреженная матрица (интервалы × строки), суммирующая строки по интервалам.
+
+    Возвращает:
+    - (матрица, отсортированные ключи интервалов)
+    """
+    codes, uniques = pd.factorize(keys, sort=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(codes)), (codes, np.arange(len(codes)))),
+        shape=(len(uniques), len(codes))
+    )
+    return matrix, uniques
+
+
+class TimeAggregates:
+    """
+    Частичные суммы по дням, из которых без повторного прохода по записям получаются
+    сводки по неделям, месяцам, годам и десятилетиям, скользящие окна и TF-IDF по интервалам.
+
+    По каждому дню хранятся: число записей, токенов и предложений, совпадения с RuSentiLex
+    по полярностям, сумма сентимент-оценок записей и совпадения со словарями.
+    Для TF-IDF хранятся документная частота слов по дням и частоты слов каждой записи
+    (разреженная матрица): IDF интервала складывается из дневных частот, после чего записи
+    интервала взвешиваются и нормируются, как в TfidfVectorizer, — оценки совпадают
+    с compute_tfidf_by_year (для freq="year") и с chunked.TfidfAggregator после rescore.
+    Матрица частот растёт с объёмом корпуса, как словари TfidfAggregator.
+
+    Сводки по интервалам кэшируются: смена детализации графика не пересчитывает данные.
+    Записи без даты в сводки не входят (их число — в атрибуте undated).
+    """
+
+    def __init__(
+        self,
+        daily: pd.DataFrame,
+        doc_freq: Optional[sparse.csr_matrix] = None,
+        counts: Optional[sparse.csr_matrix] = None,
+        note_days: Optional[np.ndarray] = None,
+        vocabulary: Optional[np.ndarray] = None,
+        undated: int = 0
+    ):
+        self.daily = daily
+        self.doc_freq = doc_freq
+        self.counts = counts
+        self.note_days = note_days
+        self.vocabulary = vocabulary
+        self.undated = undated
+        self._rollups: Dict[str, pd.DataFrame] = {"day": daily}
+        self._tfidf: Dict[str, Any] = {}
+
+    @classmethod
+    def from_notes(
+        cls,
+        df: pd.DataFrame,
+        token_column: str = "tokens",
+        date_column: str = "date",
+        lexicon=None,
+        phrase_dicts: Optional[Dict[str, Set[str]]] = None,
+        stop_words: Optional[List[str]] = None,
+        tfidf: bool = True,
+        sentiment_method: str = "sparse"
+    ) -> "TimeAggregates":
+        """
+        Считает дневные частичные суммы за один проход по записям.
+
+        Параметры:
+        - df: pd.DataFrame с лемматизированным текстом и датами
+        - token_column: колонка с леммами (с пунктуацией)
+        - date_column: колонка с датой
+        - lexicon: результат load_rusentilex_dict (если None — без сентимента)
+        - phrase_dicts: результат load_custom_dictionaries (если None — без словарей)
+        - stop_words: стоп-слова для TF-IDF
+        - tfidf: считать ли частичные суммы для TF-IDF
+        - sentiment_method: "sparse" или "substring" (см. note_metrics) — оба дают те же
+          совпадения, что analyze_sentiment по умолчанию
+        """
+        dates = ensure_datetime(df[date_column])
+        dated = dates.notna().values
+
+        metrics = note_metrics(
+            df, token_column=token_column, lexicon=lexicon, phrase_dicts=phrase_dicts, sentiment_method=sentiment_method
+        )
+        metrics.insert(0, "notes", 1)
+        if "rusentilex_score" in metrics:
+            metrics = metrics.rename(columns={"rusentilex_score": "score_sum"})
+
+        days = dates[dated].dt.normalize()
+        daily = metrics[dated].groupby(days.values).sum().rename_axis("date")
+
+        doc_freq = counts = note_days = vocabulary = None
+        if tfidf:
+            vectorizer = CountVectorizer(stop_words=stop_words)
+            texts = df[token_column].fillna("").astype(str)[dated]
+            counts = vectorizer.fit_transform(texts).astype(float).tocsr()
+            binary = counts.copy()
+            binary.data[:] = 1
+
+            group, _ = _group_matrix(days.reset_index(drop=True))
+            doc_freq = (group @ binary).tocsr()
+            # Номер дня (строки daily) для каждой записи
+            note_days = daily.index.get_indexer(days.values)
+            vocabulary = vectorizer.get_feature_names_out()
+
+        return cls(daily, doc_freq, counts, note_days, vocabulary, undated=int((~dated).sum()))
+
+    def rollup(self, freq: str = "month") -> pd.DataFrame:
+        """
+        Суммы по интервалам freq ("day", "week", "month", "year", "decade")
+        и производные колонки: mean_rusentilex_score, avg_tokens_per_record, avg_sentence_length.
+        """
+        if freq not in self._rollups:
+            keys = _bucket_keys(self.daily.index.to_series(), freq).rename(freq)
+            self._rollups[freq] = self.daily.groupby(keys.values).sum().rename_axis(freq)
+        return self._with_ratios(self._rollups[freq])
+
+    def rolling(self, window: int = 30, freq: str = "day", min_periods: int = 1) -> pd.DataFrame:
+        """
+        Скользящие суммы по window интервалам freq (для freq="day" — по window календарным дням,
+        пропуски между записями учитываются) и производные колонки, как в rollup.
+        """
+        sums = self.rollup(freq)[self.daily.columns]
+        if freq == "day":
+            rolled = sums.rolling(f"{window}D", min_periods=min_periods).sum()
+        else:
+            rolled = sums.rolling(window, min_periods=min_periods).sum()
+        return self._with_ratios(rolled)
+
+    @staticmethod
+    def _with_ratios(sums: pd.DataFrame) -> pd.DataFrame:
+        table = sums.copy()
+        notes = table["notes"].where(table["notes"] > 0)
+        if "score_sum" in table:
+            table["mean_rusentilex_score"] = (table["score_sum"] / notes).fillna(0.0)
+        table["avg_tokens_per_record"] = (table["tokens_with_punkt"] / notes).fillna(0.0)
+        table["avg_sentence_length"] = (
+            table["tokens"] / table["sentences"].where(table["sentences"] > 0)
+        ).fillna(0.0)
+        return table
+
+    def sentiment_series(self, freq: str = "day", window: Optional[int] = None) -> pd.DataFrame:
+        """
+        Средний сентимент по интервалам (или скользящим окнам) в виде таблицы
+        date / rusentilex_score — её принимают plot_sentiment_dynamics и plot_sentiment_calendar.
+        """
+        if "score_sum" not in self.daily:
+            raise ValueError("Дневные суммы посчитаны без лексикона (lexicon=None)")
+        table = self.rolling(window, freq) if window is not None else self.rollup(freq)
+        series = table["mean_rusentilex_score"].rename("rusentilex_score")
+        if freq in ("year", "decade"):
+            series.index = pd.to_datetime(series.index.astype(str), format="%Y")
+        return series.rename_axis("date").reset_index()
+
+    def dictionary_totals(self) -> Dict[str, int]:
+        """
+        Общее число совпадений по словарям в формате total_matches (для plot_total_matches).
+        """
+        columns = [column for column in self.daily.columns if column.startswith("dict_")]
+        return {column[len("dict_"):]: int(self.daily[column].sum()) for column in columns}
+
+    def sentiment_totals(self) -> Dict[str, int]:
+        """Число совпадений с RuSentiLex по полярностям за весь период."""
+        return {polarity: int(self.daily[f"sentiment_{polarity}"].sum()) for polarity in POLARITIES}
+
+    def tfidf(self, freq: str = "year", top_n: int = 20) -> pd.DataFrame:
+        """
+        Топ-слова по TF-IDF для каждого интервала freq в формате compute_tfidf_by_year
+        (колонки TF-IDF, word и колонка с названием интервала, например year).
+        Для freq="year" оценки совпадают с compute_tfidf_by_year.
+        """
+        if self.doc_freq is None:
+            raise ValueError("Дневные суммы посчитаны без TF-IDF (tfidf=False)")
+        if freq not in self._tfidf:
+            self._tfidf[freq] = self._interval_tfidf(freq)
+
+        frames = []
+        for bucket, indices, scores in self._tfidf[freq]:
+            temp_df = pd.DataFrame({
+                'TF-IDF': scores,
+                'word': self.vocabulary[indices]
+            }).sort_values('TF-IDF', ascending=False)
+            temp_df[freq] = bucket
+            frames.append(temp_df.head(top_n))
+        if not frames:
+            return pd.DataFrame(columns=['TF-IDF', 'word', freq])
+        return pd.concat(frames, ignore_index=True)
+
+    def _interval_tfidf(self, freq: str) -> List[Tuple[Any, np.ndarray, np.ndarray]]:
+        """
+        Суммы TF-IDF записей по интервалам freq: IDF интервала — из дневных документных частот,
+        вектор каждой записи умножается на IDF и L2-нормируется, как в TfidfVectorizer.
+
+        Возвращает:
+        - список (интервал, индексы слов интервала в vocabulary, суммы TF-IDF этих слов)
+        """
+        keys = _bucket_keys(self.daily.index.to_series(), freq).reset_index(drop=True)
+        group, uniques = _group_matrix(keys)
+        n_docs = group @ self.daily["notes"].values
+        doc_freq = (group @ self.doc_freq).tocsr()
+        # Номер интервала для каждой записи (через её день)
+        note_buckets = pd.factorize(keys, sort=True)[0][self.note_days]
+
+        result = []
+        for i, bucket in enumerate(uniques):
+            df_row = doc_freq.getrow(i)
+            df_row.sort_indices()
+            if not df_row.nnz:
+                continue
+            idf = np.log((1 + n_docs[i]) / (1 + df_row.toarray().ravel())) + 1
+            weighted = self.counts[np.flatnonzero(note_buckets == i)] @ sparse.diags(idf)
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            weighted = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ weighted
+            scores = np.asarray(weighted.sum(axis=0)).ravel()
+            result.append((bucket, df_row.indices, scores[df_row.indices]))
+        return result
@@ -0,0 +1,94 @@
+from typing import Dict, Optional
+
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype
+
+# Типы колонок записей после загрузки: компактные целые ID, категории для автора и дневника,
+# логические флаги, разобранные даты и год
+NOTE_SCHEMA: Dict[str, str] = {
+    "id": "int32",
+    "diary": "category",
+    "person": "category",
+    "date": "datetime64[ns]",
+    "dateTop": "datetime64[ns]",
+    "notDated": "bool",
+    "julian_calendar": "bool",
+    "year": "Int16",
+}
+DATE_COLUMNS = [column for column, dtype in NOTE_SCHEMA.items() if dtype.startswith("datetime")]
+FLAG_COLUMNS = [column for column, dtype in NOTE_SCHEMA.items() if dtype == "bool"]
+
+# Формат дат в notes.json и в CSV авторов; неизвестная дата записывается как 0000-00-00
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def ensure_datetime(values: pd.Series) -> pd.Series:
+    """
+    Даты в виде datetime64: уже разобранная колонка возвращается как есть,
+    строки разбираются в формате DATE_FORMAT (нераспознанные даты, например 0000-00-00, становятся NaT).
+    """
+    if is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+
+
+def has_schema(df: pd.DataFrame, date_column: str = "date") -> bool:
+    """Применена ли к записям схема (колонка с датой уже разобрана, год посчитан)."""
+    return (
+        date_column in df and is_datetime64_any_dtype(df[date_column])
+        and "year" in df and str(df["year"].dtype) == NOTE_SCHEMA["year"]
+    )
+
+
+def apply_schema(df: pd.DataFrame, date_column: str = "date") -> pd.DataFrame:
+    """
+    Приводит записи к NOTE_SCHEMA: один раз разбирает даты, считает год, сжимает ID и флаги.
+    Колонки, которых нет в df, пропускаются; повторное применение ничего не меняет.
+
+    Параметры:
+    - df: pd.DataFrame с записями (как после split_json_to_csv или чтения CSV)
+    - date_column: колонка с датой записи, по которой считается год
+
+    Возвращает:
+    - pd.DataFrame с приведёнными типами
+    """
+    df = df.copy()
+    for column in DATE_COLUMNS:
+        if column in df:
+            df[column] = ensure_datetime(df[column])
+    for column in FLAG_COLUMNS:
+        if column in df and not is_bool_dtype(df[column]):
+            df[column] = df[column].fillna(0).astype(int).astype(bool)
+    if "id" in df:
+        df["id"] = df["id"].astype(NOTE_SCHEMA["id"])
+    for column in ("diary", "person"):
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            # Целые номера вместо float, которые остаются после dropna по колонке
+            df[column] = df[column].astype("int64").astype("category")
+    if date_column in df:
+        df["year"] = ensure_datetime(df[date_column]).dt.year.astype(NOTE_SCHEMA["year"])
+    return df
+
+
+def to_csv_frame(df: pd.DataFrame, raw: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Записи для сохранения в CSV в прежнем формате: флаги — 0/1, без вычисленного года.
+
+    Параметры:
+    - df: записи после apply_schema
+    - raw: те же записи до apply_schema (с тем же индексом) — из них берутся исходные строки дат,
+      чтобы сохранить значения, которые не разбираются в дату (например 0000-00-00 в dateTop).
+      Если не указан, даты записываются в формате DATE_FORMAT, а NaT — пустой строкой
+    """
+    df = df.drop(columns=[column for column in ("year",) if column in df])
+    for column in DATE_COLUMNS:
+        if column not in df:
+            continue
+        if raw is not None and column in raw:
+            df[column] = raw.loc[df.index, column]
+        elif is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime(DATE_FORMAT)
+    for column in FLAG_COLUMNS:
+        if column in df and is_bool_dtype(df[column]):
+            df[column] = df[column].astype(int)
+    return df
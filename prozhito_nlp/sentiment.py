@@ -1,22 +1,25 @@
+import numpy as np
 import pandas as pd
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Tuple, Set, List
+from typing import Dict, Iterable, Tuple, Set, List
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from .resources import load_rusentilex
+
+SOURCES = ['opinion', 'feeling', 'fact']
+POLARITIES = ['positive', 'neutral', 'negative']
 
 def load_rusentilex_dict(filepath: Path) -> Dict[str, Dict[str, Set[str]]]:
     """
     Загружает словарь RuSentiLex и организует его по типу лексики и полярности.
     """
     lexicon = defaultdict(lambda: defaultdict(set))  # source -> polarity -> phrases
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            parts = line.strip().split(',')
-            if len(parts) < 5:
-                continue
-            phrase = parts[2].strip()
-            polarity = parts[3].strip().lower()
-            source = parts[4].strip().lower()
-            lexicon[source][polarity].add(phrase)
+    # Файл разбирается один раз на процесс (см. resources); возвращается изменяемая копия
+    for source, polarities in load_rusentilex(filepath).items():
+        for polarity, phrases in polarities.items():
+            lexicon[source][polarity] = set(phrases)
     return lexicon
 
 
@@ -30,53 +33,365 @@ def calculate_sentiment_score(pos: int, neu: int, neg: int) -> float:
     return (pos - neg) / total
 
 
+def match_sentiment_phrases(
+    text: str,
+    lexicon: Dict[str, Dict[str, Set[str]]]
+) -> Dict[Tuple[str, str], Set[str]]:
+    """
+    Находит фразы лексикона в одном лемматизированном тексте.
+    Возвращает словарь (тип лексики, полярность) → множество найденных фраз.
+    """
+    normalized_text = ' '.join(text.split())
+    return {
+        (source, polarity): {phrase for phrase in lexicon[source][polarity] if phrase in normalized_text}
+        for source in SOURCES
+        for polarity in POLARITIES
+    }
+
+
+def score_text_sentiment(
+    text: str,
+    lexicon: Dict[str, Dict[str, Set[str]]]
+) -> Tuple[int, int, int]:
+    """
+    Считает количество позитивных, нейтральных и негативных совпадений в одном тексте.
+    """
+    counts = {polarity: 0 for polarity in POLARITIES}
+    for (_, polarity), matches in match_sentiment_phrases(text, lexicon).items():
+        counts[polarity] += len(matches)
+    return counts['positive'], counts['neutral'], counts['negative']
+
+
+class SubstringSentimentScorer:
+    """
+    Подсчёт совпадений с RuSentiLex поиском каждой фразы как подстроки в каждой записи
+    (как analyze_sentiment(method="substring")) в виде матрицы (записи × 9).
+    """
+
+    def __init__(self, lexicon: Dict[str, Dict[str, Set[str]]]):
+        self.lexicon = lexicon
+        self.columns = [(source, polarity) for source in SOURCES for polarity in POLARITIES]
+
+    def score(self, texts: Iterable[str]) -> Tuple[np.ndarray, Dict[Tuple[str, str], Set[str]]]:
+        """
+        Считает совпадения для всех текстов.
+
+        Возвращает:
+        - матрицу counts размера (записи × 9): число различных совпавших единиц
+          для каждой пары (тип лексики, полярность) в порядке self.columns,
+        - словарь (тип лексики, полярность) → множество найденных единиц.
+        """
+        texts = list(texts)
+        counts = np.zeros((len(texts), len(self.columns)), dtype=np.int64)
+        words: Dict[Tuple[str, str], Set[str]] = {column: set() for column in self.columns}
+        for doc, text in enumerate(texts):
+            matches = match_sentiment_phrases(text, self.lexicon)
+            for col, column in enumerate(self.columns):
+                counts[doc, col] = len(matches[column])
+                words[column] |= matches[column]
+        return counts, words
+
+    def polarity_scores(self, counts: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Сводит матрицу counts к суммам по полярностям и сентимент-оценкам записей
+        (то же, что calculate_sentiment_score, но для всех записей сразу).
+        """
+        by_polarity = {
+            polarity: counts[:, [i for i, (_, p) in enumerate(self.columns) if p == polarity]].sum(axis=1)
+            for polarity in POLARITIES
+        }
+        total = by_polarity['positive'] + by_polarity['neutral'] + by_polarity['negative']
+        scores = np.divide(
+            by_polarity['positive'] - by_polarity['negative'], total,
+            out=np.zeros(len(total), dtype=float), where=total > 0
+        )
+        return by_polarity, scores
+
+
+class SparseSentimentScorer(SubstringSentimentScorer):
+    """
+    Векторизованный подсчёт совпадений с RuSentiLex с той же семантикой, что у
+    analyze_sentiment(method="substring"): единица лексикона совпадает, если она
+    является подстрокой записи (после схлопывания пробелов), и каждая различная
+    единица считается один раз на запись.
+
+    Однословная единица не содержит пробелов, поэтому может совпасть только внутри
+    одного токена. Для словаря токенов корпуса строится матрица «токен × единица»
+    (единица — подстрока токена), и совпадения всех записей получаются умножением
+    матрицы «запись × токен» на неё. Многословные единицы сначала отбираются так же
+    (каждая их часть должна быть подстрокой какого-то токена записи), а затем
+    проверяются поиском подстроки только в отобранных записях.
+    """
+
+    def __init__(self, lexicon: Dict[str, Dict[str, Set[str]]]):
+        super().__init__(lexicon)
+
+        entry_columns: Dict[str, List[int]] = defaultdict(list)
+        for col, (source, polarity) in enumerate(self.columns):
+            for phrase in lexicon[source][polarity]:
+                entry_columns[phrase].append(col)
+
+        self.entries = np.array(sorted(entry_columns), dtype=object)
+        rows, cols = [], []
+        for entry_id, phrase in enumerate(self.entries):
+            for col in entry_columns[phrase]:
+                rows.append(entry_id)
+                cols.append(col)
+        self.indicators = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(self.entries), len(self.columns))
+        )
+
+        # Части единиц, которые ищутся внутри токенов: сами однословные единицы
+        # и токены многословных
+        self.pieces: Dict[str, int] = {}
+        single_rows, single_cols = [], []
+        multi_rows, multi_cols = [], []
+        self.multiword: List[int] = []
+        for entry_id, phrase in enumerate(self.entries):
+            parts = phrase.split()
+            if parts == [phrase]:
+                single_rows.append(self.pieces.setdefault(phrase, len(self.pieces)))
+                single_cols.append(entry_id)
+            else:
+                # Многословная единица (а также пустая или из одних пробелов)
+                for part in set(parts):
+                    multi_rows.append(self.pieces.setdefault(part, len(self.pieces)))
+                    multi_cols.append(len(self.multiword))
+                self.multiword.append(entry_id)
+        self.piece_lengths = sorted({len(piece) for piece in self.pieces})
+
+        self.single = sparse.csr_matrix(
+            (np.ones(len(single_rows), dtype=np.int32), (single_rows, single_cols)),
+            shape=(len(self.pieces), len(self.entries))
+        )
+        self.multiword_parts = sparse.csr_matrix(
+            (np.ones(len(multi_rows), dtype=np.int32), (multi_rows, multi_cols)),
+            shape=(len(self.pieces), len(self.multiword))
+        )
+        self.multiword_sizes = np.asarray(self.multiword_parts.sum(axis=0)).ravel()
+
+        # Токен → части единиц, входящие в него; пополняется от вызова к вызову
+        self._token_pieces: Dict[str, Tuple[int, ...]] = {}
+
+    def _pieces_in(self, token: str) -> Tuple[int, ...]:
+        found = self._token_pieces.get(token)
+        if found is None:
+            ids = set()
+            for length in self.piece_lengths:
+                if length > len(token):
+                    break
+                for start in range(len(token) - length + 1):
+                    piece_id = self.pieces.get(token[start:start + length])
+                    if piece_id is not None:
+                        ids.add(piece_id)
+            found = self._token_pieces[token] = tuple(ids)
+        return found
+
+    def _prepare(self, texts: Iterable[str]) -> List[str]:
+        """Тексты, в которых ищутся единицы: пробелы схлопываются, как в match_sentiment_phrases."""
+        return [' '.join(text.split()) for text in texts]
+
+    def match(self, texts: Iterable[str]) -> sparse.csr_matrix:
+        """
+        Бинарная матрица «запись × единица лексикона» (единицы в порядке self.entries).
+        """
+        texts = self._prepare(texts)
+        vectorizer = CountVectorizer(tokenizer=str.split, token_pattern=None, lowercase=False, binary=True)
+        try:
+            X = vectorizer.fit_transform(texts)
+            tokens = vectorizer.get_feature_names_out()
+        except ValueError:
+            # Во всех записях нет ни одного токена
+            X = sparse.csr_matrix((len(texts), 0), dtype=np.int64)
+            tokens = []
+
+        rows, cols = [], []
+        for token_id, token in enumerate(tokens):
+            found = self._pieces_in(token)
+            rows.extend([token_id] * len(found))
+            cols.extend(found)
+        containment = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(tokens), len(self.pieces))
+        )
+        present = (X @ containment).tocsr()
+        present.data = np.ones_like(present.data)
+
+        matched = (present @ self.single).tocoo()
+        rows, cols = list(matched.row), list(matched.col)
+
+        if self.multiword:
+            # Отбор: в записи есть все части многословной единицы; затем точная проверка подстрокой
+            parts = (present @ self.multiword_parts).tocsr()
+            parts.data = (parts.data == self.multiword_sizes[parts.indices]).astype(np.int32)
+            parts.eliminate_zeros()
+            candidates = parts.tocoo()
+            doc_ids = list(candidates.row)
+            multi_ids = list(candidates.col)
+            # Единица без частей (пустая строка или одни пробелы) проверяется во всех записях
+            for multi_id in np.flatnonzero(self.multiword_sizes == 0):
+                doc_ids.extend(range(len(texts)))
+                multi_ids.extend([multi_id] * len(texts))
+            for doc, multi_id in zip(doc_ids, multi_ids):
+                entry_id = self.multiword[multi_id]
+                if self.entries[entry_id] in texts[doc]:
+                    rows.append(doc)
+                    cols.append(entry_id)
+
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+            shape=(len(texts), len(self.entries))
+        )
+
+    def score(self, texts: Iterable[str]) -> Tuple[np.ndarray, Dict[Tuple[str, str], Set[str]]]:
+        """
+        Считает совпадения для всех текстов сразу.
+
+        Возвращает:
+        - матрицу counts размера (записи × 9): число различных совпавших единиц
+          для каждой пары (тип лексики, полярность) в порядке self.columns,
+        - словарь (тип лексики, полярность) → множество найденных единиц.
+        """
+        return self.count_matches(self.match(texts))
+
+    def count_matches(self, matched: sparse.csr_matrix) -> Tuple[np.ndarray, Dict[Tuple[str, str], Set[str]]]:
+        """
+        Переводит матрицу match (или её часть по строкам) в counts и найденные единицы — как score.
+        """
+        counts = np.asarray((matched @ self.indicators).todense(), dtype=np.int64)
+
+        words: Dict[Tuple[str, str], Set[str]] = {column: set() for column in self.columns}
+        present = np.flatnonzero(np.asarray(matched.sum(axis=0)).ravel())
+        if len(present):
+            present_indicators = self.indicators[present].tocoo()
+            for row, col in zip(present_indicators.row, present_indicators.col):
+                words[self.columns[col]].add(self.entries[present[row]])
+        return counts, words
+
+
+SCORERS = {"substring": SubstringSentimentScorer, "sparse": SparseSentimentScorer}
+
+
+def make_sentiment_scorer(lexicon: Dict[str, Dict[str, Set[str]]], method: str = "sparse") -> SubstringSentimentScorer:
+    """
+    Создаёт объект подсчёта совпадений для метода "sparse" (векторизованно) или "substring"
+    (поиск подстрок в цикле); совпадения у обоих одинаковые.
+    """
+    if method not in SCORERS:
+        raise ValueError(f"Неизвестный метод: {method}. Допустимые значения: {', '.join(repr(m) for m in SCORERS)}")
+    return SCORERS[method](lexicon)
+
+
+def compute_sentiment_counts(
+    texts: Iterable[str],
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    scorer: SubstringSentimentScorer = None
+) -> pd.DataFrame:
+    """
+    Возвращает таблицу совпадений по записям: колонки '<тип>_<полярность>',
+    суммарные 'positive', 'neutral', 'negative' и 'rusentilex_score'.
+    Если scorer не передан, подсчёт векторизованный (SparseSentimentScorer).
+    """
+    texts = pd.Series(texts)
+    scorer = scorer or SparseSentimentScorer(lexicon)
+    counts, _ = scorer.score(texts)
+    by_polarity, scores = scorer.polarity_scores(counts)
+    table = pd.DataFrame(counts, columns=[f"{s}_{p}" for s, p in scorer.columns], index=texts.index)
+    for polarity in POLARITIES:
+        table[polarity] = by_polarity[polarity]
+    table['rusentilex_score'] = scores
+    return table
+
+
+def sentiment_mismatches(
+    texts: Iterable[str],
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    scorer: SparseSentimentScorer = None
+) -> pd.DataFrame:
+    """
+    Проверяет, что векторизованный подсчёт совпадает с поиском подстрок
+    (analyze_sentiment(method="substring")) на данных текстах.
+
+    Возвращает:
+    - pd.DataFrame с записями, где подсчёты расходятся: колонки '<тип>_<полярность>'
+      для обоих способов (суффиксы _sparse и _substring); пустой, если расхождений нет
+    """
+    texts = pd.Series(texts)
+    columns = [f"{s}_{p}" for s in SOURCES for p in POLARITIES]
+    sparse_counts = compute_sentiment_counts(texts, lexicon, scorer=scorer)[columns]
+    substring_counts = compute_sentiment_counts(texts, lexicon, scorer=SubstringSentimentScorer(lexicon))[columns]
+    differs = (sparse_counts != substring_counts).any(axis=1)
+    return sparse_counts[differs].join(substring_counts[differs], lsuffix="_sparse", rsuffix="_substring")
+
+
 def analyze_sentiment(
     df: pd.DataFrame,
     text_column: str,
-    lexicon: Dict[str, Dict[str, Set[str]]]
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    method: str = "substring"
 ) -> Tuple[Dict, int, Dict[str, int], pd.DataFrame]:
     """
     Проводит сентимент-анализ на основе словаря RuSentiLex.
+
+    Параметры:
+    - method: "substring" — поиск каждой фразы лексикона как подстроки в каждой записи;
+      "sparse" — те же совпадения, но векторизованно, умножением разреженных матриц
+      (см. SparseSentimentScorer), на порядки быстрее на больших корпусах;
+      "surface" — то же, что "sparse", но по очищенному тексту без лемматизации:
+      леммы находятся по таблице словоформ (см. surface_forms).
+
     Возвращает:
     - результаты по категориям,
     - общее количество уникальных слов,
     - общее количество слов в каждой категории словаря,
     - обновлённый DataFrame с колонкой rusentilex_score.
     """
+    if method not in ("substring", "sparse", "surface"):
+        raise ValueError(f"Неизвестный метод: {method}. Допустимые значения: 'substring', 'sparse', 'surface'")
+    if method == "surface":
+        from .surface_forms import analyze_sentiment_surface
+        return analyze_sentiment_surface(df, text_column, lexicon)
+
     result = defaultdict(lambda: defaultdict(lambda: {'words': set(), 'count': 0}))
     sentiment_scores = []
 
     total_unique_words = sum(df[text_column].apply(lambda x: len(set(x.split()))))
 
-    sources = ['opinion', 'feeling', 'fact']
-    polarities = ['positive', 'neutral', 'negative']
+    total_category_words = {
+        source: sum(len(lexicon[source][pol]) for pol in POLARITIES)
+        for source in SOURCES
+    }
+
+    if method == "sparse":
+        scorer = SparseSentimentScorer(lexicon)
+        counts, words = scorer.score(df[text_column])
+        for col, (source, polarity) in enumerate(scorer.columns):
+            result[source][polarity]['words'] = words[(source, polarity)]
+            result[source][polarity]['count'] = int(counts[:, col].sum())
+
+        _, scores = scorer.polarity_scores(counts)
+        df['rusentilex_score'] = scores
+        return result, total_unique_words, total_category_words, df
 
     for text in df[text_column]:
-        normalized_text = ' '.join(text.split())
         pos, neu, neg = 0, 0, 0
 
-        for source in sources:
-            for polarity in polarities:
-                matches = {phrase for phrase in lexicon[source][polarity] if phrase in normalized_text}
-                result[source][polarity]['words'].update(matches)
-                result[source][polarity]['count'] += len(matches)
+        for (source, polarity), matches in match_sentiment_phrases(text, lexicon).items():
+            result[source][polarity]['words'].update(matches)
+            result[source][polarity]['count'] += len(matches)
 
-                if polarity == 'positive':
-                    pos += len(matches)
-                elif polarity == 'neutral':
-                    neu += len(matches)
-                elif polarity == 'negative':
-                    neg += len(matches)
+            if polarity == 'positive':
+                pos += len(matches)
+            elif polarity == 'neutral':
+                neu += len(matches)
+            elif polarity == 'negative':
+                neg += len(matches)
 
         sentiment_scores.append(calculate_sentiment_score(pos, neu, neg))
 
     df['rusentilex_score'] = sentiment_scores
 
-    total_category_words = {
-        source: sum(len(lexicon[source][pol]) for pol in polarities)
-        for source in sources
-    }
-
     return result, total_unique_words, total_category_words, df
 
 
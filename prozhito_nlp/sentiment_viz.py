@@ -4,30 +4,56 @@ from scipy.signal import savgol_filter
 from statsmodels.nonparametric.smoothers_lowess import lowess
 import plotly.graph_objects as go
 
+from .rollups import TimeAggregates
+from .schema import ensure_datetime
+from .viz_utils import (
+    COMPACT_MAX_POINTS, round_values, scatter_class, downsample_series, apply_compact_layout
+)
+
 def plot_sentiment_dynamics(
     df: pd.DataFrame,
     date_column: str = 'date',
     score_column: str = 'rusentilex_score',
     window_length: int = 11,
     lowess_frac: float = 0.1,
-    title_prefix: str = 'Динамика сентимента'
+    title_prefix: str = 'Динамика сентимента',
+    compact: bool = False,
+    max_points: int = COMPACT_MAX_POINTS,
+    webgl: bool = None,
+    freq: str = 'day',
+    window: int = None,
+    show: bool = False
 ) -> go.Figure:
     """
     Строит график динамики сентимента по датам с оригинальными значениями и сглаживанием (Savitzky-Golay, LOWESS).
     
     Параметры:
-        df (pd.DataFrame): датафрейм с колонками дат и сентимент-оценок
+        df (pd.DataFrame | TimeAggregates): датафрейм с колонками дат и сентимент-оценок
+            или дневные суммы TimeAggregates (тогда рисуется средний сентимент по интервалам)
         date_column (str): имя колонки с датами
         score_column (str): имя колонки с сентимент-оценками
         window_length (int): окно сглаживания для фильтра Савицкого-Голея (должно быть нечетным)
         lowess_frac (float): параметр сглаживания для LOWESS
         title_prefix (str): заголовок графика
+        compact (bool): исходные точки хранятся один раз (а не в трёх трассах), каждая трасса
+            сокращается до max_points точек, значения округляются, шаблон облегчается;
+            сглаживание считается по всем точкам
+        max_points (int): максимум точек в трассе в компактном режиме
+        webgl (bool): рисовать точки через WebGL (go.Scattergl); по умолчанию — в компактном
+            режиме для больших рядов
+        freq (str): интервал усреднения для TimeAggregates: 'day', 'week', 'month', 'year', 'decade'
+        window (int): скользящее окно из window интервалов для TimeAggregates
+        show (bool): показать график сразу и вернуть None, как другие функции графиков;
+            по умолчанию фигура возвращается (в ноутбуке её отображает сам возврат)
     
     Возвращает:
-        plotly.graph_objects.Figure: интерактивный график
+        plotly.graph_objects.Figure: интерактивный график (None при show=True)
     """
+    if isinstance(df, TimeAggregates):
+        df = df.sentiment_series(freq, window=window)
+        date_column, score_column = 'date', 'rusentilex_score'
     df = df.copy()
-    df[date_column] = pd.to_datetime(df[date_column])
+    df[date_column] = ensure_datetime(df[date_column])
     dates = df[date_column]
     scores = df[score_column]
 
@@ -44,11 +70,22 @@ def plot_sentiment_dynamics(
     lowess_dates = pd.to_datetime(lowess_result[:, 0])
     lowess_scores = lowess_result[:, 1]
 
+    if compact:
+        fig = _plot_sentiment_dynamics_compact(
+            dates, scores, smoothed_scores_savgol, lowess_dates, lowess_scores,
+            title_prefix, max_points, webgl
+        )
+        if show:
+            fig.show()
+            return None
+        return fig
+    Scatter = go.Scattergl if webgl else go.Scatter
+
     # Построение графика
     fig = go.Figure()
 
     # Исходные значения
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=dates,
         y=scores,
         mode='lines+markers',
@@ -59,7 +96,7 @@ def plot_sentiment_dynamics(
     ))
 
     # Savitzky-Golay
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=dates,
         y=scores,
         mode='markers',
@@ -67,7 +104,7 @@ def plot_sentiment_dynamics(
         marker=dict(color='#E4653F', size=4, opacity=0.4),
         visible=False
     ))
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=dates,
         y=smoothed_scores_savgol,
         mode='lines',
@@ -77,7 +114,7 @@ def plot_sentiment_dynamics(
     ))
 
     # LOWESS
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=dates,
         y=scores,
         mode='markers',
@@ -85,7 +122,7 @@ def plot_sentiment_dynamics(
         marker=dict(color='#E4653F', size=4, opacity=0.4),
         visible=False
     ))
-    fig.add_trace(go.Scatter(
+    fig.add_trace(Scatter(
         x=lowess_dates,
         y=lowess_scores,
         mode='lines',
@@ -123,6 +160,14 @@ def plot_sentiment_dynamics(
         ]
     )
 
+    _layout_sentiment_dynamics(fig, title_prefix)
+    if show:
+        fig.show()
+        return None
+    return fig
+
+
+def _layout_sentiment_dynamics(fig: go.Figure, title_prefix: str) -> None:
     # Общие настройки
     fig.update_layout(
         xaxis_title='Дата',
@@ -141,24 +186,105 @@ def plot_sentiment_dynamics(
         )
     )
 
+
+def _plot_sentiment_dynamics_compact(
+    dates, scores, savgol_scores, lowess_dates, lowess_scores, title_prefix, max_points, webgl
+) -> go.Figure:
+    """
+    Компактный вариант plot_sentiment_dynamics: три трассы вместо пяти
+    (исходные точки видны во всех режимах), не больше max_points точек в каждой.
+    """
+    raw_x, raw_y = downsample_series(dates, scores, max_points)
+    savgol_x, savgol_y = downsample_series(dates, pd.Series(savgol_scores), max_points)
+    lowess_x, lowess_y = downsample_series(pd.Series(lowess_dates), pd.Series(lowess_scores), max_points)
+    Scatter = scatter_class(len(raw_x), webgl)
+
+    fig = go.Figure()
+    fig.add_trace(Scatter(
+        x=raw_x,
+        y=round_values(raw_y),
+        mode='lines+markers',
+        name='Исходные значения (RuSentiLex)',
+        marker=dict(color='#E4653F', size=4, opacity=0.7),
+        line=dict(color='#f08869')
+    ))
+    fig.add_trace(Scatter(
+        x=savgol_x,
+        y=round_values(savgol_y),
+        mode='lines',
+        name='Сглаженные значения (Савицкий-Голей)',
+        line=dict(color='#E4653F', width=2),
+        visible=False
+    ))
+    fig.add_trace(Scatter(
+        x=lowess_x,
+        y=round_values(lowess_y),
+        mode='lines',
+        name='Сглаженные значения (LOWESS)',
+        line=dict(color='#E4653F', width=2),
+        visible=False
+    ))
+
+    # В режимах сглаживания исходные точки остаются, но без линии и бледнее
+    raw_line = {'mode': ['lines+markers', 'lines', 'lines'], 'marker.opacity': [0.7, 1, 1]}
+    raw_points = {'mode': ['markers', 'lines', 'lines'], 'marker.opacity': [0.4, 1, 1]}
+    fig.update_layout(
+        updatemenus=[
+            dict(
+                active=0,
+                buttons=[
+                    dict(label='Исходные значения RuSentiLex',
+                         method='update',
+                         args=[{'visible': [True, False, False], **raw_line},
+                               {'title': f'{title_prefix} во времени'}]),
+                    dict(label='Сглаживание (Савицкий-Голей)',
+                         method='update',
+                         args=[{'visible': [True, True, False], **raw_points},
+                               {'title': f'{title_prefix} (Савицкий-Голей)'}]),
+                    dict(label='Сглаживание (LOWESS)',
+                         method='update',
+                         args=[{'visible': [True, False, True], **raw_points},
+                               {'title': f'{title_prefix} (LOWESS)'}])
+                ],
+                direction="down",
+                showactive=True,
+                x=0.6,
+                xanchor="left",
+                y=1.15,
+                yanchor="top"
+            )
+        ]
+    )
+    _layout_sentiment_dynamics(fig, title_prefix)
+    apply_compact_layout(fig)
     return fig
 
-def plot_sentiment_calendar(df, date_col='date', sentiment_col='rusentilex_score'):
+def plot_sentiment_calendar(df, date_col='date', sentiment_col='rusentilex_score', compact=False, show=True):
     """
     Визуализация сентимента в виде теплового календаря по годам.
 
     Параметры:
     ----------
-    df : pandas.DataFrame
-        Таблица с датами и сентиментом.
+    df : pandas.DataFrame | TimeAggregates
+        Таблица с датами и сентиментом или дневные суммы TimeAggregates.
     date_col : str
         Название колонки с датой.
     sentiment_col : str
         Название колонки с сентимент-оценками.
+    compact : bool
+        Одна тепловая карта вместо карты на каждый год, без подписей дат во всплывающих
+        подсказках, с округлёнными значениями и облегчённым шаблоном. Матрицы всех годов
+        по-прежнему встраиваются в фигуру (в кнопки меню), поэтому размер уменьшается
+        за счёт подписей, округления и шаблона, а не числа лет.
+    show : bool
+        Показать график сразу; при show=False фигура возвращается.
     """
 
-    df[date_col] = pd.to_datetime(df[date_col])
+    if isinstance(df, TimeAggregates):
+        df = df.sentiment_series('day')
+        date_col, sentiment_col = 'date', 'rusentilex_score'
     sentiment_df = df[[date_col, sentiment_col]].rename(columns={date_col: 'date', sentiment_col: 'sentiment'})
+    sentiment_df['date'] = ensure_datetime(sentiment_df['date'])
 
     # --- Усреднение сентимента по дате ---
     daily_sentiment = sentiment_df.groupby('date')['sentiment'].mean().reset_index()
@@ -171,19 +297,43 @@ def plot_sentiment_calendar(df, date_col='date', sentiment_col='rusentilex_score
 
     fig = go.Figure()
 
-    # --- Тепловая карта по каждому году ---
-    for year in years:
+    def year_matrices(year):
         year_data = daily_sentiment[daily_sentiment['year'] == year]
+        weeks = year_data['week'].values - 1
+        days = year_data['weekday'].values
+        inside = (weeks >= 0) & (weeks < total_weeks)
+
         z = np.full((7, total_weeks), np.nan)
+        z[days[inside], weeks[inside]] = year_data['sentiment'].values[inside]
+        if compact:
+            return z, None
+
         customdata = np.full((7, total_weeks, 2), '', dtype=object)
+        customdata[days[inside], weeks[inside], 0] = year_data['date'].dt.strftime('%Y-%m-%d').values[inside]
+        customdata[days[inside], weeks[inside], 1] = [f"{value:.3f}" for value in year_data['sentiment'].values[inside]]
+        return z, customdata
+
+    def compact_z(z):
+        # NaN в JSON превращается в null — пустая клетка
+        return [[None if np.isnan(value) else value for value in row] for row in round_values(z, 3)]
+
+    if compact:
+        z, _ = year_matrices(years[0])
+        fig.add_trace(go.Heatmap(
+            z=compact_z(z),
+            hovertemplate='Сентимент: %{z:.3f}<extra></extra>',
+            colorscale='RdYlGn',
+            colorbar=dict(title='Сентимент', thickness=40, title_font=dict(size=14)),
+            zmin=-1, zmax=1,
+            showscale=True,
+            x0=0.5, dx=1,
+            y0=0.5, dy=1,
+            xgap=1, ygap=1
+        ))
 
-        for _, row in year_data.iterrows():
-            week = int(row['week']) - 1
-            day = int(row['weekday'])
-            if 0 <= week < total_weeks:
-                z[day, week] = row['sentiment']
-                customdata[day, week, 0] = row['date'].strftime('%Y-%m-%d')
-                customdata[day, week, 1] = f"{row['sentiment']:.3f}"
+    # --- Тепловая карта по каждому году ---
+    for year in ([] if compact else years):
+        z, customdata = year_matrices(year)
 
         fig.add_trace(go.Heatmap(
             z=z,
@@ -230,7 +380,8 @@ def plot_sentiment_calendar(df, date_col='date', sentiment_col='rusentilex_score
                 label=f"{year}",
                 method="update",
                 args=[
-                    {"visible": [y == year for y in years]},
+                    {"z": [compact_z(year_matrices(year)[0])]} if compact
+                    else {"visible": [y == year for y in years]},
                     {"title": f"Календарь сентимента: {year}"}
                 ]
             ) for year in years]
@@ -242,5 +393,10 @@ def plot_sentiment_calendar(df, date_col='date', sentiment_col='rusentilex_score
         paper_bgcolor='white',
         margin=dict(l=20, r=20, b=40, t=40)
     )
+    if compact:
+        apply_compact_layout(fig)
 
-    fig.show()
+    if show:
+        fig.show()
+        return None
+    return fig
@@ -0,0 +1,426 @@
+import os
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import pandas as pd
+from natasha import NewsEmbedding, NewsMorphTagger
+
+from .lemmatizer import LemmatizerNatasha
+from .ling_features import NatashaAnalyzer, analyze_verbs, analyze_pronouns, analyze_interjections, analyze_sentences
+from .sentiment import SOURCES, POLARITIES, SparseSentimentScorer, load_rusentilex_dict, analyze_sentiment
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+def _to_json(value: Any) -> Any:
+    """Приводит множества, Counter и defaultdict к виду, пригодному для JSON."""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _is_text_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(text, str) for text in value)
+
+
+def validate_payload(kind: str, payload: Any) -> None:
+    """
+    Проверяет тело запроса до постановки в очередь: запросы обрабатываются пакетами,
+    и ошибка в одном из них иначе провалила бы запросы других клиентов того же пакета.
+
+    Ожидается: {"texts": [str, ...]}; для sentiment — необязательный "method"
+    ("sparse", "substring" или "surface"); для features — ещё "lemmatized" той же длины.
+    Выбрасывает ValueError с описанием ошибки.
+    """
+    if kind not in ("lemmatize", "sentiment", "features"):
+        raise ValueError(f"Неизвестный тип запроса: {kind}")
+    if not isinstance(payload, dict):
+        raise ValueError("Тело запроса должно быть объектом JSON")
+    if not _is_text_list(payload.get("texts")):
+        raise ValueError("Поле texts должно быть списком строк")
+    if kind == "sentiment" and payload.get("method", "sparse") not in ("sparse", "substring", "surface"):
+        raise ValueError("Поле method должно быть 'sparse', 'substring' или 'surface'")
+    if kind == "features":
+        if not _is_text_list(payload.get("lemmatized")):
+            raise ValueError("Поле lemmatized должно быть списком строк")
+        if len(payload["lemmatized"]) != len(payload["texts"]):
+            raise ValueError("Число текстов и лемматизированных текстов не совпадает")
+
+
+class _Request:
+    def __init__(self, kind: str, payload: Dict[str, Any]):
+        self.kind = kind
+        self.payload = payload
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class AnalysisService:
+    """
+    Модели Natasha и лексикон RuSentiLex, загруженные один раз на процесс,
+    и поток-обработчик, объединяющий одновременные запросы в пакеты.
+
+    Запросы, пришедшие в пределах max_wait_ms друг от друга, обрабатываются пакетом
+    по типам: тексты всех запросов на лемматизацию и на признаки размечаются теггером
+    за один проход (см. LemmatizerNatasha.lemmatize_texts), сентимент методом "sparse"
+    считается одним умножением матриц для всех запросов. Пакеты обрабатываются в одном
+    потоке, поэтому модели не используются из нескольких потоков одновременно.
+
+    Параметры:
+    - lexicon_path: путь к rusentilex_clean.txt
+    - max_batch_size: максимальное число запросов в одном пакете
+    - max_wait_ms: сколько ждать новых запросов, прежде чем обработать пакет
+    """
+
+    def __init__(self, lexicon_path: str, max_batch_size: int = 32, max_wait_ms: float = 10):
+        emb = NewsEmbedding()
+        tagger = NewsMorphTagger(emb)
+        self.lemmatizer = LemmatizerNatasha(emb=emb, tagger=tagger)
+        self.analyzer = NatashaAnalyzer(emb=emb, morph_tagger=tagger)
+        self.lexicon = load_rusentilex_dict(lexicon_path)
+        self.scorer = SparseSentimentScorer(self.lexicon)
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker = threading.Thread(target=self._loop, name="prozhito-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Any:
+        """
+        Ставит запрос в очередь и ждёт результата.
+        Некорректный запрос отклоняется сразу (ValueError, см. validate_payload).
+        """
+        validate_payload(kind, payload)
+        request = _Request(kind, payload)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise RuntimeError(request.error)
+        return request.result
+
+    def _collect_batch(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        handlers = {"lemmatize": self._run_lemmatize, "sentiment": self._run_sentiment, "features": self._run_features}
+        while True:
+            batch = self._collect_batch()
+            by_kind: Dict[str, List[_Request]] = defaultdict(list)
+            for request in batch:
+                by_kind[request.kind].append(request)
+            for kind, requests in by_kind.items():
+                try:
+                    handlers[kind](requests)
+                except Exception as exc:
+                    self._fail(requests, exc)
+                for request in requests:
+                    request.done.set()
+
+    @staticmethod
+    def _fail(requests: List[_Request], error: Exception) -> None:
+        for request in requests:
+            request.error = repr(error)
+            request.result = None
+
+    def _run_lemmatize(self, requests: List[_Request]) -> None:
+        texts = [text for request in requests for text in request.payload["texts"]]
+        lemmas = self.lemmatizer.lemmatize_texts(texts)
+        start = 0
+        for request in requests:
+            size = len(request.payload["texts"])
+            request.result = {"lemmas": lemmas[start:start + size]}
+            start += size
+
+    def _sentiment_response(self, texts: List[str], result: Dict, scores) -> Dict[str, Any]:
+        return {
+            "result": _to_json(result),
+            "total_unique_words": int(sum(len(set(text.split())) for text in texts)),
+            "total_category_words": {
+                source: sum(len(self.lexicon[source][polarity]) for polarity in POLARITIES) for source in SOURCES
+            },
+            "scores": [float(score) for score in scores],
+        }
+
+    def _run_sentiment(self, requests: List[_Request]) -> None:
+        sparse_requests = []
+        for request in requests:
+            method = request.payload.get("method", "sparse")
+            if method == "sparse":
+                sparse_requests.append(request)
+                continue
+            # "substring" и "surface" считаются по запросу
+            try:
+                df = pd.DataFrame({"text": request.payload["texts"]}, dtype=object)
+                result, _, _, df = analyze_sentiment(df, "text", self.lexicon, method=method)
+                request.result = self._sentiment_response(request.payload["texts"], result, df["rusentilex_score"])
+            except Exception as exc:
+                self._fail([request], exc)
+        if not sparse_requests:
+            return
+
+        # Совпадения всех запросов — одной матрицей, затем она делится по запросам
+        matched = self.scorer.match([text for request in sparse_requests for text in request.payload["texts"]])
+        start = 0
+        for request in sparse_requests:
+            texts = request.payload["texts"]
+            counts, words = self.scorer.count_matches(matched[start:start + len(texts)])
+            start += len(texts)
+            totals = dict(zip(self.scorer.columns, counts.sum(axis=0).tolist()))
+            result = {
+                source: {
+                    polarity: {"words": words[(source, polarity)], "count": totals[(source, polarity)]}
+                    for polarity in POLARITIES
+                }
+                for source in SOURCES
+            }
+            _, scores = self.scorer.polarity_scores(counts)
+            request.result = self._sentiment_response(texts, result, scores)
+
+    def _run_features(self, requests: List[_Request]) -> None:
+        orig_texts = [text for request in requests for text in request.payload["texts"]]
+        lemm_texts = [text for request in requests for text in request.payload["lemmatized"]]
+        docs = self.analyzer.process_texts(orig_texts + lemm_texts)
+        orig_docs, lemm_docs = docs[:len(orig_texts)], docs[len(orig_texts):]
+        features = [
+            _to_json({
+                "verbs": analyze_verbs(orig_doc.tokens),
+                "pronouns": analyze_pronouns(lemm_doc.tokens),
+                "interjections": analyze_interjections(lemm_doc.tokens),
+                "sentences": analyze_sentences(lemm_text),
+            })
+            for orig_doc, lemm_doc, lemm_text in zip(orig_docs, lemm_docs, lemm_texts)
+        ]
+        start = 0
+        for request in requests:
+            size = len(request.payload["texts"])
+            request.result = {"features": features[start:start + size]}
+            start += size
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: AnalysisService = None
+
+    def address_string(self):
+        # У Unix-сокета нет адреса клиента
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        kind = self.path.strip("/")
+        if kind not in ("lemmatize", "sentiment", "features"):
+            self._send(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length).decode("utf-8"))
+            validate_payload(kind, payload)
+        except ValueError as exc:
+            # Сюда же попадает некорректный JSON (json.JSONDecodeError — подкласс ValueError)
+            self._send(400, {"error": str(exc)})
+            return
+        try:
+            self._send(200, self.service.submit(kind, payload))
+        except Exception as exc:
+            self._send(500, {"error": str(exc)})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(
+    service: AnalysisService,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None
+):
+    """
+    Создаёт HTTP-сервер (на порту или на Unix-сокете) поверх AnalysisService.
+    """
+    handler = type("AnalysisHandler", (_Handler,), {"service": service})
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return _UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    lexicon_path: str,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+    max_batch_size: int = 32,
+    max_wait_ms: float = 10
+) -> None:
+    """
+    Запускает локальный сервис анализа и обслуживает запросы до прерывания (Ctrl+C).
+    """
+    service = AnalysisService(lexicon_path, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    server = create_server(service, host=host, port=port, socket_path=socket_path)
+    address = socket_path or f"http://{host}:{port}"
+    print(f"Сервис анализа запущен: {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class AnalysisClient:
+    """
+    Тонкий клиент локального сервиса анализа. Методы повторяют
+    lemmatize_column и analyze_sentiment, но модели и лексикон живут на сервере.
+
+    Параметры:
+    - url: адрес сервера, например "http://127.0.0.1:8765"
+    - socket_path: путь к Unix-сокету (вместо url)
+    - batch_size: сколько текстов отправлять в одном запросе
+    - timeout: таймаут запроса в секундах
+    """
+
+    def __init__(
+        self,
+        url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+        socket_path: Optional[str] = None,
+        batch_size: int = 64,
+        timeout: Optional[float] = None
+    ):
+        self.url = urlparse(url)
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.socket_path is not None:
+            return _UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        connection = self._connection()
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json; charset=utf-8"} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read().decode("utf-8"))
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"Ошибка сервиса анализа ({response.status}): {data.get('error')}")
+        return data
+
+    def health(self) -> bool:
+        return self._request("GET", "/health").get("status") == "ok"
+
+    def lemmatize_texts(self, texts: List[str]) -> List[str]:
+        lemmas = []
+        for start in range(0, len(texts), self.batch_size):
+            chunk = texts[start:start + self.batch_size]
+            lemmas.extend(self._request("POST", "/lemmatize", {"texts": chunk})["lemmas"])
+        return lemmas
+
+    def lemmatize_column(self, df: pd.DataFrame, text_column: str = "text", new_column: str = "tokens") -> pd.DataFrame:
+        """
+        То же, что lemmatize_column, но лемматизация выполняется на сервере.
+        """
+        df[new_column] = self.lemmatize_texts(df[text_column].astype(str).tolist())
+        return df
+
+    def analyze_sentiment(
+        self,
+        df: pd.DataFrame,
+        text_column: str,
+        method: str = "sparse"
+    ) -> Tuple[Dict, int, Dict[str, int], pd.DataFrame]:
+        """
+        То же, что analyze_sentiment, но с лексиконом, загруженным на сервере.
+        Тексты отправляются запросами по batch_size; результаты запросов объединяются.
+        """
+        texts = df[text_column].astype(str).tolist()
+        result = defaultdict(lambda: defaultdict(lambda: {"words": set(), "count": 0}))
+        scores: List[float] = []
+        total_unique_words = 0
+        total_category_words: Dict[str, int] = {}
+        # Хотя бы один запрос — чтобы и для пустой таблицы получить размеры категорий лексикона
+        for start in range(0, max(len(texts), 1), self.batch_size):
+            data = self._request("POST", "/sentiment", {"texts": texts[start:start + self.batch_size], "method": method})
+            for source, polarities in data["result"].items():
+                for polarity, values in polarities.items():
+                    result[source][polarity]["words"].update(values["words"])
+                    result[source][polarity]["count"] += values["count"]
+            scores.extend(data["scores"])
+            total_unique_words += data["total_unique_words"]
+            total_category_words = data["total_category_words"]
+        df["rusentilex_score"] = scores
+        return result, total_unique_words, total_category_words, df
+
+    def text_features(self, orig_texts: List[str], lemm_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Лингвистические параметры текстов (как в TextAnalyzer): глаголы, местоимения,
+        междометия и типы предложений — по одному словарю на текст.
+        """
+        features = []
+        for start in range(0, len(orig_texts), self.batch_size):
+            features.extend(self._request("POST", "/features", {
+                "texts": orig_texts[start:start + self.batch_size],
+                "lemmatized": lemm_texts[start:start + self.batch_size],
+            })["features"])
+        return features
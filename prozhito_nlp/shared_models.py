@@ -0,0 +1,253 @@
+import os
+import pickle
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from natasha import NewsEmbedding, NewsMorphTagger
+
+from .lemmatizer import LemmatizerNatasha
+from .ling_features import NatashaAnalyzer
+
+MODELS_FILE = "models.pkl"
+ARRAYS_DIR = "arrays"
+
+# Массивы меньше этого размера остаются внутри pickle: выигрыша от отображения нет
+MIN_SHARED_BYTES = 64 * 1024
+
+# Сколько найденных слов SharedVocab помнит в каждом процессе: рабочий словарь корпуса
+# намного меньше 250 тыс. слов, так что почти все поиски попадают в кэш
+LOOKUP_CACHE_SIZE = 100_000
+
+_ATTACHED: Dict[str, Tuple[NewsEmbedding, NewsMorphTagger]] = {}
+
+
+class _StringTable:
+    """
+    Неизменяемая последовательность строк поверх одного UTF-8 буфера и массива смещений.
+    Оба массива отображаются в память, поэтому таблица не создаёт Python-объектов заранее.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings) -> "_StringTable":
+        encoded = [item.encode("utf-8") for item in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SharedVocab:
+    """
+    Словарь «слово → номер», совместимый с navec.vocab.Vocab и slovnet.vocab.Vocab,
+    но без Python-словаря на 250 тыс. строк в каждом процессе: слова хранятся в _StringTable,
+    а поиск идёт двоичным поиском по отсортированному массиву номеров.
+
+    Двоичный поиск на чистом Python с декодированием строк в ~40 раз медленнее словаря,
+    поэтому результаты поиска запоминаются в каждом процессе (LRU на LOOKUP_CACHE_SIZE слов):
+    кэш растёт только с числом различных слов обработанных текстов.
+    """
+
+    def __init__(self, items, unk_id: Optional[int], pad_id: Optional[int], counts=None):
+        items = list(items)
+        self.table = _StringTable.from_strings(items)
+        self.order = np.array(sorted(range(len(items)), key=items.__getitem__), dtype=np.int32)
+        self.unk_id = unk_id
+        self.pad_id = pad_id
+        self.counts = np.asarray(counts, dtype=np.int64) if counts is not None else None
+        self._reset_cache()
+
+    def _reset_cache(self) -> None:
+        self._cached_lookup = lru_cache(maxsize=LOOKUP_CACHE_SIZE)(self._search)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Кэш у каждого процесса свой и в экспорт моделей не попадает
+        state = self.__dict__.copy()
+        state.pop("_cached_lookup", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset_cache()
+
+    @classmethod
+    def from_vocab(cls, vocab) -> "SharedVocab":
+        items = vocab.items if hasattr(vocab, "items") and not callable(vocab.items) else vocab.words
+        return cls(items, vocab.unk_id, vocab.pad_id, counts=getattr(vocab, "counts", None))
+
+    def lookup(self, word: str) -> Optional[int]:
+        return self._cached_lookup(word)
+
+    def _search(self, word: str) -> Optional[int]:
+        low, high = 0, len(self.order)
+        while low < high:
+            mid = (low + high) // 2
+            if self.table[int(self.order[mid])] < word:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self.order) and self.table[int(self.order[low])] == word:
+            return int(self.order[low])
+        return None
+
+    # Интерфейс slovnet.vocab.Vocab
+    @property
+    def items(self) -> _StringTable:
+        return self.table
+
+    def encode(self, item: str) -> Optional[int]:
+        item_id = self.lookup(item)
+        return self.unk_id if item_id is None else item_id
+
+    def decode(self, id: int) -> str:
+        return self.table[id]
+
+    # Интерфейс navec.vocab.Vocab
+    @property
+    def words(self) -> _StringTable:
+        return self.table
+
+    def __getitem__(self, word: str) -> int:
+        word_id = self.lookup(word)
+        if word_id is None:
+            raise KeyError(word)
+        return word_id
+
+    def __contains__(self, word: str) -> bool:
+        return self.lookup(word) is not None
+
+    def get(self, word: str, default=None):
+        word_id = self.lookup(word)
+        return default if word_id is None else word_id
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def __repr__(self):
+        return f"SharedVocab(items=[{len(self)}])"
+
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Сохраняет крупные numpy-массивы в отдельные .npy-файлы,
+    а в pickle оставляет только ссылки на них.
+    """
+
+    def __init__(self, file, arrays_dir: str):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_dir = arrays_dir
+        self.saved: Dict[int, str] = {}
+
+    def persistent_id(self, obj: Any) -> Optional[Tuple[str, str]]:
+        if not isinstance(obj, np.ndarray) or obj.nbytes < MIN_SHARED_BYTES:
+            return None
+        # Один и тот же массив (например, индексы navec в эмбеддингах и в модели) сохраняется один раз
+        name = self.saved.get(id(obj))
+        if name is None:
+            name = f"{len(self.saved)}.npy"
+            np.save(os.path.join(self.arrays_dir, name), np.ascontiguousarray(obj))
+            self.saved[id(obj)] = name
+        return ("array", name)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    """
+    Подставляет вместо ссылок массивы, отображённые в память только для чтения.
+    """
+
+    def __init__(self, file, arrays_dir: str):
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+        self.loaded: Dict[str, np.ndarray] = {}
+
+    def persistent_load(self, pid: Tuple[str, str]) -> np.ndarray:
+        kind, name = pid
+        if kind != "array":
+            raise pickle.UnpicklingError(f"Неизвестная ссылка: {pid}")
+        if name not in self.loaded:
+            self.loaded[name] = np.load(os.path.join(self.arrays_dir, name), mmap_mode="r")
+        return self.loaded[name]
+
+
+def export_shared_models(path: str, overwrite: bool = False) -> str:
+    """
+    Сохраняет эмбеддинги NewsEmbedding и веса NewsMorphTagger в папку path:
+    числовые таблицы и словари слов (см. SharedVocab) — отдельными .npy-файлами,
+    остальное (небольшие словари тегов, конфигурация) — в pickle.
+
+    Параметры:
+    - path: папка для файлов моделей
+    - overwrite: перезаписать уже существующий экспорт
+
+    Возвращает:
+    - path
+    """
+    models_path = os.path.join(path, MODELS_FILE)
+    if os.path.exists(models_path) and not overwrite:
+        return path
+
+    arrays_dir = os.path.join(path, ARRAYS_DIR)
+    os.makedirs(arrays_dir, exist_ok=True)
+
+    emb = NewsEmbedding()
+    tagger = NewsMorphTagger(emb)
+
+    # Словари на 250 тыс. слов заменяются таблицами, которые тоже можно отобразить в память
+    emb.vocab = SharedVocab.from_vocab(emb.vocab)
+    tagger.infer.encoder.words_vocab = SharedVocab.from_vocab(tagger.infer.encoder.words_vocab)
+
+    tmp_path = models_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        _ArrayPickler(f, arrays_dir).dump((emb, tagger))
+    os.replace(tmp_path, models_path)
+    return path
+
+
+def attach_shared_models(path: str) -> Tuple[NewsEmbedding, NewsMorphTagger]:
+    """
+    Подключает модели, сохранённые export_shared_models.
+
+    Числовые таблицы отображаются в память (np.load(mmap_mode="r")): страницы файла
+    лежат в общем кэше ОС, поэтому все процессы, подключившие одну и ту же папку,
+    используют одну физическую копию весов. В пределах процесса модели подключаются один раз.
+
+    Возвращает:
+    - (emb, tagger) — их можно передать в LemmatizerNatasha и NatashaAnalyzer
+    """
+    path = os.path.abspath(path)
+    if path not in _ATTACHED:
+        with open(os.path.join(path, MODELS_FILE), "rb") as f:
+            _ATTACHED[path] = _ArrayUnpickler(f, os.path.join(path, ARRAYS_DIR)).load()
+    return _ATTACHED[path]
+
+
+def load_shared_lemmatizer(path: str) -> LemmatizerNatasha:
+    """
+    Создаёт LemmatizerNatasha поверх общих весов из папки path.
+    """
+    emb, tagger = attach_shared_models(path)
+    return LemmatizerNatasha(emb=emb, tagger=tagger)
+
+
+def load_shared_analyzer(path: str) -> NatashaAnalyzer:
+    """
+    Создаёт NatashaAnalyzer поверх общих весов из папки path.
+    """
+    emb, tagger = attach_shared_models(path)
+    return NatashaAnalyzer(emb=emb, morph_tagger=tagger)
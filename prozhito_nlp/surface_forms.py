@@ -0,0 +1,332 @@
+import os
+import re
+import time
+import pickle
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .resources import DATA_DIR, RUSENTILEX_FILE
+from .sentiment import SOURCES, POLARITIES, SparseSentimentScorer, analyze_sentiment, load_rusentilex_dict
+from .dict_match import COMPOUND_PATTERNS, load_custom_dictionaries, find_dictionary_matches
+
+# Увеличивается при изменении правил построения таблицы словоформ
+SURFACE_FORMS_VERSION = 1
+
+# Папка для собранных таблиц словоформ (как у пакета ресурсов вне data)
+SURFACE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "prozhito_nlp")
+
+# Слово (в том числе через дефис) в очищенном тексте
+WORD_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+AMBIGUITY_MODES = ("top", "all")
+
+# Таблицы, уже загруженные в этом процессе: ключ → таблица
+_REGISTRY: Dict[str, "SurfaceForms"] = {}
+
+
+def tokenize_surface(text: str) -> List[str]:
+    """Слова очищенного текста в нижнем регистре (пунктуация отбрасывается)."""
+    return WORD_PATTERN.findall(text.lower())
+
+
+class SurfaceForms:
+    """
+    Таблица «словоформа → леммы» для заданного набора лемм (словаря лексикона).
+
+    Таблица строится заранее: каждая лемма раскрывается во все формы своей парадигмы
+    (pymorphy2 через MorphVocab из natasha), после чего каждая форма разбирается
+    обратно — так учитываются омонимы, не входящие в словарь. При ambiguity="top"
+    форма относится к лемме, только если это нормальная форма самого вероятного разбора
+    (как у лемматизатора без контекста); при ambiguity="all" — любого разбора.
+    Формы с «ё» дублируются с «е», потому что в текстах «ё» часто не пишется.
+    """
+
+    def __init__(self, forms: Dict[str, Tuple[str, ...]], vocabulary: Iterable[str], ambiguity: str):
+        self.forms = forms
+        self.vocabulary = frozenset(vocabulary)
+        self.ambiguity = ambiguity
+        self._digest: Optional[str] = None
+
+    @classmethod
+    def build(cls, vocabulary: Iterable[str], ambiguity: str = "top", morph=None) -> "SurfaceForms":
+        if ambiguity not in AMBIGUITY_MODES:
+            raise ValueError(f"Неизвестный режим: {ambiguity}. Допустимые значения: {', '.join(AMBIGUITY_MODES)}")
+        if morph is None:
+            from natasha import MorphVocab
+            morph = MorphVocab()
+        vocabulary = set(vocabulary)
+
+        surface = set(vocabulary)
+        for lemma in vocabulary:
+            for parse in morph.parse(lemma):
+                if parse.normal_form == lemma:
+                    surface.update(form.word for form in parse.lexeme)
+        surface.update([word.replace("ё", "е") for word in surface if "ё" in word])
+
+        forms: Dict[str, Set[str]] = defaultdict(set)
+        for word in surface:
+            parses = morph.parse(word)
+            if ambiguity == "top":
+                parses = parses[:1]
+            forms[word].update(parse.normal_form for parse in parses if parse.normal_form in vocabulary)
+            # Слово словаря, которое pymorphy2 не знает (или разбирает иначе), сопоставляется само с собой
+            if word in vocabulary and not forms[word]:
+                forms[word].add(word)
+        return cls({word: tuple(sorted(lemmas)) for word, lemmas in forms.items() if lemmas}, vocabulary, ambiguity)
+
+    def candidates(self, token: str) -> Tuple[str, ...]:
+        """Леммы словаря, которым может соответствовать словоформа (пусто, если ни одной)."""
+        return self.forms.get(token, ())
+
+    def lemma_set(self, text: str) -> Set[str]:
+        """
+        Множество «лемм» текста: для словоформ из таблицы — их леммы словаря, остальные слова — как есть.
+        """
+        words = set()
+        for token in tokenize_surface(text):
+            words.update(self.forms.get(token) or (token,))
+        return words
+
+    def digest(self) -> str:
+        """
+        Хеш содержимого таблицы (версия, режим и все пары «форма → леммы»). В отличие от ключа
+        get_surface_forms, учитывает и сами разборы, поэтому меняется при обновлении словарей pymorphy2.
+        """
+        if self._digest is None:
+            digest = hashlib.sha256(f"{SURFACE_FORMS_VERSION}\n{self.ambiguity}".encode("utf-8"))
+            for word in sorted(self.forms):
+                digest.update(("\n" + word + "\t" + " ".join(self.forms[word])).encode("utf-8"))
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def save(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {"version": SURFACE_FORMS_VERSION, "ambiguity": self.ambiguity,
+                 "vocabulary": sorted(self.vocabulary), "forms": self.forms},
+                f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SurfaceForms":
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != SURFACE_FORMS_VERSION:
+            raise ValueError("Таблица словоформ собрана другой версией")
+        return cls(data["forms"], data["vocabulary"], data["ambiguity"])
+
+
+def lexicon_vocabulary(
+    lexicon: Optional[Dict[str, Dict[str, Iterable[str]]]] = None,
+    phrase_dicts: Optional[Dict[str, Iterable[str]]] = None
+) -> Set[str]:
+    """
+    Все леммы, которые нужно уметь находить по словоформам: токены фраз RuSentiLex,
+    слова словарей name_lemm.txt и постоянные слова паттернов составных фразеологизмов.
+    """
+    vocabulary: Set[str] = set()
+    for polarities in (lexicon or {}).values():
+        for phrases in polarities.values():
+            for phrase in phrases:
+                vocabulary.update(phrase.split())
+    for category, entries in (phrase_dicts or {}).items():
+        if category == 'phraseologisms_compound':
+            continue
+        for entry in entries:
+            vocabulary.update(entry.split())
+    if phrase_dicts and 'phraseologisms_compound' in phrase_dicts:
+        for pattern in COMPOUND_PATTERNS:
+            vocabulary.update(word for word in pattern.split() if re.fullmatch(r"\w+", word))
+    return vocabulary
+
+
+def get_surface_forms(
+    vocabulary: Iterable[str],
+    ambiguity: str = "top",
+    cache_dir: Optional[str] = SURFACE_CACHE_DIR
+) -> SurfaceForms:
+    """
+    Таблица словоформ для набора лемм. Собирается один раз (десятки секунд для RuSentiLex
+    со всеми словарями) и сохраняется в cache_dir; в процессе открытая таблица запоминается.
+    Ключ таблицы — хеш набора лемм, режима и версии, поэтому изменение словарей приводит к пересборке.
+
+    Параметры:
+    - vocabulary: леммы (см. lexicon_vocabulary)
+    - ambiguity: "top" или "all" (см. SurfaceForms)
+    - cache_dir: папка для собранных таблиц (None — не сохранять на диск)
+    """
+    vocabulary = sorted(set(vocabulary))
+    digest = hashlib.sha256("\n".join([str(SURFACE_FORMS_VERSION), ambiguity, *vocabulary]).encode("utf-8"))
+    key = digest.hexdigest()[:16]
+    if key in _REGISTRY:
+        return _REGISTRY[key]
+
+    path = os.path.join(cache_dir, f"surface_forms-{key}.pkl") if cache_dir is not None else None
+    forms = None
+    if path is not None and os.path.exists(path):
+        try:
+            forms = SurfaceForms.load(path)
+        except (ValueError, pickle.UnpicklingError, EOFError, KeyError):
+            forms = None
+    if forms is None:
+        forms = SurfaceForms.build(vocabulary, ambiguity=ambiguity)
+        if path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            forms.save(path)
+
+    _REGISTRY[key] = forms
+    return forms
+
+
+def clear_surface_registry() -> None:
+    """Забывает таблицы словоформ, открытые в этом процессе."""
+    _REGISTRY.clear()
+
+
+class SurfaceSentimentScorer(SparseSentimentScorer):
+    """
+    SparseSentimentScorer для очищенного, но не лемматизированного текста.
+    Каждое слово заменяется леммой: словоформы из таблицы SurfaceForms — леммой словаря
+    прямо из таблицы (при ambiguity="all" из нескольких кандидатов берётся первый по алфавиту),
+    и только слова, которых в таблице нет, разбираются pymorphy2 (нормальная форма самого
+    вероятного разбора, без контекста; разбор каждого различного слова запоминается) —
+    они нужны, потому что фразы лексикона ищутся как подстроки. По полученному тексту
+    совпадения считаются так же, как у analyze_sentiment(method="substring").
+
+    Это приближение: без контекста омонимы разбираются иначе, чем у лемматизатора Natasha.
+    На author_394 (203 записи) по сравнению с analyze_sentiment по леммам: корреляция оценок
+    записей 0,966, средняя оценка -0,409 против -0,405, совпадения по полярностям —
+    до 2,8% расхождения, по словарям (surface_tolerance_report) — до 13% (domestic).
+    """
+
+    def __init__(self, lexicon: Dict[str, Dict[str, Set[str]]], forms: Optional[SurfaceForms] = None, morph=None):
+        super().__init__(lexicon)
+        self.forms = forms if forms is not None else get_surface_forms(lexicon_vocabulary(lexicon))
+        if morph is None:
+            from natasha import MorphVocab
+            morph = MorphVocab()
+        self.morph = morph
+        self._lemmas: Dict[str, str] = {}
+
+    def lemma(self, token: str) -> str:
+        """Лемма слова очищенного текста (в нижнем регистре)."""
+        candidates = self.forms.candidates(token)
+        if candidates:
+            return candidates[0]
+        lemma = self._lemmas.get(token)
+        if lemma is None:
+            parses = self.morph.parse(token)
+            lemma = parses[0].normal_form if parses else token
+            self._lemmas[token] = lemma
+        return lemma
+
+    def _prepare(self, texts: Iterable[str]) -> List[str]:
+        return [' '.join(self.lemma(token) for token in tokenize_surface(text)) for text in texts]
+
+
+def analyze_sentiment_surface(
+    df: pd.DataFrame,
+    text_column: str,
+    lexicon: Dict[str, Dict[str, Set[str]]],
+    forms: Optional[SurfaceForms] = None
+):
+    """
+    Сентимент-анализ очищенного текста без лемматизации: то же, что
+    analyze_sentiment по лемматизированной колонке, но леммы находятся по таблице
+    словоформ и разбору слов без контекста (см. SurfaceSentimentScorer, там же — величина
+    расхождения с подсчётом по леммам).
+
+    Возвращает то же, что analyze_sentiment; общее число уникальных слов считается по словоформам.
+    """
+    scorer = SurfaceSentimentScorer(lexicon, forms)
+    counts, words = scorer.score(df[text_column])
+
+    result = defaultdict(lambda: defaultdict(lambda: {'words': set(), 'count': 0}))
+    for col, (source, polarity) in enumerate(scorer.columns):
+        result[source][polarity]['words'] = words[(source, polarity)]
+        result[source][polarity]['count'] = int(counts[:, col].sum())
+
+    total_unique_words = sum(df[text_column].apply(lambda x: len(set(x.split()))))
+    total_category_words = {
+        source: sum(len(lexicon[source][pol]) for pol in POLARITIES)
+        for source in SOURCES
+    }
+    _, scores = scorer.polarity_scores(counts)
+    df['rusentilex_score'] = scores
+    return result, total_unique_words, total_category_words, df
+
+
+def find_dictionary_matches_surface(text: str, phrase_dicts: Dict[str, set], forms: SurfaceForms) -> Dict[str, list]:
+    """
+    find_dictionary_matches для очищенного текста: словоформы заменяются леммами по таблице.
+    """
+    return find_dictionary_matches(' '.join(forms.lemma_set(text)), phrase_dicts)
+
+
+def surface_tolerance_report(
+    df: pd.DataFrame,
+    text_column: str = "text",
+    lemma_column: str = "tokens",
+    data_dir: str = DATA_DIR,
+    dict_names: Optional[List[str]] = None,
+    ambiguity: str = "top",
+    lemmatize_seconds: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Сравнивает подсчёт по словоформам с подсчётом по леммам на одних и тех же записях:
+    сентимент — с analyze_sentiment по умолчанию (поиск подстрок), словари — с find_dictionary_matches.
+
+    Параметры:
+    - df: записи с очищенным текстом (text_column) и леммами (lemma_column)
+    - lemmatize_seconds: сколько заняла лемматизация df (если известно) — добавляется
+      к времени пути по леммам в строке timing
+
+    Возвращает:
+    - pd.DataFrame с индексом метрик и колонками lemma, surface, abs_error, rel_error:
+      оценка сентимента (средняя и корреляция по записям), совпадения по полярностям
+      и по словарям, время подсчёта, с
+    """
+    from .pipeline import DEFAULT_DICT_NAMES
+
+    lexicon = load_rusentilex_dict(os.path.join(data_dir, RUSENTILEX_FILE))
+    phrase_dicts = load_custom_dictionaries(data_dir, list(dict_names or DEFAULT_DICT_NAMES))
+    forms = get_surface_forms(lexicon_vocabulary(lexicon, phrase_dicts), ambiguity=ambiguity)
+
+    timings = {}
+    start = time.perf_counter()
+    lemma_result, _, _, lemma_df = analyze_sentiment(df[[lemma_column]].copy(), lemma_column, lexicon)
+    lemma_dicts = [find_dictionary_matches(text, phrase_dicts) for text in df[lemma_column]]
+    timings["lemma"] = time.perf_counter() - start + (lemmatize_seconds or 0.0)
+
+    start = time.perf_counter()
+    surface_result, _, _, surface_df = analyze_sentiment_surface(df[[text_column]].copy(), text_column, lexicon, forms)
+    surface_dicts = [find_dictionary_matches_surface(text, phrase_dicts, forms) for text in df[text_column]]
+    timings["surface"] = time.perf_counter() - start
+
+    lemma_scores = lemma_df['rusentilex_score'].to_numpy()
+    surface_scores = surface_df['rusentilex_score'].to_numpy()
+    rows = {
+        "mean_rusentilex_score": (lemma_scores.mean(), surface_scores.mean()),
+        "score_correlation": (1.0, float(np.corrcoef(lemma_scores, surface_scores)[0, 1])),
+    }
+    for polarity in POLARITIES:
+        rows[f"sentiment_{polarity}"] = tuple(
+            sum(result[source][polarity]['count'] for source in SOURCES) for result in (lemma_result, surface_result)
+        )
+    for category in phrase_dicts:
+        rows[f"dict_{category}"] = (
+            sum(len(matches[category]) for matches in lemma_dicts),
+            sum(len(matches[category]) for matches in surface_dicts),
+        )
+    rows["timing, с"] = (timings["lemma"], timings["surface"])
+
+    report = pd.DataFrame.from_dict(rows, orient="index", columns=["lemma", "surface"]).astype(float)
+    report["abs_error"] = (report["surface"] - report["lemma"]).abs()
+    report["rel_error"] = report["abs_error"] / report["lemma"].abs().where(report["lemma"] != 0)
+    return report
@@ -1,13 +1,18 @@
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from .resources import load_stop_words
+from .hashed_tfidf import compute_tfidf_by_year_hashed, N_FEATURES
+
 def compute_tfidf_by_year(
     df,
     text_column,
     year_column,
     stop_words_path,
     top_n=20,
-    display_year=None
+    display_year=None,
+    method="exact",
+    n_features=N_FEATURES
 ):
     """
     Вычисляет TF-IDF для токенизированных текстов по годам.
@@ -19,13 +24,26 @@ def compute_tfidf_by_year(
     - stop_words_path: путь к файлу со стоп-словами
     - top_n: сколько слов сохранять на каждый год
     - display_year: если указан, выводит топ-слова только за этот год
+    - method: "exact" — TfidfVectorizer со словарём по каждому году;
+      "hashed" — хеширование признаков кусками (см. HashedTfidfAggregator): память не зависит
+      от объёма корпуса, оценки отличаются от точных только из-за коллизий хешей
+    - n_features: число хеш-признаков для method="hashed"
     """
+    if method not in ("exact", "hashed"):
+        raise ValueError(f"Неизвестный метод: {method}. Допустимые значения: 'exact', 'hashed'")
+
+    stop_words = load_stop_words(stop_words_path)
 
-    with open(stop_words_path, 'r', encoding='utf-8') as file:
-        stop_words = file.read().split()
+    if method == "hashed":
+        result_df = compute_tfidf_by_year_hashed(
+            df, text_column, year_column, stop_words=stop_words, top_n=top_n, n_features=n_features
+        )
+        if display_year is not None:
+            display_tfidf_year(result_df, display_year)
+        return result_df
 
-    years = df[year_column].unique()
-    years.sort()
+    # Записи без года не входят ни в один год
+    years = sorted(df[year_column].dropna().unique())
 
     result_df = pd.DataFrame(columns=['TF-IDF', 'word', 'year'])
 
@@ -50,13 +68,20 @@ def compute_tfidf_by_year(
 
     # Отображаем результат по указанному году
     if display_year is not None:
-        display_df = result_df[result_df['year'] == display_year]
-        display_df = display_df.sort_values('TF-IDF', ascending=False).reset_index(drop=True)
-
-        try:
-            from IPython.display import display
-            display(display_df)
-        except ImportError:
-            print(display_df)
+        display_tfidf_year(result_df, display_year)
 
     return result_df
+
+
+def display_tfidf_year(result_df, display_year):
+    """
+    Выводит топ-слова за один год из результата compute_tfidf_by_year.
+    """
+    display_df = result_df[result_df['year'] == display_year]
+    display_df = display_df.sort_values('TF-IDF', ascending=False).reset_index(drop=True)
+
+    try:
+        from IPython.display import display
+        display(display_df)
+    except ImportError:
+        print(display_df)
@@ -1,5 +1,8 @@
 import plotly.graph_objects as go
 
+from .rollups import TimeAggregates
+from .viz_utils import round_values, apply_compact_layout
+
 def plot_tfidf_by_year(
     tfidf_df,
     year_column='year',
@@ -7,36 +10,71 @@ def plot_tfidf_by_year(
     value_column='TF-IDF',
     top_n=20,
     bar_color='#E4653F',
-    title="Топ-слова по годам"
+    title="Топ-слова по годам",
+    compact=False,
+    show=True
 ):
     """
     Визуализирует топ-N слов по TF-IDF для каждого года с помощью Plotly.
 
     Аргументы:
     - tfidf_df: DataFrame с колонками для слов, значений TF-IDF и годов
+      или дневные суммы TimeAggregates (TF-IDF по годам считается из них — так же, как compute_tfidf_by_year)
     - year_column: имя колонки с годами
     - word_column: имя колонки со словами
     - value_column: имя колонки со значениями TF-IDF
     - top_n: количество топ-слов для отображения
     - bar_color: цвет столбцов
     - title: заголовок графика
+    - compact: одна трасса вместо трассы на каждый год, округлённые значения и облегчённый
+      шаблон. Данные всех годов по-прежнему встраиваются в фигуру (в кнопки меню), так что
+      экономятся только описания трасс, лишние знаки и шаблон
+    - show: показать график сразу (как раньше); при show=False фигура возвращается
+
+    Возвращает:
+    - go.Figure, если show=False
     """
 
+    if isinstance(tfidf_df, TimeAggregates):
+        tfidf_df = tfidf_df.tfidf(year_column, top_n=top_n)
+        word_column, value_column = 'word', 'TF-IDF'
+
     fig = go.Figure()
     unique_years = sorted(tfidf_df[year_column].unique())
+    top_by_year = {
+        year: tfidf_df[tfidf_df[year_column] == year].nlargest(top_n, value_column)
+        for year in unique_years
+    }
 
-    for i, year in enumerate(unique_years):
-        data_for_year = tfidf_df[tfidf_df[year_column] == year]
-        data_for_year_top = data_for_year.nlargest(top_n, value_column)
+    if compact:
+        fig.add_trace(go.Bar(orientation='h', marker_color=bar_color))
+        if unique_years:
+            first = top_by_year[unique_years[0]]
+            fig.update_traces(x=round_values(first[value_column]), y=first[word_column].tolist())
+    else:
+        for i, year in enumerate(unique_years):
+            data_for_year_top = top_by_year[year]
 
-        fig.add_trace(go.Bar(
-            x=data_for_year_top[value_column],
-            y=data_for_year_top[word_column],
-            name=str(year),
-            orientation='h',
-            marker_color=bar_color,
-            visible=(i == 0)  # видим только первый год
-        ))
+            fig.add_trace(go.Bar(
+                x=data_for_year_top[value_column],
+                y=data_for_year_top[word_column],
+                name=str(year),
+                orientation='h',
+                marker_color=bar_color,
+                visible=(i == 0)  # видим только первый год
+            ))
+
+    def year_args(year):
+        if compact:
+            data = top_by_year[year]
+            return [
+                {"x": [round_values(data[value_column]).tolist()], "y": [data[word_column].tolist()]},
+                {"title": f"{title} — {year}"}
+            ]
+        return [
+            {"visible": [year == yr for yr in unique_years]},
+            {"title": f"{title} — {year}"}
+        ]
 
     # Добавляем dropdown меню
     fig.update_layout(
@@ -55,15 +93,17 @@ def plot_tfidf_by_year(
                 dict(
                     label=str(year),
                     method="update",
-                    args=[
-                        {"visible": [year == yr for yr in unique_years]},
-                        {"title": f"{title} — {year}"}
-                    ]
+                    args=year_args(year)
                 ) for year in unique_years
             ]
         )],
         height=800,
         bargap=0.2
     )
+    if compact:
+        apply_compact_layout(fig)
 
-    fig.show()
+    if show:
+        fig.show()
+        return None
+    return fig
@@ -0,0 +1,309 @@
+import json
+import os
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from natasha import Doc
+
+from .ling_features import NatashaAnalyzer, calc_percentage
+
+# Коды признаков; 0 — признак не указан, последний код — любое другое значение
+POS_TAGS = (
+    None, "ADJ", "ADP", "ADV", "AUX", "CCONJ", "DET", "INTJ", "NOUN", "NUM",
+    "PART", "PRON", "PROPN", "PUNCT", "SCONJ", "SYM", "VERB", "X", "OTHER"
+)
+ASPECTS = (None, "Perf", "Imp", "OTHER")
+TENSES = (None, "Past", "Pres", "Fut", "OTHER")
+VERB_FORMS = (None, "Inf", "Fin", "Part", "Conv", "OTHER")
+PERSONS = (None, "1", "2", "3", "OTHER")
+
+CODE_COLUMNS = {"pos": POS_TAGS, "aspect": ASPECTS, "tense": TENSES, "verb_form": VERB_FORMS, "person": PERSONS}
+FEATS_KEYS = {"aspect": "Aspect", "tense": "Tense", "verb_form": "VerbForm", "person": "Person"}
+ARRAYS = ("word_ids", "lemma_ids", "has_feats", "note_offsets") + tuple(CODE_COLUMNS)
+META_FILE = "token_store.json"
+
+
+def _codes(values: Sequence[Optional[str]]) -> Dict[Optional[str], int]:
+    return {value: code for code, value in enumerate(values)}
+
+
+def _code_of(value: Any, table: Sequence[Optional[str]]) -> int:
+    return table.index(value) if value in table else len(table) - 1
+
+
+class TokenStore:
+    """
+    Колоночное хранилище морфологической разметки: вместо объектов Token из Natasha —
+    плоские массивы NumPy по всем токенам корпуса подряд.
+
+    - word_ids, lemma_ids: номера словоформы и леммы в словаре words (-1 — леммы нет)
+    - pos, aspect, tense, verb_form, person: коды признаков (таблицы POS_TAGS, ASPECTS, ...)
+    - has_feats: были ли у токена морфологические признаки
+    - note_offsets: границы записей — токены i-й записи лежат в [note_offsets[i], note_offsets[i+1])
+
+    Хранилище сохраняется в папку (по файлу .npy на массив) и загружается через mmap,
+    поэтому подсчёты по миллионам токенов не требуют чтения всего корпуса в память.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], words: List[str], note_ids: List[Any]):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.words = words
+        self.note_ids = note_ids
+
+    def __len__(self) -> int:
+        return len(self.word_ids)
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Doc], note_ids: Optional[Sequence[Any]] = None) -> "TokenStore":
+        """
+        Собирает хранилище из размеченных документов Natasha (после tag_morph).
+        Леммы берутся из token.lemma: без token.lemmatize(morph_vocab) lemma_ids будут -1.
+        """
+        vocabulary: Dict[str, int] = {}
+        columns: Dict[str, List[int]] = {name: [] for name in ("word_ids", "lemma_ids", "has_feats") + tuple(CODE_COLUMNS)}
+        lookups = {name: _codes(table) for name, table in CODE_COLUMNS.items()}
+        offsets = [0]
+
+        def encode(column: str, value: Any) -> int:
+            code = lookups[column].get(value)
+            return code if code is not None else len(CODE_COLUMNS[column]) - 1
+
+        for doc in docs:
+            for token in doc.tokens:
+                feats = token.feats if isinstance(token.feats, dict) else {}
+                columns["word_ids"].append(vocabulary.setdefault(token.text, len(vocabulary)))
+                lemma = getattr(token, "lemma", None)
+                columns["lemma_ids"].append(vocabulary.setdefault(lemma, len(vocabulary)) if lemma else -1)
+                columns["has_feats"].append(bool(token.feats))
+                columns["pos"].append(encode("pos", token.pos))
+                for column, key in FEATS_KEYS.items():
+                    columns[column].append(encode(column, feats.get(key)))
+            offsets.append(len(columns["word_ids"]))
+
+        arrays = {
+            "word_ids": np.array(columns["word_ids"], dtype=np.int32),
+            "lemma_ids": np.array(columns["lemma_ids"], dtype=np.int32),
+            "has_feats": np.array(columns["has_feats"], dtype=bool),
+            "note_offsets": np.array(offsets, dtype=np.int64),
+        }
+        for column in CODE_COLUMNS:
+            arrays[column] = np.array(columns[column], dtype=np.uint8)
+
+        n_notes = len(offsets) - 1
+        note_ids = list(note_ids) if note_ids is not None else list(range(n_notes))
+        if len(note_ids) != n_notes:
+            raise ValueError(f"Число ID записей ({len(note_ids)}) не совпадает с числом документов ({n_notes})")
+        return cls(arrays, list(vocabulary), note_ids)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: Iterable[str],
+        analyzer: Optional[NatashaAnalyzer] = None,
+        note_ids: Optional[Sequence[Any]] = None,
+        batch_size: int = 64
+    ) -> "TokenStore":
+        """
+        Размечает и лемматизирует тексты и сохраняет разметку в хранилище.
+        Тексты размечаются пакетами по batch_size (NatashaAnalyzer.process_texts),
+        так что в памяти одновременно только документы одного пакета.
+        """
+        analyzer = analyzer or NatashaAnalyzer()
+
+        def docs():
+            texts_iter = iter(texts)
+            while True:
+                batch = list(islice(texts_iter, batch_size))
+                if not batch:
+                    return
+                for doc in analyzer.process_texts(batch):
+                    for token in doc.tokens:
+                        token.lemmatize(analyzer.morph_vocab)
+                    yield doc
+
+        return cls.from_docs(docs(), note_ids=note_ids)
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        text_column: str = "text",
+        id_column: str = "id",
+        analyzer: Optional[NatashaAnalyzer] = None
+    ) -> "TokenStore":
+        """
+        Хранилище для колонки DataFrame: text — для анализа глаголов (как в TextAnalyzer),
+        tokens — для местоимений и междометий.
+        """
+        note_ids = df[id_column].tolist() if id_column in df else df.index.tolist()
+        return cls.from_texts(df[text_column].fillna("").astype(str), analyzer=analyzer, note_ids=note_ids)
+
+    # --- Доступ к данным ---
+
+    @property
+    def note_index(self) -> np.ndarray:
+        """Номер записи для каждого токена."""
+        return np.repeat(np.arange(len(self.note_ids)), np.diff(self.note_offsets))
+
+    def note_mask(self, notes: Optional[Iterable[Any]] = None) -> np.ndarray:
+        """Маска токенов, принадлежащих записям с указанными ID (None — все записи)."""
+        if notes is None:
+            return np.ones(len(self), dtype=bool)
+        wanted = set(notes)
+        selected = np.array([note_id in wanted for note_id in self.note_ids], dtype=bool)
+        return np.repeat(selected, np.diff(self.note_offsets))
+
+    def code(self, column: str, value: Optional[str]) -> int:
+        """Код значения признака (например, code("pos", "VERB"))."""
+        return _code_of(value, CODE_COLUMNS[column])
+
+    def decode(self, ids: np.ndarray) -> List[str]:
+        """Словоформы по их номерам."""
+        return [self.words[i] for i in ids]
+
+    # --- Сохранение ---
+
+    def save(self, path: str) -> None:
+        """Сохраняет хранилище в папку path: массивы в .npy, словарь и ID записей в JSON."""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"words": self.words, "note_ids": self.note_ids}, f, ensure_ascii=False, default=str)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "TokenStore":
+        """Загружает хранилище, сохранённое save(); при mmap=True массивы отображаются в память."""
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in ARRAYS
+        }
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(arrays, meta["words"], meta["note_ids"])
+
+
+# --- Векторизованные аналоги функций из ling_features ---
+
+_TENSE_NAMES = ("прошедшее", "настоящее", "будущее", "инфинитив", "не указано")
+_PERSON_NAMES = ("1-е лицо", "2-е лицо", "3-е лицо")
+
+
+def _verb_categories(store: TokenStore, mask: np.ndarray):
+    """
+    Маска глаголов с видом (как в analyze_verbs), их вид (0 — совершенный, 1 — несовершенный)
+    и время (номер в _TENSE_NAMES).
+    """
+    aspect = np.asarray(store.aspect)
+    verbs = (
+        mask & np.asarray(store.has_feats) & (np.asarray(store.pos) == store.code("pos", "VERB"))
+        & ((aspect == store.code("aspect", "Perf")) | (aspect == store.code("aspect", "Imp")))
+    )
+    aspects = (aspect[verbs] == store.code("aspect", "Imp")).astype(np.int64)
+
+    tense = np.asarray(store.tense)[verbs]
+    verb_form = np.asarray(store.verb_form)[verbs]
+    tenses = np.full(len(tense), 4, dtype=np.int64)
+    tenses[verb_form == store.code("verb_form", "Inf")] = 3
+    for i, value in enumerate(("Past", "Pres", "Fut")):
+        tenses[tense == store.code("tense", value)] = i
+    return verbs, aspects, tenses
+
+
+def analyze_verbs_columnar(store: TokenStore, notes: Optional[Iterable[Any]] = None) -> Dict[str, Any]:
+    """
+    То же, что analyze_verbs, но по колоночному хранилищу.
+
+    Параметры:
+    - store: TokenStore (для TextAnalyzer — по исходному тексту)
+    - notes: ID записей (None — все записи хранилища)
+    """
+    verbs, aspects, tenses = _verb_categories(store, store.note_mask(notes))
+    word_ids = np.asarray(store.word_ids)[verbs]
+
+    aspect_counts = np.bincount(aspects, minlength=2)
+    tense_counts = np.bincount(tenses, minlength=len(_TENSE_NAMES))
+    aspect_names = ("совершенный", "несовершенный")
+    return {
+        "total_verbs": int(aspect_counts.sum()),
+        "tenses": Counter({name: int(tense_counts[i]) for i, name in enumerate(_TENSE_NAMES)}),
+        "aspects": Counter({name: int(aspect_counts[i]) for i, name in enumerate(aspect_names)}),
+        "verbs_by_aspect": {
+            name: set(store.decode(np.unique(word_ids[aspects == i]))) for i, name in enumerate(aspect_names)
+        },
+        "verbs_by_tense": {
+            name: set(store.decode(np.unique(word_ids[tenses == i]))) for i, name in enumerate(_TENSE_NAMES)
+        },
+    }
+
+
+def _pronoun_mask(store: TokenStore, mask: np.ndarray) -> np.ndarray:
+    return mask & np.asarray(store.has_feats) & (np.asarray(store.pos) == store.code("pos", "PRON"))
+
+
+def analyze_pronouns_columnar(store: TokenStore, notes: Optional[Iterable[Any]] = None) -> Dict[str, Any]:
+    """
+    То же, что analyze_pronouns, но по колоночному хранилищу (для TextAnalyzer — по леммам).
+    """
+    pronouns = _pronoun_mask(store, store.note_mask(notes))
+    person_counts = np.bincount(np.asarray(store.person)[pronouns], minlength=len(PERSONS))
+    pronouns_count = Counter({
+        name: int(person_counts[store.code("person", str(i + 1))]) for i, name in enumerate(_PERSON_NAMES)
+    })
+    total = sum(pronouns_count.values())
+    return {
+        "total_pronouns": total,
+        "pronouns_count": pronouns_count,
+        "pronoun_percentages": {key: f"{calc_percentage(val, total)}%" for key, val in pronouns_count.items()},
+        "pronouns_list": store.decode(np.asarray(store.word_ids)[pronouns]),
+    }
+
+
+def analyze_interjections_columnar(store: TokenStore, notes: Optional[Iterable[Any]] = None) -> List[str]:
+    """То же, что analyze_interjections, но по колоночному хранилищу."""
+    interjections = store.note_mask(notes) & (np.asarray(store.pos) == store.code("pos", "INTJ"))
+    return store.decode(np.asarray(store.word_ids)[interjections])
+
+
+def feature_counts_by_note(store: TokenStore) -> pd.DataFrame:
+    """
+    Число глаголов по виду и времени, местоимений по лицам и междометий в каждой записи —
+    одним проходом bincount по всем токенам.
+
+    Возвращает:
+    - pd.DataFrame с индексом из ID записей и колонками verbs_total, aspect_<вид>, tense_<время>,
+      pronouns_total, pronouns_<лицо>, interjections
+    """
+    n_notes = len(store.note_ids)
+    note_index = store.note_index
+    all_tokens = np.ones(len(store), dtype=bool)
+    counts: Dict[str, np.ndarray] = {}
+
+    verbs, aspects, tenses = _verb_categories(store, all_tokens)
+    verb_notes = note_index[verbs]
+    counts["verbs_total"] = np.bincount(verb_notes, minlength=n_notes)
+    for i, name in enumerate(("совершенный", "несовершенный")):
+        counts[f"aspect_{name}"] = np.bincount(verb_notes[aspects == i], minlength=n_notes)
+    for i, name in enumerate(_TENSE_NAMES):
+        counts[f"tense_{name}"] = np.bincount(verb_notes[tenses == i], minlength=n_notes)
+
+    pronouns = _pronoun_mask(store, all_tokens)
+    person = np.asarray(store.person)
+    pronoun_notes = note_index[pronouns]
+    for i, name in enumerate(_PERSON_NAMES):
+        persons = person[pronouns] == store.code("person", str(i + 1))
+        counts[f"pronouns_{name}"] = np.bincount(pronoun_notes[persons], minlength=n_notes)
+    counts["pronouns_total"] = sum(counts[f"pronouns_{name}"] for name in _PERSON_NAMES)
+
+    interjections = np.asarray(store.pos) == store.code("pos", "INTJ")
+    counts["interjections"] = np.bincount(note_index[interjections], minlength=n_notes)
+
+    columns = (
+        ["verbs_total"] + [f"aspect_{name}" for name in ("совершенный", "несовершенный")]
+        + [f"tense_{name}" for name in _TENSE_NAMES]
+        + ["pronouns_total"] + [f"pronouns_{name}" for name in _PERSON_NAMES] + ["interjections"]
+    )
+    return pd.DataFrame({column: counts[column] for column in columns}, index=pd.Index(store.note_ids, name="id"))
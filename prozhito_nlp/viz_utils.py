@@ -0,0 +1,108 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Сколько точек оставлять в одной трассе в компактном режиме
+COMPACT_MAX_POINTS = 2000
+
+# С какого числа точек точечные графики рисуются через WebGL (go.Scattergl)
+WEBGL_THRESHOLD = 1000
+
+# Число знаков после запятой для значений в компактном режиме
+COMPACT_DIGITS = 4
+
+# Стандартный шаблон Plotly занимает ~6.5 КБ в каждой фигуре; в компактном режиме
+# вместо него используется минимальный шаблон с теми же светлыми фонами
+COMPACT_TEMPLATE = go.layout.Template(layout=dict(
+    plot_bgcolor="white",
+    paper_bgcolor="white",
+    xaxis=dict(gridcolor="#ebebeb", zeroline=False),
+    yaxis=dict(gridcolor="#ebebeb", zeroline=False),
+    hoverlabel=dict(namelength=-1)
+))
+
+
+def round_values(values, digits: int = COMPACT_DIGITS) -> np.ndarray:
+    """Округляет числовые значения, чтобы уменьшить размер JSON."""
+    return np.round(np.asarray(values, dtype=float), digits)
+
+
+def scatter_class(n_points: int, webgl: Optional[bool] = None):
+    """
+    Возвращает go.Scattergl для больших трасс (или если webgl=True) и go.Scatter в остальных случаях.
+    """
+    if webgl is None:
+        webgl = n_points >= WEBGL_THRESHOLD
+    return go.Scattergl if webgl else go.Scatter
+
+
+def downsample_series(x: pd.Series, y: pd.Series, max_points: int = COMPACT_MAX_POINTS):
+    """
+    Сокращает временной ряд до max_points точек: значения усредняются внутри
+    равных по числу точек интервалов, дата интервала — первая дата в нём.
+
+    Возвращает:
+    - (x, y) — не длиннее max_points
+    """
+    if len(x) <= max_points:
+        return x, y
+    buckets = np.arange(len(x)) * max_points // len(x)
+    frame = pd.DataFrame({"x": np.asarray(x), "y": np.asarray(y, dtype=float), "bucket": buckets})
+    grouped = frame.groupby("bucket").agg(x=("x", "first"), y=("y", "mean"))
+    return grouped["x"], grouped["y"]
+
+
+def apply_compact_layout(fig: go.Figure) -> go.Figure:
+    """Заменяет шаблон фигуры на COMPACT_TEMPLATE."""
+    fig.update_layout(template=COMPACT_TEMPLATE)
+    return fig
+
+
+def figure_payload_bytes(fig: go.Figure) -> int:
+    """Размер фигуры в JSON (примерно столько она займёт в выводе ноутбука)."""
+    return len(fig.to_json().encode("utf-8"))
+
+
+def export_figures(
+    figures: Dict[str, go.Figure],
+    output_dir: str,
+    fmt: str = "html",
+    max_bytes: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    Сохраняет набор фигур (например, отчёт по одному или нескольким авторам) в папку.
+
+    В формате "html" файлы ссылаются на общий plotly.min.js, который записывается
+    в папку один раз, а не встраивается в каждый файл (~3.5 МБ). В формате "json"
+    сохраняется только описание фигуры (данные и оформление) — его можно открыть
+    через plotly.io.read_json или передать в Plotly.js.
+
+    Параметры:
+    - figures: словарь {имя файла без расширения: фигура}
+    - output_dir: папка для файлов
+    - fmt: "html" или "json"
+    - max_bytes: если указан, фигуры тяжелее этого размера (в JSON) вызывают ошибку
+
+    Возвращает:
+    - словарь {имя: путь к файлу}
+    """
+    if fmt not in ("html", "json"):
+        raise ValueError("fmt должен быть 'html' или 'json'")
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = {}
+    for name, fig in figures.items():
+        if max_bytes is not None:
+            size = figure_payload_bytes(fig)
+            if size > max_bytes:
+                raise ValueError(f"Фигура {name} занимает {size} байт (лимит {max_bytes}); используйте compact=True")
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        if fmt == "html":
+            fig.write_html(path, include_plotlyjs="directory", full_html=True)
+        else:
+            fig.write_json(path)
+        paths[name] = path
+    return paths
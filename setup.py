@@ -22,6 +22,11 @@ setup(
         "prozhito_nlp": ["data/*.txt"],
     },
     include_package_data=True,
+    entry_points={
+        "console_scripts": [
+            "prozhito-nlp=prozhito_nlp.cli:main",
+        ],
+    },
     install_requires=[
         "pandas",
         "numpy", 
@@ -33,6 +38,9 @@ setup(
         "statsmodels",
 
     ],
+    extras_require={
+        "arrow": ["pyarrow>=10"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License", 
@@ -0,0 +1,17 @@
+import numpy as np
+
+from prozhito_nlp.token_store import TokenStore
+
+
+def test_word_tokens_have_lemmas():
+    store = TokenStore.from_texts(["Утром я пошла в школу.", "Мы читали книги, а мама шила."], batch_size=1)
+
+    words = np.asarray(store.pos) != store.code("pos", "PUNCT")
+    lemma_ids = np.asarray(store.lemma_ids)
+    assert words.any()
+    assert (lemma_ids[words] >= 0).all()
+
+    lemmas = store.decode(lemma_ids[words])
+    assert "пойти" in lemmas
+    assert "книга" in lemmas
+    assert list(np.diff(store.note_offsets)) == [6, 8]